@@ -0,0 +1,461 @@
+import datetime
+import functools
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+import db
+import queries
+from live_aggregates import LiveAggregates
+from snapshot import SnapshotAggregates
+
+# The queries below load the in-memory totals (see live_aggregates.py); after
+# that only new purchases are read from the database. With
+# AGGREGATES_SOURCE=snapshot the totals come from the columnar snapshot
+# instead (see snapshot.py) and the dashboard reads no MySQL for its charts.
+
+# One row per gamer: every gamer chart and table is derived from this frame.
+# Counts come from the trigger-maintained GamerSpend summary, not Purchases.
+GAMER_STATS_QUERY = """
+    SELECT
+        g.gamer_tag,
+        g.email,
+        g.email_domain,
+        TIMESTAMPDIFF(YEAR, g.birth_date, CURDATE()) AS age,
+        COALESCE(s.purchase_count, 0) AS purchase_count,
+        COALESCE(s.total_spent, 0) AS total_spent
+    FROM
+        Gamers g
+    LEFT JOIN
+        GamerSpend s ON g.gamer_tag = s.gamer_tag
+"""
+
+# One row per game: every game and publisher chart is derived from this frame.
+# Counts come from the trigger-maintained GameSales summary, not Purchases.
+GAME_STATS_QUERY = """
+    SELECT
+        v.game_id,
+        v.title,
+        v.genre,
+        v.price,
+        v.publisher_id,
+        gp.name AS publisher,
+        gp.country AS publisher_country,
+        COALESCE(s.purchase_count, 0) AS times_purchased,
+        COALESCE(s.revenue, 0) AS revenue
+    FROM
+        VideoGames v
+    INNER JOIN
+        GamePublishers gp ON v.publisher_id = gp.publisher_id
+    LEFT JOIN
+        GameSales s ON v.game_id = s.game_id
+"""
+
+# One row per publisher, including ones without games or sales
+PUBLISHER_STATS_QUERY = """
+    SELECT
+        gp.publisher_id,
+        gp.name,
+        gp.country,
+        COALESCE(pr.purchase_count, 0) AS purchase_count,
+        COALESCE(pr.total_revenue, 0) AS total_revenue
+    FROM
+        GamePublishers gp
+    LEFT JOIN
+        PublisherRevenue pr ON gp.publisher_id = pr.publisher_id
+"""
+
+# Purchases per email domain and genre, the only cross-entity breakdown
+DOMAIN_GENRE_QUERY = """
+    SELECT
+        g.email_domain,
+        v.genre,
+        COUNT(*) AS purchase_count
+    FROM
+        Gamers g
+    INNER JOIN
+        Purchases p ON g.gamer_tag = p.gamer_tag
+    INNER JOIN
+        VideoGames v ON p.game_id = v.game_id
+    GROUP BY
+        g.email_domain, v.genre
+    ORDER BY
+        g.email_domain, purchase_count DESC
+"""
+
+# Purchase totals between :start (inclusive) and :end (exclusive), summed
+# from the daily rollups; only rows with purchases in the range are returned
+GAMER_RANGE_QUERY = """
+    SELECT
+        g.gamer_tag,
+        g.email,
+        g.email_domain,
+        TIMESTAMPDIFF(YEAR, g.birth_date, CURDATE()) AS age,
+        d.purchase_count,
+        d.total_spent
+    FROM (
+        SELECT
+            gamer_tag,
+            SUM(purchase_count) AS purchase_count,
+            SUM(total_spent) AS total_spent
+        FROM
+            DailyGamerSpend
+        WHERE
+            sale_date >= :start AND sale_date < :end
+        GROUP BY
+            gamer_tag
+    ) d
+    INNER JOIN
+        Gamers g ON g.gamer_tag = d.gamer_tag
+"""
+
+GAME_RANGE_QUERY = """
+    SELECT
+        v.game_id,
+        v.title,
+        v.genre,
+        v.price,
+        v.publisher_id,
+        gp.name AS publisher,
+        gp.country AS publisher_country,
+        d.times_purchased,
+        d.revenue
+    FROM (
+        SELECT
+            game_id,
+            SUM(purchase_count) AS times_purchased,
+            SUM(revenue) AS revenue
+        FROM
+            DailyGameSales
+        WHERE
+            sale_date >= :start AND sale_date < :end
+        GROUP BY
+            game_id
+    ) d
+    INNER JOIN
+        VideoGames v ON v.game_id = d.game_id
+    INNER JOIN
+        GamePublishers gp ON v.publisher_id = gp.publisher_id
+"""
+
+PUBLISHER_RANGE_QUERY = """
+    SELECT
+        gp.publisher_id,
+        gp.name,
+        gp.country,
+        SUM(d.purchase_count) AS purchase_count,
+        SUM(d.revenue) AS total_revenue
+    FROM
+        DailyGameSales d
+    INNER JOIN
+        VideoGames v ON v.game_id = d.game_id
+    INNER JOIN
+        GamePublishers gp ON v.publisher_id = gp.publisher_id
+    WHERE
+        d.sale_date >= :start AND d.sale_date < :end
+    GROUP BY
+        gp.publisher_id, gp.name, gp.country
+"""
+
+# Reads Purchases itself; the purchase_date predicate prunes the monthly
+# partitions from mysql/PARTITION_PURCHASES.sql
+DOMAIN_GENRE_RANGE_QUERY = """
+    SELECT
+        g.email_domain,
+        v.genre,
+        COUNT(*) AS purchase_count
+    FROM
+        Purchases p
+    INNER JOIN
+        Gamers g ON g.gamer_tag = p.gamer_tag
+    INNER JOIN
+        VideoGames v ON p.game_id = v.game_id
+    WHERE
+        p.purchase_date >= :start AND p.purchase_date < :end
+    GROUP BY
+        g.email_domain, v.genre
+    ORDER BY
+        g.email_domain, purchase_count DESC
+"""
+
+RANGE_QUERIES = {
+    "gamers": (GAMER_RANGE_QUERY, ("total_spent", "age")),
+    "games": (GAME_RANGE_QUERY, ("price", "revenue")),
+    "publishers": (PUBLISHER_RANGE_QUERY, ("total_revenue",)),
+    "domain_genres": (DOMAIN_GENRE_RANGE_QUERY, ()),
+}
+
+# Charts get a fixed number of points whatever the data size: prices are
+# binned here rather than by plotly in the browser, and category charts keep
+# their largest categories and sum the rest into "Other"
+PRICE_BINS = int(os.getenv("CHART_PRICE_BINS", "10"))
+MAX_CATEGORIES = int(os.getenv("CHART_MAX_CATEGORIES", "12"))
+OTHER = "Other"
+
+RANGE_STATEMENTS = {
+    name: queries.register(f"{name}_range", sql)
+    for name, (sql, _) in RANGE_QUERIES.items()
+}
+
+if os.getenv("AGGREGATES_SOURCE", "live") == "snapshot":
+    totals = SnapshotAggregates(
+        os.getenv("SNAPSHOT_DIR", "snapshot"),
+        reload_interval=float(os.getenv("SNAPSHOT_RELOAD_INTERVAL", "60")),
+        memo_size=int(os.getenv("AGGREGATES_MEMO_SIZE", "256")),
+    )
+else:
+    totals = LiveAggregates(
+        {
+            "gamers": GAMER_STATS_QUERY,
+            "games": GAME_STATS_QUERY,
+            "publishers": PUBLISHER_STATS_QUERY,
+            "domain_genres": DOMAIN_GENRE_QUERY,
+        },
+        poll_interval=float(os.getenv("LIVE_AGGREGATES_POLL_INTERVAL", "1")),
+        reconcile_interval=float(
+            os.getenv("LIVE_AGGREGATES_RECONCILE_INTERVAL", "300")
+        ),
+        batch_size=int(os.getenv("LIVE_AGGREGATES_BATCH_SIZE", "10000")),
+        memo_size=int(os.getenv("AGGREGATES_MEMO_SIZE", "256")),
+    )
+
+
+def _on_invalidate(tables):
+    changed = {"Gamers", "GamePublishers", "VideoGames", "Purchases"}
+    if not tables or changed & set(tables):
+        totals.mark_stale()
+
+
+db.invalidation_listeners.append(_on_invalidate)
+
+
+def memoized(func):
+    """Serve ``func`` from the totals, recomputing only after they change."""
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        return totals.memo((func.__name__, args), lambda: func(*args))
+
+    return wrapper
+
+
+def date_bounds(start=None, end=None):
+    """[start, end) dates for an inclusive "YYYY-MM-DD" range; either may be None."""
+    start = start[:10] if start else "1000-01-01"
+    if end:
+        end = datetime.date.fromisoformat(end[:10]) + datetime.timedelta(days=1)
+        end = end.isoformat()
+    else:
+        end = "9999-12-31"
+    return start, end
+
+
+def _stats(name, start=None, end=None):
+    """One of the totals frames, over all history or a date range."""
+    if start is None and end is None:
+        return totals.frame(name)
+    start, end = date_bounds(start, end)
+    if isinstance(totals, SnapshotAggregates):
+        return totals.frame(name, start, end)
+    _, floats = RANGE_QUERIES[name]
+    df = db.read_sql(RANGE_STATEMENTS[name], params={"start": start, "end": end})
+    df = df.copy()
+    for column in floats:
+        df[column] = df[column].astype(float)
+    return df
+
+
+def gamer_stats(start=None, end=None):
+    return _stats("gamers", start, end)
+
+
+def game_stats(start=None, end=None):
+    return _stats("games", start, end)
+
+
+def domain_genre_stats(start=None, end=None):
+    return _stats("domain_genres", start, end)
+
+
+def publisher_stats(start=None, end=None):
+    return _stats("publishers", start, end)
+
+
+def _top(df, column, n=None):
+    ranked = df.sort_values(column, ascending=False, kind="stable")
+    return ranked if n is None else ranked.head(n)
+
+
+def _with_other(df, label, column, by=(), n=None):
+    """Keep the ``n - 1`` largest ``label`` values by total ``column``, sum the rest.
+
+    The others become one "Other" value, placed last. Numeric columns are
+    summed per ``label`` and ``by``; other columns are dropped.
+    """
+    n = n or MAX_CATEGORIES
+    totals = df.groupby(label, sort=False, observed=True)[column].sum()
+    if len(totals) <= n:
+        return df
+    keep = totals.sort_values(ascending=False, kind="stable").index[: n - 1]
+    labels = df[label].astype(object)
+    df = df.assign(**{label: labels.where(labels.isin(keep), OTHER)})
+    keys = [label, *by]
+    numeric = [c for c in df.select_dtypes("number").columns if c not in keys]
+    folded = df.groupby(keys, as_index=False, sort=False, observed=True)[numeric].sum()
+    return folded.sort_values(label, key=lambda s: s == OTHER, kind="stable")
+
+
+def _bin_width(span, bins):
+    """The smallest round width (1, 2, 2.5 or 5 times a power of ten) >= span / bins."""
+    if span <= 0:
+        return 1.0
+    raw = span / bins
+    magnitude = 10 ** math.floor(math.log10(raw))
+    return next(
+        step * magnitude for step in (1, 2, 2.5, 5, 10) if step * magnitude >= raw
+    )
+
+
+# Game Analytics; charts of purchases take an optional inclusive
+# ("YYYY-MM-DD", "YYYY-MM-DD") date range, charts of the catalog do not
+@memoized
+def popular_games(start=None, end=None, n=10):
+    games = game_stats(start, end)
+    games = games[games["times_purchased"] > 0]
+    return _top(games, "times_purchased", n)[["title", "genre", "times_purchased"]]
+
+
+@memoized
+def price_distribution(bins=None):
+    """Games per price bin: ``price`` (bin start), ``width`` and ``game_count``."""
+    prices = game_stats()["price"].dropna().to_numpy(dtype=float)
+    if not len(prices):
+        return pd.DataFrame({"price": [], "width": [], "game_count": []})
+    width = _bin_width(prices.max() - prices.min(), bins or PRICE_BINS)
+    first = math.floor(prices.min() / width)
+    index = np.floor(prices / width).astype(int) - first
+    counts = np.bincount(index)
+    return pd.DataFrame(
+        {
+            "price": (np.arange(len(counts)) + first) * width,
+            "width": width,
+            "game_count": counts,
+        }
+    )
+
+
+@memoized
+def mean_price():
+    return float(game_stats()["price"].mean())
+
+
+@memoized
+def genre_distribution():
+    genres = (
+        game_stats()
+        .groupby("genre", as_index=False, observed=True)
+        .agg(game_count=("game_id", "count"))
+    )
+    return _with_other(genres, "genre", "game_count")
+
+
+# Gamer Analytics
+def _buyers(start=None, end=None):
+    gamers = gamer_stats(start, end)
+    return gamers[gamers["purchase_count"] > 0]
+
+
+@memoized
+def top_spenders(start=None, end=None, n=10):
+    return _top(_buyers(start, end), "total_spent", n)[["gamer_tag", "total_spent"]]
+
+
+@memoized
+def active_gamers(start=None, end=None, n=10):
+    return _top(_buyers(start, end), "purchase_count", n)[
+        ["gamer_tag", "purchase_count"]
+    ]
+
+
+@memoized
+def email_domains():
+    users = (
+        gamer_stats()
+        .groupby("email_domain", as_index=False, observed=True)
+        .agg(user_count=("gamer_tag", "count"))
+    )
+    return _with_other(_top(users, "user_count"), "email_domain", "user_count")
+
+
+# Publisher Analytics
+@memoized
+def publisher_game_counts():
+    counts = game_stats().groupby(
+        ["publisher", "publisher_country"], as_index=False, observed=True
+    )
+    counts = counts.agg(games_published=("game_id", "count"))
+    counts = counts.rename(
+        columns={"publisher": "name", "publisher_country": "country"}
+    )
+    return _with_other(_top(counts, "games_published"), "name", "games_published")
+
+
+@memoized
+def publisher_revenue(start=None, end=None):
+    publishers = publisher_stats(start, end)
+    publishers = publishers[publishers["purchase_count"] > 0]
+    publishers = _top(publishers, "total_revenue")[["name", "total_revenue"]]
+    return _with_other(publishers, "name", "total_revenue")
+
+
+@memoized
+def publisher_countries():
+    countries = publisher_stats().groupby("country", as_index=False, observed=True)
+    countries = _top(
+        countries.agg(publisher_count=("publisher_id", "count")), "publisher_count"
+    )
+    return _with_other(countries, "country", "publisher_count")
+
+
+# Gamer Comparison; averages are taken after folding small domains into
+# "Other", so its average covers all of their gamers
+@memoized
+def email_domain_stats():
+    domains = (
+        gamer_stats()
+        .groupby("email_domain", as_index=False, observed=True)
+        .agg(
+            user_count=("gamer_tag", "count"),
+            aged=("age", "count"),
+            total_age=("age", "sum"),
+        )
+    )
+    domains = _with_other(domains, "email_domain", "user_count")
+    domains["avg_age"] = domains["total_age"] / domains["aged"]
+    return domains[["email_domain", "user_count", "avg_age"]]
+
+
+@memoized
+def email_domain_spending(start=None, end=None):
+    # Gamers without purchases do not count towards the average
+    domains = (
+        _buyers(start, end)
+        .groupby("email_domain", as_index=False, observed=True)
+        .agg(buyers=("gamer_tag", "count"), total_spent=("total_spent", "sum"))
+    )
+    domains = _with_other(domains, "email_domain", "buyers")
+    domains["avg_spent_per_user"] = domains["total_spent"] / domains["buyers"]
+    return domains[["email_domain", "avg_spent_per_user"]]
+
+
+@memoized
+def email_domain_genres(start=None, end=None):
+    pairs = _with_other(
+        domain_genre_stats(start, end),
+        "email_domain",
+        "purchase_count",
+        by=("genre",),
+    )
+    return _with_other(pairs, "genre", "purchase_count", by=("email_domain",))
@@ -1,26 +1,50 @@
+import datetime
+import hmac
+import os
+import time
+from urllib.parse import urlencode
+
 import dash
-from dash import dcc, html, dash_table
+from dash import dcc, html, dash_table, no_update
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-from sqlalchemy import create_engine
-import dotenv
-import os
+import flask
+from flask_compress import Compress
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-# Configure MySQL connection
-print(f"Loading environment variables from .env file... {dotenv.load_dotenv(".env")}")
-db_connection_str = os.getenv("DB_CONNECTION")
-if db_connection_str is None:
-    raise ValueError(
-        "DB_CONNECTION environment variable not set. Please create a .env file and refer to the .env.example file for guidance."
-    )
-engine = create_engine(db_connection_str)
+import first_paint
+import metrics
+from metrics import figure_timer, timed_callback
+
+# pandas, plotly.express, SQLAlchemy and the modules that use them are
+# imported where they are first needed, so the app starts serving sooner
+
+# Rows per page of the Raw Data table (the most a client may ask for), and
+# the query it opens with
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+DEFAULT_QUERY = "popular_games"
+# Library rows shown in the page; the CSV export has all of them
+LIBRARY_ROWS = 100
 
 # Initialize the Dash app with Bootstrap theme
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 app.title = "Gaming Database Analytics"
 
+# Callback responses, the layout and the component bundles are compressed
+# with the first of RESPONSE_COMPRESSION the browser accepts (empty to turn
+# it off). record_payload calls Flask-Compress itself, so it can measure
+# callback responses before and after.
+app.server.config.update(
+    COMPRESS_REGISTER=False,
+    COMPRESS_ALGORITHM=[
+        name.strip()
+        for name in os.getenv("RESPONSE_COMPRESSION", "br,gzip").split(",")
+        if name.strip()
+    ],
+)
+compress = Compress(app.server)
+
 # Define the layout with tabs for organization
 app.layout = dbc.Container(
     [
@@ -35,22 +59,61 @@ app.layout = dbc.Container(
                 )
             ]
         ),
+        # Date range for the purchase charts on the analytics tabs
+        dbc.Row(
+            [
+                dbc.Col(
+                    dbc.Select(
+                        id="date-preset",
+                        options=[
+                            {"label": "All time", "value": "all"},
+                            {"label": "Last 7 days", "value": "7"},
+                            {"label": "Last 30 days", "value": "30"},
+                            {"label": "Last 90 days", "value": "90"},
+                            {"label": "Last 12 months", "value": "365"},
+                        ],
+                        value="all",
+                    ),
+                    width="auto",
+                ),
+                dbc.Col(
+                    dcc.DatePickerRange(
+                        id="date-range",
+                        clearable=True,
+                        display_format="YYYY-MM-DD",
+                        updatemode="bothdates",
+                    ),
+                    width="auto",
+                ),
+            ],
+            className="mb-3",
+        ),
         dbc.Tabs(
             [
                 # Tab 1: Game Analytics
                 dbc.Tab(
                     label="Game Analytics",
+                    tab_id="game-tab",
                     children=[
                         dbc.Row(
                             [
                                 dbc.Col(
                                     [
                                         html.H3("Game Popularity", className="mt-3"),
-                                        dcc.Graph(id="popular-games"),
+                                        dcc.Graph(
+                                            id="popular-games",
+                                            **first_paint.props("popular-games"),
+                                        ),
                                         html.H3("Price Distribution", className="mt-3"),
-                                        dcc.Graph(id="price-distribution"),
+                                        dcc.Graph(
+                                            id="price-distribution",
+                                            **first_paint.props("price-distribution"),
+                                        ),
                                         html.H3("Games by Genre", className="mt-3"),
-                                        dcc.Graph(id="genre-distribution"),
+                                        dcc.Graph(
+                                            id="genre-distribution",
+                                            **first_paint.props("genre-distribution"),
+                                        ),
                                     ],
                                     width=12,
                                 )
@@ -61,19 +124,29 @@ app.layout = dbc.Container(
                 # Tab 2: Gamer Analytics
                 dbc.Tab(
                     label="Gamer Analytics",
+                    tab_id="gamer-tab",
                     children=[
                         dbc.Row(
                             [
                                 dbc.Col(
                                     [
                                         html.H3("Top Spenders", className="mt-3"),
-                                        dcc.Graph(id="top-spenders"),
+                                        dcc.Graph(
+                                            id="top-spenders",
+                                            **first_paint.props("top-spenders"),
+                                        ),
                                         html.H3("Most Active Gamers", className="mt-3"),
-                                        dcc.Graph(id="active-gamers"),
+                                        dcc.Graph(
+                                            id="active-gamers",
+                                            **first_paint.props("active-gamers"),
+                                        ),
                                         html.H3(
                                             "Email Domain Analysis", className="mt-3"
                                         ),
-                                        dcc.Graph(id="email-analysis"),
+                                        dcc.Graph(
+                                            id="email-analysis",
+                                            **first_paint.props("email-analysis"),
+                                        ),
                                     ],
                                     width=12,
                                 )
@@ -84,6 +157,7 @@ app.layout = dbc.Container(
                 # Tab 3: Publisher Analytics
                 dbc.Tab(
                     label="Publisher Analytics",
+                    tab_id="publisher-tab",
                     children=[
                         dbc.Row(
                             [
@@ -92,13 +166,22 @@ app.layout = dbc.Container(
                                         html.H3(
                                             "Publishers by Game Count", className="mt-3"
                                         ),
-                                        dcc.Graph(id="publisher-games"),
+                                        dcc.Graph(
+                                            id="publisher-games",
+                                            **first_paint.props("publisher-games"),
+                                        ),
                                         html.H3("Publisher Revenue", className="mt-3"),
-                                        dcc.Graph(id="publisher-revenue"),
+                                        dcc.Graph(
+                                            id="publisher-revenue",
+                                            **first_paint.props("publisher-revenue"),
+                                        ),
                                         html.H3(
                                             "Publishers by Country", className="mt-3"
                                         ),
-                                        dcc.Graph(id="publisher-countries"),
+                                        dcc.Graph(
+                                            id="publisher-countries",
+                                            **first_paint.props("publisher-countries"),
+                                        ),
                                     ],
                                     width=12,
                                 )
@@ -109,6 +192,7 @@ app.layout = dbc.Container(
                 # Tab 4: Raw Data & Procedures
                 dbc.Tab(
                     label="Raw Data & Procedures",
+                    tab_id="raw-tab",
                     children=[
                         dbc.Row(
                             [
@@ -164,7 +248,7 @@ app.layout = dbc.Container(
                                                     "value": "proc_purchased_games",
                                                 },
                                             ],
-                                            value="popular_games",
+                                            value=DEFAULT_QUERY,
                                             className="mb-3",
                                         ),
                                         # Individual gamer library lookup
@@ -186,8 +270,63 @@ app.layout = dbc.Container(
                                             ],
                                             className="mb-3",
                                         ),
-                                        # Results container
+                                        # Library lookup results
                                         html.Div(id="query-results", className="mt-3"),
+                                        # Selected query, paged, sorted and
+                                        # filtered on the server
+                                        html.H5(
+                                            id="query-title",
+                                            className="mt-3",
+                                            **first_paint.props("query-title"),
+                                        ),
+                                        html.Div(id="query-error"),
+                                        # Every row, sorted and filtered like
+                                        # the table, streamed by /export
+                                        html.Div(
+                                            [
+                                                html.A(
+                                                    "Download CSV",
+                                                    id="export-csv",
+                                                    className="me-3",
+                                                ),
+                                                html.A(
+                                                    "Download Parquet",
+                                                    id="export-parquet",
+                                                ),
+                                            ],
+                                            className="mb-2",
+                                        ),
+                                        dcc.Store(
+                                            id="query-cursors",
+                                            **first_paint.props("query-cursors"),
+                                        ),
+                                        dash_table.DataTable(
+                                            id="query-table",
+                                            page_current=0,
+                                            page_size=PAGE_SIZE,
+                                            page_action="custom",
+                                            sort_action="custom",
+                                            sort_mode="single",
+                                            sort_by=[],
+                                            filter_action="custom",
+                                            filter_query="",
+                                            style_table={"overflowX": "auto"},
+                                            style_cell={
+                                                "textAlign": "left",
+                                                "padding": "8px",
+                                            },
+                                            style_header={
+                                                "backgroundColor": "rgb(230, 230, 230)",
+                                                "fontWeight": "bold",
+                                            },
+                                            style_data_conditional=[
+                                                {
+                                                    "if": {"row_index": "odd"},
+                                                    "backgroundColor": "rgb(248, 248, 248)",
+                                                }
+                                            ],
+                                            **first_paint.props("query-table"),
+                                        ),
                                     ],
                                     width=12,
                                 )
@@ -198,6 +337,7 @@ app.layout = dbc.Container(
                 # Tab 5: Gamer Comparison
                 dbc.Tab(
                     label="Gamer Comparison",
+                    tab_id="comparison-tab",
                     children=[
                         dbc.Row(
                             [
@@ -207,7 +347,10 @@ app.layout = dbc.Container(
                                             "Compare Gmail vs iCloud Users",
                                             className="mt-3",
                                         ),
-                                        dcc.Graph(id="email-comparison"),
+                                        dcc.Graph(
+                                            id="email-comparison",
+                                            **first_paint.props("email-comparison"),
+                                        ),
                                         html.H5(
                                             "Purchase Patterns by Email Domain",
                                             className="mt-3",
@@ -215,11 +358,21 @@ app.layout = dbc.Container(
                                         dbc.Row(
                                             [
                                                 dbc.Col(
-                                                    dcc.Graph(id="email-spending"),
+                                                    dcc.Graph(
+                                                        id="email-spending",
+                                                        **first_paint.props(
+                                                            "email-spending"
+                                                        ),
+                                                    ),
                                                     width=6,
                                                 ),
                                                 dbc.Col(
-                                                    dcc.Graph(id="email-genres"),
+                                                    dcc.Graph(
+                                                        id="email-genres",
+                                                        **first_paint.props(
+                                                            "email-genres"
+                                                        ),
+                                                    ),
                                                     width=6,
                                                 ),
                                             ]
@@ -231,78 +384,359 @@ app.layout = dbc.Container(
                         )
                     ],
                 ),
-            ]
+                # Tab 6: Story Analytics, from the MongoDB stories collection
+                dbc.Tab(
+                    label="Story Analytics",
+                    tab_id="stories-tab",
+                    children=[
+                        dbc.Row(
+                            [
+                                dbc.Col(
+                                    [
+                                        html.H3("Stories by Author", className="mt-3"),
+                                        dcc.Graph(
+                                            id="stories-by-author",
+                                            **first_paint.props("stories-by-author"),
+                                        ),
+                                        html.H3("Stories per Month", className="mt-3"),
+                                        dcc.Graph(
+                                            id="stories-per-month",
+                                            **first_paint.props("stories-per-month"),
+                                        ),
+                                        dbc.Row(
+                                            [
+                                                dbc.Col(
+                                                    dcc.Graph(
+                                                        id="story-windows",
+                                                        **first_paint.props(
+                                                            "story-windows"
+                                                        ),
+                                                    ),
+                                                    width=6,
+                                                ),
+                                                dbc.Col(
+                                                    dcc.Graph(
+                                                        id="story-lengths",
+                                                        **first_paint.props(
+                                                            "story-lengths"
+                                                        ),
+                                                    ),
+                                                    width=6,
+                                                ),
+                                            ]
+                                        ),
+                                    ],
+                                    width=12,
+                                )
+                            ]
+                        )
+                    ],
+                ),
+            ],
+            id="tabs",
+            active_tab="game-tab",
+        ),
+        # Data version each tab was last rendered at, see render_version()
+        dcc.Store(id="game-tab-version"),
+        dcc.Store(id="gamer-tab-version"),
+        dcc.Store(id="publisher-tab-version"),
+        dcc.Store(id="raw-tab-version"),
+        dcc.Store(id="comparison-tab-version"),
+        dcc.Store(id="stories-tab-version"),
+        # With fast boot, re-renders the saved first page once data is loaded
+        dcc.Interval(
+            id="first-paint-refresh",
+            interval=1000,
+            disabled=not first_paint.ENABLED,
         ),
     ],
     fluid=True,
 )
 
 
+# Cache statistics for sizing the query cache
+@app.server.route("/cache/stats")
+def cache_stats():
+    import aggregates
+    import db
+    import library
+    import stories
+
+    stats = db.query_cache.stats()
+    stats["library"] = {
+        "hits": library.library_cache.hits,
+        "misses": library.library_cache.misses,
+    }
+    stats["aggregates"] = aggregates.totals.stats()
+    stats["stories"] = stories.stories_cache.stats()
+    if db.shared_cache is not None:
+        stats["shared"] = db.shared_cache.stats()
+    if db.router.replicas:
+        stats["replicas"] = db.router.stats()
+    return flask.jsonify(stats)
+
+
+# Explicit invalidation after Gamers, GamePublishers, VideoGames or Purchases change
+def _admin_allowed():
+    """Whether the request may invalidate caches.
+
+    With ``CACHE_ADMIN_TOKEN`` set it must send ``Authorization: Bearer
+    <token>``; without one only requests from this host are accepted.
+    """
+    token = os.getenv("CACHE_ADMIN_TOKEN")
+    if not token:
+        return flask.request.remote_addr in ("127.0.0.1", "::1")
+    sent = flask.request.headers.get("Authorization", "")
+    return hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+
+@app.server.route("/cache/invalidate", methods=["POST"])
+def cache_invalidate():
+    if not _admin_allowed():
+        flask.abort(403)
+    import db
+    import library
+
+    # gamer_tag=... drops just those gamers' cached libraries
+    gamer_tags = flask.request.args.getlist("gamer_tag")
+    if gamer_tags:
+        library.invalidate(*gamer_tags)
+        return flask.jsonify({"invalidated": len(gamer_tags)})
+    tables = flask.request.args.getlist("table")
+    return flask.jsonify({"invalidated": db.invalidate(*tables)})
+
+
+# Streamed download of every row of a Raw Data query, see export.py
+@app.server.route("/export/<name>.<fmt>")
+def export_query(name, fmt):
+    import export
+
+    if fmt not in export.FORMATS:
+        flask.abort(404)
+    try:
+        query, params = export.statement(name, flask.request.args)
+        body = export.Export(query, params, fmt)
+    except KeyError:
+        flask.abort(404)
+    except ValueError as e:
+        return flask.jsonify({"error": str(e)}), 400
+    except export.ExportBusy as e:
+        return flask.jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return flask.Response(
+        body,
+        mimetype=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@app.server.after_request
+def record_payload(response):
+    if not flask.request.path.endswith("/_dash-update-component"):
+        return compress.after_request(response)
+    payload = response.calculate_content_length()
+    response = compress.after_request(response)
+    body = flask.request.get_json(silent=True) or {}
+    callback = app.callback_map.get(body.get("output"), {}).get("callback")
+    name = getattr(callback, "__name__", "unknown")
+    if payload is not None:
+        metrics.CALLBACK_PAYLOAD_BYTES.labels(name).observe(payload)
+        metrics.CALLBACK_RESPONSE_BYTES.labels(name).observe(
+            response.calculate_content_length()
+        )
+    return response
+
+
+# Prometheus metrics: query, callback, figure and pool checkout latencies
+@app.server.route("/metrics")
+def prometheus_metrics():
+    return flask.Response(
+        generate_latest(metrics.registry()), mimetype=CONTENT_TYPE_LATEST
+    )
+
+
+def render_version(active_tab, tab, rendered_version, *inputs, cache=None):
+    """Return the data version to render ``tab`` at, or None to skip it.
+
+    A tab is only fetched while it is shown, and only again once its
+    ``inputs`` changed, or ``cache`` (the query cache by default) was
+    invalidated or its TTL window passed, since it was rendered. During a
+    fast boot the default view keeps its saved copy until the data is loaded.
+    """
+    if active_tab != tab:
+        return None
+    if cache is None:
+        if not first_paint.ready.is_set() and not any(inputs):
+            return None
+        import db
+
+        db.sync()
+        cache = db.query_cache
+    version = [cache.version(), *inputs]
+    if version == rendered_version:
+        return None
+    return version
+
+
+def shared_figures(build, *args):
+    """``build(*args)``, reused when another worker already built it.
+
+    Figures follow the same invalidations and TTL as the results they are
+    built from.
+    """
+    import db
+
+    return db.shared(
+        ("figures", build.__name__, *args),
+        lambda: build(*args),
+        db.result_counters(),
+    )
+
+
+# Fill the date range from a preset; picking dates by hand leaves it alone
+@app.callback(
+    [Output("date-range", "start_date"), Output("date-range", "end_date")],
+    [Input("date-preset", "value")],
+)
+def apply_date_preset(preset):
+    if not preset or preset == "all":
+        return None, None
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=int(preset) - 1)
+    return start.isoformat(), today.isoformat()
+
+
+@first_paint.persisted("popular-games", "price-distribution", "genre-distribution")
+def game_figures(start_date, end_date):
+    """The Game Analytics tab's figures for a date range."""
+    import plotly.express as px
+
+    import aggregates
+    from db import run_concurrently
+
+    popular_df, price_df, mean_price, genre_df = run_concurrently(
+        lambda: aggregates.popular_games(start_date, end_date),
+        aggregates.price_distribution,
+        aggregates.mean_price,
+        aggregates.genre_distribution,
+    )
+
+    # Most popular games chart
+    with figure_timer("popular-games"):
+        popular_fig = px.bar(
+            popular_df,
+            x="title",
+            y="times_purchased",
+            color="genre",
+            title="Top 10 Most Popular Games",
+            labels={"times_purchased": "Number of Purchases", "title": "Game Title"},
+        )
+
+    # Price distribution chart, binned by aggregates.price_distribution
+    with figure_timer("price-distribution"):
+        price_fig = px.bar(
+            price_df,
+            x="price",
+            y="game_count",
+            title="Game Price Distribution",
+            labels={"price": "Price ($)", "game_count": "Number of Games"},
+        )
+        # Each bar spans its bin, starting at its price
+        price_fig.update_traces(offset=0, width=price_df["width"].tolist())
+        price_fig.add_vline(
+            x=mean_price,
+            line_dash="dash",
+            line_color="red",
+            annotation_text=f"Mean Price: {mean_price:.2f}",
+            annotation_position="top",
+        )
+
+    # Genre distribution chart
+    with figure_timer("genre-distribution"):
+        genre_fig = px.pie(
+            genre_df,
+            values="game_count",
+            names="genre",
+            title="Games by Genre",
+            hole=0.3,
+        )
+
+    return popular_fig, price_fig, genre_fig
+
+
 # Callback for the main charts in Game Analytics tab
 @app.callback(
     [
         Output("popular-games", "figure"),
         Output("price-distribution", "figure"),
         Output("genre-distribution", "figure"),
+        Output("game-tab-version", "data"),
+    ],
+    [
+        Input("tabs", "active_tab"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("first-paint-refresh", "n_intervals"),
     ],
-    [Input("query-selector", "value")],
+    [State("game-tab-version", "data")],
 )
-def update_game_analytics(_):
-    # Most popular games chart
-    popular_query = """
-        SELECT v.title, v.genre, COUNT(gp.purchase_id) AS times_purchased
-        FROM VideoGames v
-        INNER JOIN Purchases gp ON v.game_id = gp.game_id
-        GROUP BY v.title, v.genre
-        ORDER BY times_purchased DESC
-        LIMIT 10
-    """
-    popular_df = pd.read_sql(popular_query, engine)
-    popular_fig = px.bar(
-        popular_df,
-        x="title",
-        y="times_purchased",
-        color="genre",
-        title="Top 10 Most Popular Games",
-        labels={"times_purchased": "Number of Purchases", "title": "Game Title"},
+@timed_callback
+def update_game_analytics(
+    active_tab, start_date, end_date, refreshes, rendered_version
+):
+    version = render_version(
+        active_tab, "game-tab", rendered_version, start_date, end_date
     )
+    if version is None:
+        return no_update, no_update, no_update, no_update
 
-    # Price distribution chart
-    price_query = """
-        SELECT v.price, COUNT(*) as game_count
-        FROM VideoGames v
-        GROUP BY v.price
-        ORDER BY v.price
-    """
-    price_df = pd.read_sql(price_query, engine)
-    price_fig = px.histogram(
-        price_df,
-        x="price",
-        y="game_count",
-        nbins=10,
-        title="Game Price Distribution",
-        labels={"price": "Price ($)", "game_count": "Number of Games"},
-    )
-    price_fig.add_vline(
-        x=price_df["price"].mean(),
-        line_dash="dash",
-        line_color="red",
-        annotation_text=f"Mean Price: {price_df["price"].mean():.2f}",
-        annotation_position="top",
-    )
+    return (*shared_figures(game_figures, start_date, end_date), version)
 
-    # Genre distribution chart
-    genre_query = """
-        SELECT v.genre, COUNT(*) as game_count
-        FROM VideoGames v
-        GROUP BY v.genre
-    """
-    genre_df = pd.read_sql(genre_query, engine)
-    genre_fig = px.pie(
-        genre_df, values="game_count", names="genre", title="Games by Genre", hole=0.3
+
+@first_paint.persisted("top-spenders", "active-gamers", "email-analysis")
+def gamer_figures(start_date, end_date):
+    """The Gamer Analytics tab's figures for a date range."""
+    import plotly.express as px
+
+    import aggregates
+    from db import run_concurrently
+
+    spenders_df, active_df, email_df = run_concurrently(
+        lambda: aggregates.top_spenders(start_date, end_date),
+        lambda: aggregates.active_gamers(start_date, end_date),
+        aggregates.email_domains,
     )
 
-    return popular_fig, price_fig, genre_fig
+    # Top spenders chart
+    with figure_timer("top-spenders"):
+        spenders_fig = px.bar(
+            spenders_df,
+            x="gamer_tag",
+            y="total_spent",
+            title="Top 10 Spenders",
+            labels={"total_spent": "Total Spent ($)", "gamer_tag": "Gamer"},
+        )
+
+    # Most active gamers chart
+    with figure_timer("active-gamers"):
+        active_fig = px.bar(
+            active_df,
+            x="gamer_tag",
+            y="purchase_count",
+            title="Most Active Gamers",
+            labels={"purchase_count": "Number of Purchases", "gamer_tag": "Gamer"},
+        )
+
+    # Email domain analysis
+    with figure_timer("email-analysis"):
+        email_fig = px.pie(
+            email_df,
+            values="user_count",
+            names="email_domain",
+            title="Gamers by Email Domain",
+            hole=0.3,
+        )
+
+    return spenders_fig, active_fig, email_fig
 
 
 # Callback for the Gamer Analytics tab
@@ -311,68 +745,74 @@ def update_game_analytics(_):
         Output("top-spenders", "figure"),
         Output("active-gamers", "figure"),
         Output("email-analysis", "figure"),
+        Output("gamer-tab-version", "data"),
     ],
-    [Input("query-selector", "value")],
+    [
+        Input("tabs", "active_tab"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("first-paint-refresh", "n_intervals"),
+    ],
+    [State("gamer-tab-version", "data")],
 )
-def update_gamer_analytics(_):
-    # Top spenders chart
-    spenders_query = """
-        SELECT g.gamer_tag, SUM(p.price_paid) AS total_spent
-        FROM Gamers g
-        INNER JOIN Purchases p ON g.gamer_tag = p.gamer_tag
-        GROUP BY g.gamer_tag
-        ORDER BY total_spent DESC
-        LIMIT 10
-    """
-    spenders_df = pd.read_sql(spenders_query, engine)
-    spenders_fig = px.bar(
-        spenders_df,
-        x="gamer_tag",
-        y="total_spent",
-        title="Top 10 Spenders",
-        labels={"total_spent": "Total Spent ($)", "gamer_tag": "Gamer"},
+@timed_callback
+def update_gamer_analytics(
+    active_tab, start_date, end_date, refreshes, rendered_version
+):
+    version = render_version(
+        active_tab, "gamer-tab", rendered_version, start_date, end_date
     )
+    if version is None:
+        return no_update, no_update, no_update, no_update
 
-    # Most active gamers chart
-    active_query = """
-        SELECT g.gamer_tag, COUNT(p.purchase_id) AS purchase_count
-        FROM Gamers g
-        INNER JOIN Purchases p ON g.gamer_tag = p.gamer_tag
-        GROUP BY g.gamer_tag
-        ORDER BY purchase_count DESC
-        LIMIT 10
-    """
-    active_df = pd.read_sql(active_query, engine)
-    active_fig = px.bar(
-        active_df,
-        x="gamer_tag",
-        y="purchase_count",
-        title="Most Active Gamers",
-        labels={"purchase_count": "Number of Purchases", "gamer_tag": "Gamer"},
-    )
+    return (*shared_figures(gamer_figures, start_date, end_date), version)
 
-    # Email domain analysis
-    email_query = """
-        SELECT 
-            SUBSTRING_INDEX(g.email, '@', -1) AS email_domain,
-            COUNT(g.gamer_tag) AS user_count
-        FROM 
-            Gamers g
-        GROUP BY 
-            email_domain
-        ORDER BY 
-            user_count DESC
-    """
-    email_df = pd.read_sql(email_query, engine)
-    email_fig = px.pie(
-        email_df,
-        values="user_count",
-        names="email_domain",
-        title="Gamers by Email Domain",
-        hole=0.3,
+
+@first_paint.persisted("publisher-games", "publisher-revenue", "publisher-countries")
+def publisher_figures(start_date, end_date):
+    """The Publisher Analytics tab's figures for a date range."""
+    import plotly.express as px
+
+    import aggregates
+    from db import run_concurrently
+
+    pub_games_df, pub_revenue_df, pub_country_df = run_concurrently(
+        aggregates.publisher_game_counts,
+        lambda: aggregates.publisher_revenue(start_date, end_date),
+        aggregates.publisher_countries,
     )
 
-    return spenders_fig, active_fig, email_fig
+    # Publishers by game count
+    with figure_timer("publisher-games"):
+        pub_games_fig = px.pie(
+            pub_games_df,
+            names="name",
+            values="games_published",
+            title="Publishers by Number of Games",
+            labels={"games_published": "Games Published", "name": "Publisher"},
+        )
+
+    # Publisher revenue (estimated from purchases)
+    with figure_timer("publisher-revenue"):
+        pub_revenue_fig = px.bar(
+            pub_revenue_df,
+            x="name",
+            y="total_revenue",
+            title="Publisher Revenue from Purchases",
+            labels={"total_revenue": "Revenue ($)", "name": "Publisher"},
+        )
+
+    # Publishers by country
+    with figure_timer("publisher-countries"):
+        pub_country_fig = px.pie(
+            pub_country_df,
+            values="publisher_count",
+            names="country",
+            title="Publishers by Country",
+            hole=0.3,
+        )
+
+    return pub_games_fig, pub_revenue_fig, pub_country_fig
 
 
 # Callback for Publisher Analytics
@@ -381,74 +821,87 @@ def update_gamer_analytics(_):
         Output("publisher-games", "figure"),
         Output("publisher-revenue", "figure"),
         Output("publisher-countries", "figure"),
+        Output("publisher-tab-version", "data"),
+    ],
+    [
+        Input("tabs", "active_tab"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("first-paint-refresh", "n_intervals"),
     ],
-    [Input("query-selector", "value")],
+    [State("publisher-tab-version", "data")],
 )
-def update_publisher_analytics(_):
-    # Publishers by game count
-    pub_games_query = """
-        SELECT gp.name, COUNT(v.game_id) AS games_published
-        FROM GamePublishers gp
-        INNER JOIN VideoGames v ON gp.publisher_id = v.publisher_id
-        GROUP BY gp.name
-        ORDER BY games_published DESC
-    """
-    pub_games_df = pd.read_sql(pub_games_query, engine)
-    pub_games_fig = px.pie(
-        pub_games_df,
-        names="name",
-        values="games_published",
-        title="Publishers by Number of Games",
-        labels={"games_published": "Games Published", "name": "Publisher"},
+@timed_callback
+def update_publisher_analytics(
+    active_tab, start_date, end_date, refreshes, rendered_version
+):
+    version = render_version(
+        active_tab, "publisher-tab", rendered_version, start_date, end_date
     )
+    if version is None:
+        return no_update, no_update, no_update, no_update
 
-    # Publisher revenue (estimated from purchases)
-    pub_revenue_query = """
-        SELECT 
-            gp.name, 
-            SUM(p.price_paid) AS total_revenue
-        FROM 
-            GamePublishers gp
-        INNER JOIN 
-            VideoGames v ON gp.publisher_id = v.publisher_id
-        INNER JOIN 
-            Purchases p ON v.game_id = p.game_id
-        GROUP BY 
-            gp.name
-        ORDER BY 
-            total_revenue DESC
-    """
-    pub_revenue_df = pd.read_sql(pub_revenue_query, engine)
-    pub_revenue_fig = px.bar(
-        pub_revenue_df,
-        x="name",
-        y="total_revenue",
-        title="Publisher Revenue from Purchases",
-        labels={"total_revenue": "Revenue ($)", "name": "Publisher"},
-    )
+    return (*shared_figures(publisher_figures, start_date, end_date), version)
 
-    # Publishers by country
-    pub_country_query = """
-        SELECT 
-            gp.country, 
-            COUNT(*) AS publisher_count
-        FROM 
-            GamePublishers gp
-        GROUP BY 
-            gp.country
-        ORDER BY 
-            publisher_count DESC
-    """
-    pub_country_df = pd.read_sql(pub_country_query, engine)
-    pub_country_fig = px.pie(
-        pub_country_df,
-        values="publisher_count",
-        names="country",
-        title="Publishers by Country",
-        hole=0.3,
+
+@first_paint.persisted("email-comparison", "email-spending", "email-genres")
+def comparison_figures(start_date, end_date):
+    """The Email Comparison tab's figures for a date range."""
+    import plotly.express as px
+
+    import aggregates
+    from db import run_concurrently
+
+    email_stats_df, email_spending_df, email_genres_df = run_concurrently(
+        aggregates.email_domain_stats,
+        lambda: aggregates.email_domain_spending(start_date, end_date),
+        lambda: aggregates.email_domain_genres(start_date, end_date),
     )
 
-    return pub_games_fig, pub_revenue_fig, pub_country_fig
+    # Email domain user stats
+    with figure_timer("email-comparison"):
+        email_stats_fig = px.bar(
+            email_stats_df,
+            x="email_domain",
+            y=["user_count", "avg_age"],
+            title="Email Domain User Statistics",
+            text_auto=True,
+            barmode="group",
+            labels={
+                "email_domain": "Email Domain",
+                "value": "Value",
+                "variable": "Metric",
+            },
+        )
+        email_stats_fig.update_traces(texttemplate="%{y:.2s}", textposition="outside")
+
+    # Email domain spending
+    with figure_timer("email-spending"):
+        email_spending_fig = px.bar(
+            email_spending_df,
+            x="email_domain",
+            y="avg_spent_per_user",
+            color="email_domain",
+            title="Average Spending by Email Domain",
+            labels={
+                "avg_spent_per_user": "Avg $ Spent per User",
+                "email_domain": "Email Domain",
+            },
+        )
+
+    # Genre preferences by email domain
+    with figure_timer("email-genres"):
+        email_genres_fig = px.bar(
+            email_genres_df,
+            x="genre",
+            y="purchase_count",
+            color="email_domain",
+            title="Genre Preferences by Email Domain",
+            barmode="group",
+            labels={"purchase_count": "Number of Purchases", "genre": "Game Genre"},
+        )
+
+    return email_stats_fig, email_spending_fig, email_genres_fig
 
 
 # Callback for Email Comparison tab
@@ -457,248 +910,333 @@ def update_publisher_analytics(_):
         Output("email-comparison", "figure"),
         Output("email-spending", "figure"),
         Output("email-genres", "figure"),
+        Output("comparison-tab-version", "data"),
     ],
-    [Input("query-selector", "value")],
+    [
+        Input("tabs", "active_tab"),
+        Input("date-range", "start_date"),
+        Input("date-range", "end_date"),
+        Input("first-paint-refresh", "n_intervals"),
+    ],
+    [State("comparison-tab-version", "data")],
 )
-def update_email_comparison(_):
-    # Email domain user stats
-    email_stats_query = """
-        SELECT 
-            SUBSTRING_INDEX(g.email, '@', -1) AS email_domain,
-            COUNT(g.gamer_tag) AS user_count,
-            AVG(TIMESTAMPDIFF(YEAR, g.birth_date, CURDATE())) AS avg_age
-        FROM 
-            Gamers g
-        GROUP BY 
-            email_domain
-    """
-    email_stats_df = pd.read_sql(email_stats_query, engine)
-    email_stats_fig = px.bar(
-        email_stats_df,
-        x="email_domain",
-        y=["user_count", "avg_age"],
-        title="Email Domain User Statistics",
-        text_auto=True,
-        barmode="group",
-        labels={"email_domain": "Email Domain", "value": "Value", "variable": "Metric"},
+@timed_callback
+def update_email_comparison(
+    active_tab, start_date, end_date, refreshes, rendered_version
+):
+    version = render_version(
+        active_tab, "comparison-tab", rendered_version, start_date, end_date
     )
-    email_stats_fig.update_traces(texttemplate="%{y:.2s}", textposition="outside")
+    if version is None:
+        return no_update, no_update, no_update, no_update
 
-    # Email domain spending
-    email_spending_query = """
-        SELECT 
-            SUBSTRING_INDEX(g.email, '@', -1) AS email_domain,
-            AVG(subquery.total_spent) AS avg_spent_per_user
-        FROM 
-            Gamers g
-        LEFT JOIN (
-            SELECT 
-                p.gamer_tag,
-                SUM(p.price_paid) AS total_spent
-            FROM 
-                Purchases p
-            GROUP BY 
-                p.gamer_tag
-        ) AS subquery ON g.gamer_tag = subquery.gamer_tag
-        GROUP BY 
-            email_domain
-    """
-    email_spending_df = pd.read_sql(email_spending_query, engine)
-    email_spending_fig = px.bar(
-        email_spending_df,
-        x="email_domain",
-        y="avg_spent_per_user",
-        color="email_domain",
-        title="Average Spending by Email Domain",
-        labels={
-            "avg_spent_per_user": "Avg $ Spent per User",
-            "email_domain": "Email Domain",
-        },
-    )
+    return (*shared_figures(comparison_figures, start_date, end_date), version)
 
-    # Genre preferences by email domain
-    email_genres_query = """
-        SELECT 
-            SUBSTRING_INDEX(g.email, '@', -1) AS email_domain,
-            v.genre,
-            COUNT(*) AS purchase_count
-        FROM 
-            Gamers g
-        INNER JOIN 
-            Purchases p ON g.gamer_tag = p.gamer_tag
-        INNER JOIN 
-            VideoGames v ON p.game_id = v.game_id
-        GROUP BY 
-            email_domain, v.genre
-        ORDER BY 
-            email_domain, purchase_count DESC
-    """
-    email_genres_df = pd.read_sql(email_genres_query, engine)
-    email_genres_fig = px.bar(
-        email_genres_df,
-        x="genre",
-        y="purchase_count",
-        color="email_domain",
-        title="Genre Preferences by Email Domain",
-        barmode="group",
-        labels={"purchase_count": "Number of Purchases", "genre": "Game Genre"},
+
+# Callback for the Story Analytics tab; the date range does not apply
+@app.callback(
+    [
+        Output("stories-by-author", "figure"),
+        Output("stories-per-month", "figure"),
+        Output("story-windows", "figure"),
+        Output("story-lengths", "figure"),
+        Output("stories-tab-version", "data"),
+    ],
+    [Input("tabs", "active_tab")],
+    [State("stories-tab-version", "data")],
+)
+@timed_callback
+def update_story_analytics(active_tab, rendered_version):
+    import plotly.express as px
+
+    import stories
+
+    version = render_version(
+        active_tab, "stories-tab", rendered_version, cache=stories.stories_cache
     )
+    if version is None:
+        return no_update, no_update, no_update, no_update, no_update
 
-    return email_stats_fig, email_spending_fig, email_genres_fig
+    stats = stories.story_stats()
+
+    # Story count and average length per author
+    with figure_timer("stories-by-author"):
+        author_fig = px.bar(
+            stats["authors"],
+            x="author",
+            y="count",
+            color="averageLength",
+            title="Stories by Author",
+            labels={
+                "author": "Author",
+                "count": "Number of Stories",
+                "averageLength": "Avg Length (chars)",
+            },
+        )
+
+    # Stories published per month
+    with figure_timer("stories-per-month"):
+        month_fig = px.line(
+            stats["months"],
+            x="month",
+            y="count",
+            markers=True,
+            title="Stories Published per Month",
+            labels={"month": "Month", "count": "Number of Stories"},
+        )
 
+    # Stories in the last 30, 90 and 365 days
+    with figure_timer("story-windows"):
+        window_fig = px.bar(
+            stats["windows"],
+            x="window",
+            y="count",
+            title="Recent Stories",
+            labels={"window": "Period", "count": "Number of Stories"},
+        )
 
-# Callback for raw query results
+    # Short / Medium / Long stories
+    with figure_timer("story-lengths"):
+        length_fig = px.pie(
+            stats["length_categories"],
+            values="count",
+            names="category",
+            title="Stories by Length",
+            hole=0.3,
+        )
+
+    return author_fig, month_fig, window_fig, length_fig, version
+
+
+# Callback for the gamer library lookup
 @app.callback(
     Output("query-results", "children"),
-    [Input("query-selector", "value"), Input("show-library-button", "n_clicks")],
+    [Input("show-library-button", "n_clicks")],
     [State("gamer-tag-input", "value")],
 )
-def display_query_results(selected_query, n_clicks, gamer_tag):
-    ctx = dash.callback_context
-    trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
-
-    # Handle gamer library lookup
-    if trigger_id == "show-library-button" and gamer_tag:
-        query = f"CALL ShowGamerLibrary('{gamer_tag}')"
-        try:
-            df = pd.read_sql(query, engine)
-            if df.empty:
-                return html.Div(
-                    [
-                        html.H5(f"Library for {gamer_tag}"),
-                        html.P("No games found in library."),
-                    ]
-                )
-            else:
-                return html.Div(
-                    [
-                        html.H5(f"Library for {gamer_tag}"),
-                        dash_table.DataTable(
-                            data=df.to_dict("records"),
-                            columns=[{"name": col, "id": col} for col in df.columns],
-                            style_table={"overflowX": "auto"},
-                            style_cell={"textAlign": "left", "padding": "8px"},
-                            style_header={
-                                "backgroundColor": "rgb(230, 230, 230)",
-                                "fontWeight": "bold",
-                            },
-                            style_data_conditional=[
-                                {
-                                    "if": {"row_index": "odd"},
-                                    "backgroundColor": "rgb(248, 248, 248)",
-                                }
-                            ],
-                        ),
-                    ]
-                )
-        except Exception as e:
-            return html.Div([html.H5("Error"), html.P(f"An error occurred: {str(e)}")])
-
-    # Handle regular queries
-    if selected_query:
-        queries = {
-            "popular_games": """
-                SELECT v.title, v.genre, COUNT(gp.purchase_id) AS times_purchased
-                FROM VideoGames v
-                INNER JOIN Purchases gp ON v.game_id = gp.game_id
-                GROUP BY v.title, v.genre
-                ORDER BY times_purchased DESC
-                LIMIT 5
-            """,
-            "most_purchases": """
-                SELECT g.gamer_tag, g.email, COUNT(gp.purchase_id) AS games_purchased
-                FROM Gamers g
-                INNER JOIN Purchases gp ON g.gamer_tag = gp.gamer_tag
-                GROUP BY g.gamer_tag, g.email
-                ORDER BY games_purchased DESC
-            """,
-            "highest_spending": """
-                SELECT g.gamer_tag, g.email, SUM(gp.price_paid) AS total_spent
-                FROM Gamers g
-                INNER JOIN Purchases gp ON g.gamer_tag = gp.gamer_tag
-                GROUP BY g.gamer_tag, g.email
-                ORDER BY total_spent DESC
-            """,
-            "no_purchases": """
-                SELECT g.gamer_tag, g.email
-                FROM Gamers g
-                LEFT JOIN Purchases p ON g.gamer_tag = p.gamer_tag
-                WHERE p.purchase_id IS NULL
-            """,
-            "not_purchased": """
-                SELECT v.title, v.genre, v.price
-                FROM VideoGames v
-                LEFT JOIN Purchases gp ON v.game_id = gp.game_id
-                WHERE gp.purchase_id IS NULL
-            """,
-            "expensive_games": """
-                SELECT v.title, v.genre, v.price
-                FROM VideoGames v
-                ORDER BY v.price DESC
-                LIMIT 5
-            """,
-            "cheapest_games": """
-                SELECT v.title, v.genre, v.price
-                FROM VideoGames v
-                ORDER BY v.price
-                LIMIT 5
-            """,
-            "publisher_games": """
-                SELECT gp.name, gp.country, COUNT(v.game_id) AS games_published
-                FROM GamePublishers gp
-                INNER JOIN VideoGames v ON gp.publisher_id = v.publisher_id
-                GROUP BY gp.name, gp.country
-                ORDER BY games_published DESC
-            """,
-            "proc_gamers_purchases": "CALL ShowGamersWithPurchases()",
-            "proc_purchased_games": "CALL ShowPurchasedGames()",
-        }
-
-        query_titles = {
-            "popular_games": "Top 5 Most Popular Games",
-            "most_purchases": "Gamers With Most Purchases",
-            "highest_spending": "Gamers With Highest Spending",
-            "no_purchases": "Gamers With No Purchases",
-            "not_purchased": "Games Not Purchased",
-            "expensive_games": "Most Expensive Games",
-            "cheapest_games": "Cheapest Games",
-            "publisher_games": "Publishers By Game Count",
-            "proc_gamers_purchases": "All Gamers With Their Purchase Statistics",
-            "proc_purchased_games": "Games That Have Been Purchased",
-        }
-
-        if selected_query in queries:
-            try:
-                df = pd.read_sql(queries[selected_query], engine)
-                return html.Div(
+@timed_callback
+def display_gamer_library(n_clicks, gamer_tag):
+    if not n_clicks or not gamer_tag:
+        return no_update
+    import library
+
+    try:
+        exists, df = library.lookup(gamer_tag)
+        if not exists:
+            return html.Div(
+                [
+                    html.H5(f"Library for {gamer_tag}"),
+                    html.P("Gamer does not exist."),
+                ]
+            )
+        elif df.empty:
+            return html.Div(
+                [
+                    html.H5(f"Library for {gamer_tag}"),
+                    html.P("No games found in library."),
+                ]
+            )
+        else:
+            # Large libraries are cut short; the export link has them whole
+            shown = None
+            if len(df) > LIBRARY_ROWS:
+                shown = html.P(
                     [
-                        html.H5(query_titles.get(selected_query, "Query Results")),
-                        dash_table.DataTable(
-                            data=df.to_dict("records"),
-                            columns=[{"name": col, "id": col} for col in df.columns],
-                            style_table={"overflowX": "auto"},
-                            style_cell={"textAlign": "left", "padding": "8px"},
-                            style_header={
-                                "backgroundColor": "rgb(230, 230, 230)",
-                                "fontWeight": "bold",
-                            },
-                            style_data_conditional=[
-                                {
-                                    "if": {"row_index": "odd"},
-                                    "backgroundColor": "rgb(248, 248, 248)",
-                                }
-                            ],
+                        f"Showing {LIBRARY_ROWS} of {len(df)} games. ",
+                        html.A(
+                            "Download all as CSV",
+                            href="/export/show_gamer_library.csv?"
+                            + urlencode({"gamer_tag": gamer_tag}),
                         ),
                     ]
                 )
-            except Exception as e:
-                return html.Div(
-                    [html.H5("Error"), html.P(f"An error occurred: {str(e)}")]
-                )
+            return html.Div(
+                [
+                    html.H5(f"Library for {gamer_tag}"),
+                    shown,
+                    dash_table.DataTable(
+                        data=df.head(LIBRARY_ROWS).to_dict("records"),
+                        columns=[{"name": col, "id": col} for col in df.columns],
+                        style_table={"overflowX": "auto"},
+                        style_cell={"textAlign": "left", "padding": "8px"},
+                        style_header={
+                            "backgroundColor": "rgb(230, 230, 230)",
+                            "fontWeight": "bold",
+                        },
+                        style_data_conditional=[
+                            {
+                                "if": {"row_index": "odd"},
+                                "backgroundColor": "rgb(248, 248, 248)",
+                            }
+                        ],
+                    ),
+                ]
+            )
+    except Exception as e:
+        return html.Div([html.H5("Error"), html.P(f"An error occurred: {str(e)}")])
+
+
+# Point the download links at the selected query, sort and filter
+@app.callback(
+    [Output("export-csv", "href"), Output("export-parquet", "href")],
+    [
+        Input("query-selector", "value"),
+        Input("query-table", "sort_by"),
+        Input("query-table", "filter_query"),
+    ],
+)
+def update_export_links(selected_query, sort_by, filter_query):
+    import paging
+
+    if selected_query not in paging.PAGED_QUERIES:
+        return None, None
+    args = {}
+    if sort_by:
+        args["sort"] = sort_by[0]["column_id"]
+        args["direction"] = sort_by[0]["direction"]
+    if filter_query:
+        args["filter"] = filter_query
+    query_string = f"?{urlencode(args)}" if args else ""
+    return (
+        f"/export/{selected_query}.csv{query_string}",
+        f"/export/{selected_query}.parquet{query_string}",
+    )
+
+
+# Callback for raw query results, one page at a time
+@app.callback(
+    [
+        Output("query-title", "children"),
+        Output("query-error", "children"),
+        Output("query-table", "data"),
+        Output("query-table", "columns"),
+        Output("query-table", "page_count"),
+        Output("query-table", "page_current"),
+        Output("query-table", "sort_by"),
+        Output("query-table", "filter_query"),
+        Output("query-cursors", "data"),
+        Output("raw-tab-version", "data"),
+    ],
+    [
+        Input("tabs", "active_tab"),
+        Input("query-selector", "value"),
+        Input("query-table", "page_current"),
+        Input("query-table", "page_size"),
+        Input("query-table", "sort_by"),
+        Input("query-table", "filter_query"),
+        Input("first-paint-refresh", "n_intervals"),
+    ],
+    [State("query-cursors", "data"), State("raw-tab-version", "data")],
+)
+@timed_callback
+def display_query_results(
+    active_tab,
+    selected_query,
+    page_current,
+    page_size,
+    sort_by,
+    filter_query,
+    refreshes,
+    cursors,
+    rendered_version,
+):
+    import db
+    import paging
+
+    triggered_id = dash.callback_context.triggered_id
+    # Table interactions always fetch; opening the tab only when stale
+    if triggered_id in ("tabs", "first-paint-refresh"):
+        version = render_version(active_tab, "raw-tab", rendered_version)
+    elif active_tab == "raw-tab":
+        version = db.query_cache.version()
+    else:
+        version = None
+    if version is None:
+        return (no_update,) * 10
+
+    if selected_query not in paging.PAGED_QUERIES:
+        return "Select a query to see results", None, [], [], 1, 0, [], "", None, None
+
+    # A new query starts on its first page with its default order
+    if triggered_id == "query-selector":
+        page_current, sort_by, filter_query, cursors = 0, [], "", None
+
+    query = paging.PAGED_QUERIES[selected_query]
+    page_size = min(page_size or PAGE_SIZE, MAX_PAGE_SIZE)
+    try:
+        df, page_count, cursors = paging.fetch_page(
+            selected_query, page_current, page_size, sort_by, filter_query, cursors
+        )
+    except Exception as e:
+        error = html.P(f"An error occurred: {str(e)}")
+        return query["title"], error, [], [], 1, 0, sort_by, filter_query, None, None
+
+    records = df.to_dict("records")
+    columns = [{"name": col, "id": col} for col in df.columns]
+    if (
+        selected_query == DEFAULT_QUERY
+        and not page_current
+        and not sort_by
+        and not filter_query
+    ):
+        first_paint.save(
+            "query_table",
+            {
+                "query-title": {"children": query["title"]},
+                "query-table": {
+                    "data": records,
+                    "columns": columns,
+                    "page_count": page_count,
+                },
+                "query-cursors": {"data": cursors},
+            },
+            version=version,
+        )
+
+    return (
+        query["title"],
+        None,
+        records,
+        columns,
+        page_count,
+        page_current,
+        sort_by,
+        filter_query,
+        cursors,
+        version,
+    )
+
+
+# Stop the fast boot refresh once the fresh data has been rendered
+@app.callback(
+    Output("first-paint-refresh", "disabled"),
+    [Input("first-paint-refresh", "n_intervals")],
+)
+def stop_first_paint_refresh(refreshes):
+    return first_paint.ready.is_set()
+
+
+# Built for the date range the dashboard opens with (all time)
+WARM_FIGURES = (game_figures, gamer_figures, publisher_figures, comparison_figures)
+
+
+def warm():
+    """Load the chart data and build the opening figures."""
+    import aggregates
 
-    return html.Div("Select a query to see results")
+    started = time.perf_counter()
+    # This process's own totals, then the figures every worker shares
+    aggregates.gamer_stats()
+    aggregates.game_stats()
+    aggregates.publisher_stats()
+    aggregates.domain_genre_stats()
+    for build in WARM_FIGURES:
+        shared_figures(build, None, None)
+    print(f"Warmed the dashboard in {time.perf_counter() - started:.2f}s")
 
 
 # Run the app
 if __name__ == "__main__":
+    if first_paint.ENABLED:
+        first_paint.start(warm)
     app.run_server(debug=True)
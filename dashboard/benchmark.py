@@ -0,0 +1,318 @@
+"""Benchmark every dashboard query, Raw Data table and stored procedure.
+
+For each named query it records cold and warm p50/p95/p99 latency, rows
+returned and bytes transferred, and writes the results to JSON so runs can
+be diffed. With ``--baseline`` the run fails when a query got slower than
+``--threshold`` times its baseline latency.
+
+    python dashboard/benchmark.py --output bench.json
+    python dashboard/benchmark.py --scale small=mysql+pymysql://... \\
+        --scale large=mysql+pymysql://... --baseline bench.json
+
+Cold runs use a fresh connection (and an empty query cache for the dashboard
+tables); warm runs reuse one connection after a discarded first execution.
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+import aggregates
+import db
+import live_aggregates
+import paging
+from replicas import ReadRouter
+
+SQL_QUERIES = {
+    "gamer_stats": aggregates.GAMER_STATS_QUERY,
+    "game_stats": aggregates.GAME_STATS_QUERY,
+    "publisher_stats": aggregates.PUBLISHER_STATS_QUERY,
+    "domain_genre": aggregates.DOMAIN_GENRE_QUERY,
+    # Live aggregates catching up by one full batch
+    "live_new_purchases": live_aggregates.NEW_PURCHASES_QUERY.replace(
+        ":after", "0"
+    ).replace(":batch_size", "10000"),
+}
+
+
+def _last_30_days(sql):
+    return sql.replace(":start", "CURDATE() - INTERVAL 30 DAY").replace(
+        ":end", "CURDATE() + INTERVAL 1 DAY"
+    )
+
+
+# Date-range chart queries over the last 30 days
+SQL_QUERIES.update(
+    {
+        f"{name}_30d": _last_30_days(sql)
+        for name, (sql, _) in aggregates.RANGE_QUERIES.items()
+    }
+)
+
+# Stored procedures; {gamer_tag} and {game_id} are filled in per database
+PROCEDURES = {
+    "ShowGamerLibrary": "CALL ShowGamerLibrary('{gamer_tag}')",
+    "ShowGamersWithPurchases": "CALL ShowGamersWithPurchases()",
+    "ShowPurchasedGames": "CALL ShowPurchasedGames()",
+}
+
+# Procedures that write; only run with --include-writes
+WRITE_PROCEDURES = {
+    # rolled back after every call
+    "BuyGame": "CALL BuyGame('{gamer_tag}', {game_id})",
+    # commits, but rewrites the summaries with the same totals
+    "RebuildSummaries": "CALL RebuildSummaries()",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def _bytes_sent(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    return int(cursor.fetchone()[1])
+
+
+def _drain(cursor):
+    rows = len(cursor.fetchall() or ())
+    while cursor.nextset():
+        rows += len(cursor.fetchall() or ())
+    return rows
+
+
+def _summary(samples):
+    values = np.array(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+
+
+def run_sql(engine, sql, cold_runs, warm_runs, rollback=False):
+    """Time a statement on fresh connections (cold) and a reused one (warm)."""
+    cold, rows, transferred = [], 0, 0
+    for _ in range(cold_runs):
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            before = _bytes_sent(cursor)
+            # The status query itself sends a fixed amount; measure it once
+            overhead = _bytes_sent(cursor) - before
+            before = _bytes_sent(cursor)
+            started = time.perf_counter()
+            cursor.execute(sql)
+            rows = _drain(cursor)
+            cold.append(time.perf_counter() - started)
+            transferred = _bytes_sent(cursor) - before - overhead
+            if rollback:
+                connection.rollback()
+        finally:
+            connection.close()
+
+    warm = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for run in range(warm_runs + 1):
+            started = time.perf_counter()
+            cursor.execute(sql)
+            _drain(cursor)
+            if run:
+                warm.append(time.perf_counter() - started)
+            if rollback:
+                connection.rollback()
+    finally:
+        connection.close()
+
+    return {
+        "kind": "sql",
+        "cold": _summary(cold),
+        "warm": _summary(warm),
+        "rows": rows,
+        "bytes": transferred,
+    }
+
+
+def run_table(name, cold_runs, warm_runs, page_size=25):
+    """Time the first page of a Raw Data table as the dashboard fetches it."""
+    cold = []
+    for _ in range(cold_runs):
+        db.invalidate()
+        started = time.perf_counter()
+        df, _, _ = paging.fetch_page(name, 0, page_size)
+        cold.append(time.perf_counter() - started)
+
+    warm = []
+    for _ in range(warm_runs):
+        started = time.perf_counter()
+        df, _, _ = paging.fetch_page(name, 0, page_size)
+        warm.append(time.perf_counter() - started)
+
+    # What the DataTable sends to the browser
+    payload = json.dumps(df.to_dict("records"), default=str).encode()
+    return {
+        "kind": "table",
+        "cold": _summary(cold),
+        "warm": _summary(warm),
+        "rows": len(df),
+        "bytes": len(payload),
+    }
+
+
+def _sample_keys(engine):
+    """Pick a busy gamer and a game they do not own for the procedures."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT gamer_tag FROM GamerSpend ORDER BY purchase_count DESC LIMIT 1"
+        )
+        row = cursor.fetchone()
+        gamer_tag = row[0] if row else "DragonSlayer"
+        cursor.execute(
+            """
+            SELECT v.game_id
+            FROM VideoGames v
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Purchases p
+                WHERE p.gamer_tag = %s AND p.game_id = v.game_id
+            )
+            LIMIT 1
+            """,
+            (gamer_tag,),
+        )
+        row = cursor.fetchone()
+        return {"gamer_tag": gamer_tag, "game_id": row[0] if row else 1}
+    finally:
+        connection.close()
+
+
+def run_scale(url, args):
+    engine = create_engine(url, poolclass=NullPool)
+    # Point the dashboard's cached reads at this database too, not at replicas
+    db.engine = engine
+    db.router = ReadRouter([])
+    db.invalidate()
+    keys = _sample_keys(engine)
+
+    results = {}
+    for name, sql in SQL_QUERIES.items():
+        results[name] = run_sql(engine, sql, args.cold_runs, args.warm_runs)
+    for name in paging.PAGED_QUERIES:
+        results[f"table:{name}"] = run_table(name, args.cold_runs, args.warm_runs)
+    for name, sql in PROCEDURES.items():
+        results[f"proc:{name}"] = run_sql(
+            engine, sql.format(**keys), args.cold_runs, args.warm_runs
+        )
+    if args.include_writes:
+        for name, sql in WRITE_PROCEDURES.items():
+            results[f"proc:{name}"] = run_sql(
+                engine,
+                sql.format(**keys),
+                args.cold_runs,
+                args.warm_runs,
+                rollback=name == "BuyGame",
+            )
+        db.invalidate()
+    engine.dispose()
+    return results
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """Return regressions where warm p95 grew past ``threshold`` times baseline."""
+    regressions = []
+    for scale, queries in current["results"].items():
+        for name, result in queries.items():
+            before = baseline["results"].get(scale, {}).get(name)
+            if before is None:
+                continue
+            old = before["warm"]["p95_ms"]
+            new = result["warm"]["p95_ms"]
+            ratio = new / old if old else float("inf")
+            print(
+                f"{scale:>10} {name:<36} {old:>10.2f} -> {new:>10.2f} ms  x{ratio:.2f}"
+            )
+            if new > old * threshold and new - old >= min_delta_ms:
+                regressions.append((scale, name, old, new))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scale",
+        action="append",
+        default=[],
+        metavar="LABEL=URL",
+        help="database to benchmark; repeat for several data scales "
+        "(defaults to DB_CONNECTION)",
+    )
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--warm-runs", type=int, default=20)
+    parser.add_argument(
+        "--include-writes",
+        action="store_true",
+        help="also benchmark BuyGame (rolled back) and RebuildSummaries",
+    )
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier JSON output to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail when warm p95 exceeds baseline times this factor",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="ignore slowdowns smaller than this many milliseconds",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scales = dict(scale.split("=", 1) for scale in args.scale) or {
+        "default": db.db_connection_str
+    }
+
+    report = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "cold_runs": args.cold_runs,
+        "warm_runs": args.warm_runs,
+        "results": {},
+    }
+    for label, url in scales.items():
+        print(f"Benchmarking {label}...")
+        report["results"][label] = run_scale(url, args)
+        for name, result in report["results"][label].items():
+            print(
+                f"  {name:<36} cold p50 {result['cold']['p50_ms']:>9.2f} ms  "
+                f"warm p50 {result['warm']['p50_ms']:>9.2f} ms  "
+                f"p95 {result['warm']['p95_ms']:>9.2f} ms  "
+                f"{result['rows']:>9} rows  {result['bytes']:>11} bytes"
+            )
+
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for scale, name, old, new in regressions:
+            print(
+                f"REGRESSION {scale} {name}: {old:.2f} -> {new:.2f} ms",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
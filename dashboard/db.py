@@ -0,0 +1,230 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dotenv
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+
+import metrics
+from query_cache import TABLES, QueryCache, tables_for
+from replicas import ReadRouter, Replica
+from shared_cache import SharedCache
+
+# Configure MySQL connection
+print(f"Loading environment variables from .env file... {dotenv.load_dotenv(".env")}")
+db_connection_str = os.getenv("DB_CONNECTION")
+if db_connection_str is None:
+    raise ValueError(
+        "DB_CONNECTION environment variable not set. Please create a .env file and refer to the .env.example file for guidance."
+    )
+
+
+def _create_engine(url):
+    # Connection pool sizing; DB_QUERY_WORKERS should stay within
+    # DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW so concurrent queries never wait on it
+    engine = create_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=True,
+    )
+    metrics.instrument_engine(engine)
+    return engine
+
+
+# The primary, for every write and for reads no replica can serve
+engine = _create_engine(db_connection_str)
+
+# Read replicas for the dashboard's queries, see replicas.py
+router = ReadRouter(
+    [
+        Replica(f"replica{i}", _create_engine(url.strip()))
+        for i, url in enumerate(os.getenv("DB_READ_CONNECTIONS", "").split(","))
+        if url.strip()
+    ],
+    max_lag=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5")),
+    check_interval=float(os.getenv("REPLICA_CHECK_INTERVAL", "5")),
+)
+
+
+def read_engine():
+    """Engine for a read: a replica within the lag bound, else the primary."""
+    return router.replica() or engine
+
+
+# Bounded pool for running a callback's independent queries side by side
+query_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_QUERY_WORKERS", "4")),
+    thread_name_prefix="query",
+)
+
+# Shared result cache for the dashboard's read queries
+query_cache = QueryCache(
+    ttl=float(os.getenv("QUERY_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+# Its counters on /metrics
+cache_metrics = metrics.CacheCollector(query_cache)
+REGISTRY.register(cache_metrics)
+
+
+def fetch_sql(query, params=None, primary=False):
+    """Run a registered read query without the cache and return a DataFrame.
+
+    Parameters are bound by name, e.g. ``:gamer_tag`` in the SQL. The
+    query's name labels it in the /metrics latency histograms. It runs on a
+    replica unless ``primary`` asks for data no replica may have yet.
+    """
+    with metrics.query_name(query.name):
+        with metrics.pool_checkout():
+            connection = (engine if primary else read_engine()).connect()
+        with connection:
+            return query.read(connection, params)
+
+
+# Second tier shared by the worker processes of a multi-worker server (see
+# wsgi.py), so each result is loaded by one of them rather than by all
+shared_cache = None
+if os.getenv("SHARED_CACHE_DIR"):
+    shared_cache = SharedCache(
+        os.getenv("SHARED_CACHE_DIR"),
+        ttl=query_cache.ttl,
+        max_bytes=int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    )
+
+
+def result_counters(tables=TABLES):
+    """Shared counters a result read from ``tables`` goes stale with."""
+    return [f"results:{table}" for table in sorted(tables)]
+
+
+def shared(key, loader, counters=(), ttl=None, max_age=None):
+    """``loader()``, computed once for every worker when the cache is shared."""
+    if shared_cache is None:
+        return loader()
+    return shared_cache.get_or_load(key, loader, counters, ttl=ttl, max_age=max_age)
+
+
+def read_sql(query, params=None, tables=None):
+    """Run a registered read query through the shared cache.
+
+    For ``router.max_lag`` seconds after ``tables`` were invalidated it reads
+    the primary, since a replica may not have the change yet.
+    """
+    sync()
+    cache_metrics.publish()
+    if tables is None:
+        tables = tables_for(query.sql)
+    return query_cache.get_or_load(
+        query.sql,
+        lambda: shared(
+            ("sql", *QueryCache.make_key(query.sql, params)),
+            lambda: fetch_sql(
+                query,
+                params=params,
+                primary=changed_within(tables, router.max_lag),
+            ),
+            result_counters(tables),
+        ),
+        params=params,
+        tables=tables,
+    )
+
+
+# Callables taking the changed table names, for caches kept outside query_cache
+invalidation_listeners = []
+# Shared counters of other kinds ("<kind>:<name>"), e.g. the library
+# cache's: kind -> callable taking the names another worker bumped
+counter_listeners = {}
+
+_seen_counters = shared_cache.counters() if shared_cache is not None else {}
+# table -> time.monotonic() this worker last invalidated it or saw another
+# worker's invalidation
+_changed_at = {}
+
+
+def changed_within(tables, seconds):
+    """Whether any of ``tables`` was invalidated in the last ``seconds``."""
+    now = time.monotonic()
+    return any(now - _changed_at.get(table, -seconds) < seconds for table in tables)
+
+
+def _changed(tables):
+    now = time.monotonic()
+    for table in tables or TABLES:
+        _changed_at[table] = now
+
+
+def bump(*names):
+    """Advance shared counters; other workers see them on their next sync()."""
+    if shared_cache is not None:
+        _seen_counters.update(shared_cache.bump(*names))
+
+
+def invalidate(*tables):
+    """Forget cached results that read any of ``tables`` (all when empty).
+
+    Other workers sharing the cache do the same on their next read.
+    """
+    resets = [f"reset:{table}" for table in tables] if tables else ["reset:*"]
+    bump(*result_counters(tables or TABLES), *resets)
+    _changed(tables)
+    return _invalidate(tables)
+
+
+def invalidate_results(*tables):
+    """Forget cached query results only, in this and every other worker.
+
+    For writes the in-memory state, e.g. the live aggregates, follows anyway.
+    """
+    bump(*result_counters(tables or TABLES))
+    _changed(tables)
+    return query_cache.invalidate(*tables)
+
+
+def _invalidate(tables):
+    for listener in invalidation_listeners:
+        listener(tables)
+    return query_cache.invalidate(*tables)
+
+
+def sync():
+    """Apply invalidations other workers made since the last call."""
+    if shared_cache is None:
+        return
+    current = shared_cache.counters()
+    changed = {
+        name for name, value in current.items() if _seen_counters.get(name) != value
+    }
+    if not changed:
+        return
+    _seen_counters.update(current)
+    by_kind = {}
+    for name in changed:
+        kind, rest = name.split(":", 1)
+        by_kind.setdefault(kind, set()).add(rest)
+    if "reset" in by_kind:
+        reset = by_kind["reset"]
+        _changed(() if "*" in reset else reset)
+        _invalidate(() if "*" in reset else tuple(sorted(reset)))
+    results = tuple(sorted(by_kind.get("results", ())))
+    if results:
+        _changed(results)
+        query_cache.invalidate(*results)
+    for kind, listener in counter_listeners.items():
+        if kind in by_kind:
+            listener(by_kind[kind])
+
+
+def run_concurrently(*calls):
+    """Run independent query functions on the query pool.
+
+    Results are returned in the order of ``calls``; the first exception is
+    re-raised once every call has finished.
+    """
+    futures = [query_executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
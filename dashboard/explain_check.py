@@ -0,0 +1,98 @@
+"""Check that the dashboard and procedure queries use the indexes from
+mysql/CREATE_INDEXES.sql.
+
+Run with ``python dashboard/explain_check.py``; exits non-zero when a table
+in a query is not read through one of its expected indexes.
+"""
+
+import sys
+
+import pandas as pd
+
+import aggregates
+from db import engine
+
+# query name -> (SQL, {table alias in EXPLAIN: accepted index names})
+CHECKS = {
+    "gamer_stats": (aggregates.GAMER_STATS_QUERY, {"s": {"PRIMARY"}}),
+    "game_stats": (aggregates.GAME_STATS_QUERY, {"s": {"PRIMARY"}, "gp": {"PRIMARY"}}),
+    "publisher_stats": (aggregates.PUBLISHER_STATS_QUERY, {"pr": {"PRIMARY"}}),
+    "domain_genre": (
+        aggregates.DOMAIN_GENRE_QUERY,
+        {
+            "g": {"idx_gamers_email_domain"},
+            "p": {"uq_purchases_gamer_game", "idx_purchases_gamer_game"},
+            "v": {"PRIMARY"},
+        },
+    ),
+    "live_new_purchases": (
+        "SELECT * FROM Purchases p WHERE p.purchase_id > 0 ORDER BY p.purchase_id LIMIT 100",
+        {"p": {"PRIMARY"}},
+    ),
+    "email_domain_counts": (
+        "SELECT email_domain, COUNT(*) FROM Gamers GROUP BY email_domain",
+        {"Gamers": {"idx_gamers_email_domain"}},
+    ),
+    "genre_counts": (
+        "SELECT genre, COUNT(*) FROM VideoGames GROUP BY genre",
+        {"VideoGames": {"idx_videogames_genre"}},
+    ),
+    # BuyGame's "already purchased" probe
+    "buy_game_probe": (
+        "SELECT * FROM Purchases WHERE gamer_tag = 'DragonSlayer' AND game_id = 1",
+        # the index is no longer unique once PARTITION_PURCHASES.sql has run
+        {"Purchases": {"uq_purchases_gamer_game", "idx_purchases_gamer_game"}},
+    ),
+    # RebuildSummaries' per-game pass
+    "game_sales_rebuild": (
+        "SELECT game_id, COUNT(*), SUM(price_paid) FROM Purchases GROUP BY game_id",
+        {"Purchases": {"idx_purchases_game_price"}},
+    ),
+    # Date-range charts sum the daily rollups by their (sale_date, ...) keys
+    "daily_game_sales": (
+        "SELECT game_id, SUM(revenue) FROM DailyGameSales "
+        "WHERE sale_date >= CURDATE() - INTERVAL 30 DAY GROUP BY game_id",
+        {"DailyGameSales": {"PRIMARY"}},
+    ),
+    "daily_gamer_spend": (
+        "SELECT gamer_tag, SUM(total_spent) FROM DailyGamerSpend "
+        "WHERE sale_date >= CURDATE() - INTERVAL 30 DAY GROUP BY gamer_tag",
+        {"DailyGamerSpend": {"PRIMARY"}},
+    ),
+    "recent_purchases": (
+        "SELECT COUNT(*) FROM Purchases WHERE purchase_date >= NOW() - INTERVAL 30 DAY",
+        {"Purchases": {"idx_purchases_date"}},
+    ),
+}
+
+
+def check(name, sql, expected):
+    plan = pd.read_sql("EXPLAIN " + sql, engine)
+    failures = []
+    for alias, indexes in expected.items():
+        rows = plan[plan["table"] == alias]
+        used = set(rows["key"].dropna())
+        if not used & indexes:
+            failures.append(
+                f"{name}: {alias} uses {sorted(used) or 'no index'}, "
+                f"expected one of {sorted(indexes)}"
+            )
+    return plan, failures
+
+
+def main():
+    failures = []
+    for name, (sql, expected) in CHECKS.items():
+        plan, failed = check(name, sql, expected)
+        status = "FAIL" if failed else "ok"
+        print(f"[{status}] {name}")
+        print(plan[["table", "type", "key", "rows", "Extra"]].to_string(index=False))
+        failures.extend(failed)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Streaming CSV and Parquet exports of the Raw Data queries.
+
+``GET /export/<name>.csv`` (or ``.parquet``) sends every row of a Raw Data
+query, sorted and filtered like the table with ``?sort=<column>``,
+``&direction=desc`` and ``&filter=<filter_query>``.
+``/export/show_gamer_library.csv?gamer_tag=...`` exports one gamer's library.
+
+Rows are read through an unbuffered server-side cursor ``EXPORT_CHUNK_ROWS``
+at a time and encoded as they arrive. A worker holds one chunk however large
+the result is, and the first bytes go out as soon as the first chunk is read.
+
+An export that fails after it started, e.g. past ``EXPORT_MAX_ROWS``, raises
+out of the response so the server drops the connection instead of ending
+the body normally: a CSV gets a last ``# export incomplete`` line and a
+Parquet file never gets its footer.
+"""
+
+import csv
+import decimal
+import io
+import os
+import threading
+
+import db
+import library
+import metrics
+import paging
+from queries import QueryLimitExceeded
+
+CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+# An export may run far longer and return far more rows than a page
+TIMEOUT_MS = int(os.getenv("EXPORT_TIMEOUT_MS", "600000"))
+MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "10000000"))
+# Each running export holds a pooled connection
+MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+
+
+class ExportBusy(RuntimeError):
+    """All ``EXPORT_MAX_CONCURRENT`` export slots are in use."""
+
+
+def statement(name, args):
+    """The registered query and parameters to export ``name`` with.
+
+    ``args`` are the request's query-string arguments. Raises KeyError for
+    unknown names and ValueError for missing arguments.
+    """
+    if name == library.LIBRARY.name:
+        gamer_tag = args.get("gamer_tag")
+        if not gamer_tag:
+            raise ValueError("gamer_tag is required")
+        query = library.LIBRARY.derive(
+            library.LIBRARY_QUERY, f"{name}:export", TIMEOUT_MS, MAX_ROWS
+        )
+        return query, {"gamer_tag": gamer_tag}
+
+    sort = args.get("sort")
+    sort_by = [{"column_id": sort, "direction": args.get("direction", "asc")}]
+    sql, params = paging.export_query(
+        name, sort_by if sort else None, args.get("filter")
+    )
+    query = paging.PAGED_STATEMENTS[name].derive(
+        sql, f"{name}:export", TIMEOUT_MS, MAX_ROWS
+    )
+    return query, params
+
+
+def _plain(value):
+    # DECIMAL columns as floats, like the DataFrames the dashboard reads
+    return float(value) if isinstance(value, decimal.Decimal) else value
+
+
+def _arrow_type(type_code):
+    """Arrow type for a MySQL column type code, or None to infer it."""
+    import pyarrow as pa
+    from pymysql.constants import FIELD_TYPE
+
+    types = {
+        FIELD_TYPE.TINY: pa.int64(),
+        FIELD_TYPE.SHORT: pa.int64(),
+        FIELD_TYPE.INT24: pa.int64(),
+        FIELD_TYPE.LONG: pa.int64(),
+        FIELD_TYPE.LONGLONG: pa.int64(),
+        FIELD_TYPE.YEAR: pa.int64(),
+        # DECIMAL as float, see _plain
+        FIELD_TYPE.DECIMAL: pa.float64(),
+        FIELD_TYPE.NEWDECIMAL: pa.float64(),
+        FIELD_TYPE.FLOAT: pa.float64(),
+        FIELD_TYPE.DOUBLE: pa.float64(),
+        FIELD_TYPE.DATE: pa.date32(),
+        FIELD_TYPE.NEWDATE: pa.date32(),
+        FIELD_TYPE.DATETIME: pa.timestamp("us"),
+        FIELD_TYPE.TIMESTAMP: pa.timestamp("us"),
+        FIELD_TYPE.TIME: pa.duration("us"),
+        FIELD_TYPE.VARCHAR: pa.string(),
+        FIELD_TYPE.VAR_STRING: pa.string(),
+        FIELD_TYPE.STRING: pa.string(),
+        FIELD_TYPE.ENUM: pa.string(),
+        FIELD_TYPE.SET: pa.string(),
+        FIELD_TYPE.JSON: pa.string(),
+    }
+    # TEXT and BLOB share a code, and other drivers report none
+    return types.get(type_code)
+
+
+def encode_csv(description, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column[0] for column in description])
+    yield buffer.getvalue().encode()
+    try:
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+    except Exception as e:
+        reason = str(e) if isinstance(e, QueryLimitExceeded) else "the query failed"
+        yield f"# export incomplete: {reason}\n".encode()
+        raise
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer has produced."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def encode_parquet(description, chunks):
+    """One row group per chunk, typed from the cursor's column types.
+
+    A column whose type the cursor does not give is inferred from the first
+    chunk, as text if that is all NULL.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = [column[0] for column in description]
+    types = [_arrow_type(column[1]) for column in description]
+    sink = _Sink()
+    writer = None
+    # An error part way propagates with the writer left open, so the client
+    # gets row groups but no footer and the partial file fails to read
+    for rows in chunks:
+        values = [[_plain(row[i]) for row in rows] for i in range(len(columns))]
+        if writer is None:
+            fields = []
+            for name, kind, column in zip(columns, types, values):
+                if kind is None:
+                    kind = pa.array(column).type
+                fields.append(
+                    pa.field(name, pa.string() if kind == pa.null() else kind)
+                )
+            schema = pa.schema(fields)
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(pa.Table.from_arrays(values, schema=schema))
+        yield sink.drain()
+    if writer is None:
+        # No rows: still a valid file with the column names
+        schema = pa.schema(
+            [
+                pa.field(name, pa.string() if kind is None else kind)
+                for name, kind in zip(columns, types)
+            ]
+        )
+        writer = pq.ParquetWriter(sink, schema)
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"csv": encode_csv, "parquet": encode_parquet}
+
+
+class Export:
+    """Iterable of the encoded export, holding an export slot until it ends.
+
+    Raises ExportBusy when every slot is taken, before any query runs.
+    """
+
+    def __init__(self, query, params, fmt):
+        if not _slots.acquire(blocking=False):
+            raise ExportBusy("Too many exports running; try again shortly")
+        self._released = threading.Event()
+        self._iterator = self._generate(query, params, ENCODERS[fmt])
+
+    def __iter__(self):
+        return self._iterator
+
+    def close(self):
+        """Stop reading, e.g. when the client disconnects, and free the slot."""
+        self._iterator.close()
+        self._release()
+
+    def _release(self):
+        if not self._released.is_set():
+            self._released.set()
+            _slots.release()
+
+    def _generate(self, query, params, encode):
+        try:
+            with metrics.query_name(query.name):
+                with metrics.pool_checkout():
+                    connection = db.read_engine().connect()
+                with connection:
+                    rows = query.stream(connection, params, CHUNK_ROWS)
+                    yield from encode(next(rows), rows)
+        finally:
+            self._release()
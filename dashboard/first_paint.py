@@ -0,0 +1,120 @@
+"""Fast boot: the last rendered charts and table, shown while a new process warms up.
+
+With ``FAST_BOOT=1`` the dashboard saves the figures and the Raw Data page
+it renders for the default view (all time, first page) as JSON files under
+``FIRST_PAINT_DIR``. A process starting later builds its layout with them,
+so the first page paints from those files without touching MySQL, and loads
+the data in a background thread. Until that finishes the tabs keep the saved
+copies; a ``first-paint-refresh`` interval then re-renders them with fresh
+data (see app.py).
+
+Reading the files needs neither pandas nor plotly, which app.py only
+imports once a callback needs them.
+"""
+
+import functools
+import json
+import os
+import tempfile
+import threading
+
+ENABLED = os.getenv("FAST_BOOT", "0") == "1"
+DIRECTORY = os.getenv("FIRST_PAINT_DIR", "first_paint")
+
+# Set once the data behind the charts is loaded; at once without fast boot
+ready = threading.Event()
+if not ENABLED:
+    ready.set()
+
+_saved = {}
+_saved_lock = threading.Lock()
+
+
+def _load():
+    if not ENABLED or not os.path.isdir(DIRECTORY):
+        return {}
+    props = {}
+    for name in sorted(os.listdir(DIRECTORY)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(DIRECTORY, name)) as f:
+                props.update(json.load(f))
+        except (OSError, ValueError):
+            # A copy from an older layout is only an optimization
+            continue
+    return props
+
+
+_props = _load()
+
+
+def props(component_id):
+    """Saved properties for a layout component, e.g. {"figure": {...}}."""
+    return dict(_props.get(component_id, {}))
+
+
+def save(name, values, version=None):
+    """Write ``{component_id: {prop: value}}`` as the ``name`` copy.
+
+    ``version`` skips rewriting a copy of the same data.
+    """
+    if not ENABLED:
+        return
+    with _saved_lock:
+        if version is not None and _saved.get(name) == version:
+            return
+        _saved[name] = version
+    from plotly.io.json import to_json_plotly
+
+    os.makedirs(DIRECTORY, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=DIRECTORY, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(to_json_plotly(values))
+        os.replace(temporary, os.path.join(DIRECTORY, f"{name}.json"))
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def persisted(*component_ids):
+    """Save a figure builder's figures when it builds the default view."""
+
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args):
+            figures = build(*args)
+            if not any(args):
+                save(
+                    build.__name__,
+                    {
+                        component_id: {"figure": figure}
+                        for component_id, figure in zip(component_ids, figures)
+                    },
+                )
+            return figures
+
+        return wrapper
+
+    return decorator
+
+
+def start(warm):
+    """Run ``warm()``, in the background with fast boot, and then mark ready."""
+    if not ENABLED:
+        _warm(warm)
+        return
+    threading.Thread(
+        target=_warm, args=(warm,), name="first-paint", daemon=True
+    ).start()
+
+
+def _warm(warm):
+    try:
+        warm()
+    except Exception as e:
+        # Serve anyway; the charts show the error until the database is back
+        print(f"Warm-up failed: {e!r}")
+    finally:
+        ready.set()
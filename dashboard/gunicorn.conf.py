@@ -0,0 +1,73 @@
+"""gunicorn settings for serving the dashboard with several worker processes.
+
+    gunicorn -c dashboard/gunicorn.conf.py
+
+Run it from the repository root, where .env is. Each worker opens its own
+connection pool, so the database sees up to DASHBOARD_WORKERS times
+DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW connections.
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import dotenv
+
+dotenv.load_dotenv(".env")
+
+# The dashboard's modules import one another as siblings
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shared_cache import SharedCache  # noqa: E402
+
+wsgi_app = "wsgi:server"
+bind = os.getenv("DASHBOARD_BIND", "0.0.0.0:8050")
+workers = int(os.getenv("DASHBOARD_WORKERS", str(multiprocessing.cpu_count())))
+# Callbacks mostly wait on the database, so each worker serves several at once
+worker_class = "gthread"
+threads = int(os.getenv("DASHBOARD_THREADS", "4"))
+# Long enough for a worker's warm-up to finish before it counts as stuck
+timeout = int(os.getenv("DASHBOARD_WORKER_TIMEOUT", "120"))
+# No preloading: engines, pools and threads are created after the fork
+preload_app = False
+
+# Every worker must use the same directory; in memory when /dev/shm exists
+os.environ.setdefault(
+    "SHARED_CACHE_DIR",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        "gaming-dashboard-cache",
+    ),
+)
+
+
+# Workers write their Prometheus samples here and /metrics sums them (see
+# metrics.py); set before any worker imports prometheus_client
+_created_metrics_dir = None
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    _created_metrics_dir = tempfile.mkdtemp(prefix="gaming-dashboard-metrics-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = _created_metrics_dir
+
+
+def on_starting(server):
+    # Results left by a previous run may predate changes made since
+    SharedCache(os.environ["SHARED_CACHE_DIR"]).clear()
+    # As may samples, in a directory given in the environment
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges, e.g. its query cache size
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _created_metrics_dir is not None:
+        shutil.rmtree(_created_metrics_dir, ignore_errors=True)
@@ -0,0 +1,151 @@
+"""Batched purchase ingestion on top of the BuyGames procedure.
+
+Concurrent callers submit single purchases; a background thread coalesces
+them into micro-batches bounded by size and by how long the first item may
+wait, runs one ``CALL BuyGames(...)`` per batch and resolves each caller's
+future with the message ``BuyGame`` would have returned for that item.
+
+    batcher = PurchaseBatcher()
+    message = batcher.buy_game("RainbowArcher", 10)  # "Purchase successful"
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.exc import DBAPIError
+
+import db
+import library
+import queries
+
+SUCCESS = "Purchase successful"
+
+# Deadlock and lock wait timeout: batches from several workers can lock the
+# same index gaps, and MySQL rolls one of them back; running it again is safe
+RETRY_ERRORS = {1213, 1205}
+
+BUY_GAME = queries.register("buy_game", "CALL BuyGame(:gamer_tag, :game_id)")
+# One call validates and inserts a whole batch
+BUY_GAMES = queries.register("buy_games", "CALL BuyGames(:items)", timeout_ms=30_000)
+
+
+def buy_game(gamer_tag, game_id, engine=None):
+    """Single purchase through BuyGame; returns its message."""
+    with (engine or db.engine).begin() as connection:
+        _, rows = BUY_GAME.execute(
+            connection, {"gamer_tag": gamer_tag, "game_id": int(game_id)}
+        )
+    message = rows[0][0] if rows else None
+    if message == SUCCESS:
+        library.invalidate(gamer_tag)
+        db.invalidate_results("Purchases")
+    return message
+
+
+class PurchaseBatcher:
+    def __init__(self, max_batch_size=None, max_latency=None, engine=None):
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("PURCHASE_BATCH_SIZE", "100")
+        )
+        # seconds the oldest queued purchase may wait for its batch to fill
+        self.max_latency = max_latency or float(
+            os.getenv("PURCHASE_BATCH_LATENCY", "0.02")
+        )
+        self.engine = engine or db.engine
+        self.max_retries = int(os.getenv("PURCHASE_BATCH_RETRIES", "3"))
+        self.batches = 0
+        self.retries = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name="purchase-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, gamer_tag, game_id):
+        """Queue a purchase; the future resolves to BuyGame's message."""
+        if self._closed.is_set():
+            raise RuntimeError("PurchaseBatcher is closed")
+        future = Future()
+        self._queue.put((gamer_tag, int(game_id), future))
+        return future
+
+    def buy_game(self, gamer_tag, game_id, timeout=None):
+        return self.submit(gamer_tag, game_id).result(timeout)
+
+    def close(self):
+        """Stop accepting purchases and flush the ones already queued."""
+        self._closed.set()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        """Block for one item, then gather more until the size or time bound."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the sentinel back so the loop stops after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _buy_games(self, items):
+        """CALL BuyGames, run again up to ``max_retries`` times after a deadlock."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.engine.begin() as connection:
+                    _, rows = BUY_GAMES.execute(
+                        connection, {"items": json.dumps(items)}
+                    )
+                return rows
+            except DBAPIError as e:
+                code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+                if code not in RETRY_ERRORS or attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                # Back off a little, at random, so the batches stop colliding
+                time.sleep(random.uniform(0, 0.05 * 2**attempt))
+
+    def _flush(self, batch):
+        items = [{"gamer_tag": tag, "game_id": game_id} for tag, game_id, _ in batch]
+        try:
+            rows = self._buy_games(items)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        messages = {row.item_index: row.message for row in rows}
+        buyers = {row.gamer_tag for row in rows if row.message == SUCCESS}
+        if buyers:
+            library.invalidate(*buyers)
+            db.invalidate_results("Purchases")
+        for index, (_, _, future) in enumerate(batch):
+            future.set_result(messages.get(index, "Error: No result for purchase"))
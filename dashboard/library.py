@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import db
+import queries
+
+# One seek on the Gamers primary key and one on Purchases(gamer_tag, ...):
+# no rows means the gamer does not exist, a single row with a NULL title
+# means an empty library
+LIBRARY_QUERY = """
+    SELECT
+        v.title, v.price, v.genre
+    FROM
+        Gamers g
+    LEFT JOIN
+        Purchases p ON p.gamer_tag = g.gamer_tag
+    LEFT JOIN
+        VideoGames v ON p.game_id = v.game_id
+    WHERE
+        g.gamer_tag = :gamer_tag
+"""
+
+LIBRARY = queries.register("show_gamer_library", LIBRARY_QUERY)
+
+
+# Libraries dropped by one worker are dropped by the others through shared
+# counters, one per bucket of gamer tags rather than one per gamer, so their
+# number stays fixed; a purchase drops the buyer's bucket elsewhere
+BUCKETS = 256
+
+
+def bucket(gamer_tag):
+    return zlib.crc32(gamer_tag.encode()) % BUCKETS
+
+
+class LibraryCache:
+    """Bounded LRU of gamer libraries, dropped per gamer on purchase."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Bumped by every invalidation; a library read before one that
+        # covers its gamer is not cached
+        self._generation = 0
+        # (generation, time) libraries were last dropped: per gamer, per
+        # bucket (by other workers) and for everyone
+        self._changed = OrderedDict()
+        self._bucket_changed = {}
+        self._all_changed = (0, float("-inf"))
+        self._lock = threading.Lock()
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, gamer_tag):
+        with self._lock:
+            entry = self._entries.get(gamer_tag)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(gamer_tag)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(gamer_tag, None)
+            self.misses += 1
+            return None
+
+    def put(self, gamer_tag, library, generation=None):
+        """Cache a library, unless it was dropped after ``generation``."""
+        with self._lock:
+            if generation is not None and self._last_change(gamer_tag)[0] > generation:
+                return
+            self._entries[gamer_tag] = (time.monotonic() + self.ttl, library)
+            self._entries.move_to_end(gamer_tag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *gamer_tags):
+        """Drop the given gamers' libraries, or all of them when none given."""
+        with self._lock:
+            self._generation += 1
+            change = (self._generation, time.monotonic())
+            if not gamer_tags:
+                self._entries.clear()
+                self._all_changed = change
+            for gamer_tag in gamer_tags:
+                self._entries.pop(gamer_tag, None)
+                self._changed.pop(gamer_tag, None)
+                self._changed[gamer_tag] = change
+            while len(self._changed) > self.max_entries:
+                self._changed.popitem(last=False)
+
+    def invalidate_buckets(self, buckets):
+        """Drop the libraries of every gamer in ``buckets``."""
+        with self._lock:
+            self._generation += 1
+            change = (self._generation, time.monotonic())
+            for number in buckets:
+                self._bucket_changed[number] = change
+            for gamer_tag in [t for t in self._entries if bucket(t) in buckets]:
+                del self._entries[gamer_tag]
+
+    def changed_within(self, gamer_tag, seconds):
+        """Whether the gamer's library was dropped in the last ``seconds``."""
+        with self._lock:
+            changed_at = self._last_change(gamer_tag)[1]
+        return time.monotonic() - changed_at < seconds
+
+    def _last_change(self, gamer_tag):
+        never = (0, float("-inf"))
+        return max(
+            self._changed.get(gamer_tag, never),
+            self._bucket_changed.get(bucket(gamer_tag), never),
+            self._all_changed,
+        )
+
+
+library_cache = LibraryCache(
+    max_entries=int(os.getenv("LIBRARY_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("LIBRARY_CACHE_TTL", "300")),
+)
+
+
+def invalidate(*gamer_tags):
+    """Drop gamers' libraries here and, on their next read, in other workers."""
+    library_cache.invalidate(*gamer_tags)
+    db.bump(*{f"library:{bucket(gamer_tag)}" for gamer_tag in gamer_tags})
+
+
+def _on_invalidate(tables):
+    if not tables or {"Gamers", "Purchases", "VideoGames"} & set(tables):
+        library_cache.invalidate()
+
+
+db.invalidation_listeners.append(_on_invalidate)
+# Gamers another worker recorded purchases for
+db.counter_listeners["library"] = lambda buckets: library_cache.invalidate_buckets(
+    {int(number) for number in buckets}
+)
+
+
+def lookup(gamer_tag):
+    """Return (exists, library DataFrame) for a gamer, cached per gamer."""
+    db.sync()
+    cached = library_cache.get(gamer_tag)
+    if cached is not None:
+        return cached
+
+    # A purchase recorded while the library is read must not be cached over
+    generation = library_cache.generation()
+    # Just bought something: a replica may not have the purchase yet
+    primary = library_cache.changed_within(gamer_tag, db.router.max_lag)
+    df = db.fetch_sql(LIBRARY, params={"gamer_tag": gamer_tag}, primary=primary)
+    result = (not df.empty, df.dropna(subset=["title"]).reset_index(drop=True))
+    library_cache.put(gamer_tag, result, generation)
+    return result
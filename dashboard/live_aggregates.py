@@ -0,0 +1,410 @@
+"""In-memory purchase aggregates kept current from a Purchases high-water mark.
+
+A full reconcile loads per-gamer, per-game, per-publisher and per
+email-domain/genre totals in one consistent snapshot, together with the
+largest ``purchase_id``. After that only purchases above that id are read
+and added to the totals, so a refresh costs in proportion to the new
+purchases rather than to the table. Ids are allocated before their
+transactions commit, so a poll can see id 101 before id 100: ids skipped
+over are re-read by the following polls until they show up or
+``GAP_TIMEOUT`` passes (a rolled-back purchase never does). Updates and
+deletes, and purchases committed later still, are picked up by the periodic
+reconcile. With a shared cache (see wsgi.py) workers reuse one another's
+reconcile snapshot, so a periodic reconcile may pick those up one interval
+later.
+
+Frames built from the totals are memoized until the totals next change,
+keeping the ``memo_size`` most recently used (each date range a user picks
+is a key of its own).
+One thread at a time refreshes them; the others keep reading the current
+totals meanwhile, and nothing waits on another key's frame being built.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+import db
+import metrics
+import queries
+from query_cache import TABLES
+
+HIGH_WATER_QUERY = "SELECT COALESCE(MAX(purchase_id), 0) AS high_water FROM Purchases"
+
+# A range read on the Purchases primary key
+NEW_PURCHASES_QUERY = """
+    SELECT
+        p.purchase_id, p.gamer_tag, p.game_id, p.price_paid
+    FROM
+        Purchases p
+    WHERE
+        p.purchase_id > :after
+    ORDER BY
+        p.purchase_id
+    LIMIT :batch_size
+"""
+
+# Ids skipped by earlier polls, looked up on the primary key
+GAP_PURCHASES_QUERY = """
+    SELECT
+        p.purchase_id, p.gamer_tag, p.game_id, p.price_paid
+    FROM
+        Purchases p
+    WHERE
+        p.purchase_id IN :ids
+    ORDER BY
+        p.purchase_id
+"""
+
+# A reconcile reads every gamer, game and publisher; it gets far more room
+# than the dashboard's own queries
+RECONCILE_TIMEOUT_MS = 120_000
+RECONCILE_MAX_ROWS = 10_000_000
+
+HIGH_WATER = queries.register("live_high_water", HIGH_WATER_QUERY)
+
+# Seconds a skipped purchase id is waited for; a purchase transaction is cut
+# off well before that (see ingest.BUY_GAMES)
+GAP_TIMEOUT = 60.0
+
+
+class Memo:
+    """Values built at most once per key, least recently used dropped first.
+
+    Builds run outside the lock; concurrent callers of one key wait for its
+    build, and a value whose key was cleared while it was built is returned
+    to those callers but not kept.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        # key -> Future of the value
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            future = self._entries.get(key)
+            building = future is None
+            if building:
+                future = self._entries[key] = Future()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        if not building:
+            return future.result()
+        try:
+            value = build()
+        except BaseException as e:
+            with self._lock:
+                if self._entries.get(key) is future:
+                    del self._entries[key]
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LiveAggregates:
+    """Purchase totals per gamer, game, publisher and email domain/genre.
+
+    ``snapshot_queries`` maps "gamers", "games", "publishers" and
+    "domain_genres" to the SQL a reconcile loads them with; see
+    aggregates.py for the columns each must return.
+    """
+
+    def __init__(
+        self,
+        snapshot_queries,
+        poll_interval=1.0,
+        reconcile_interval=300.0,
+        batch_size=10_000,
+        memo_size=256,
+    ):
+        self.snapshot_queries = {
+            name: queries.register(
+                f"live_{name}",
+                sql,
+                timeout_ms=RECONCILE_TIMEOUT_MS,
+                max_rows=RECONCILE_MAX_ROWS,
+            )
+            for name, sql in snapshot_queries.items()
+        }
+        self.new_purchases = queries.register(
+            "live_new_purchases", NEW_PURCHASES_QUERY, max_rows=batch_size
+        )
+        self.gap_purchases = queries.register(
+            "live_gap_purchases",
+            GAP_PURCHASES_QUERY,
+            max_rows=batch_size,
+            expanding=("ids",),
+        )
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self.batch_size = batch_size
+        self.high_water = None
+        self.version = 0
+        self.polls = 0
+        self.reconciles = 0
+        self.purchases_applied = 0
+        self.gamers = {}
+        self.games = {}
+        self.publishers = {}
+        self.domain_genres = {}
+        self._polled_at = 0.0
+        self._reconciled_at = 0.0
+        self._stale = True
+        # Purchase ids below the mark not seen yet, and when they were skipped
+        self._gaps = {}
+        self._columns = {}
+        # Values built from the current totals
+        self._memo = Memo(memo_size)
+        # Held only to read or swap the totals, never for SQL
+        self._lock = threading.Lock()
+        # Held by the one thread reconciling or polling
+        self._refresh_lock = threading.Lock()
+
+    def mark_stale(self):
+        """Reload everything on the next read."""
+        with self._lock:
+            self._stale = True
+
+    def refresh(self):
+        """Reconcile when due, otherwise apply purchases above the mark."""
+        now = time.monotonic()
+        if (
+            not self._stale
+            and now - self._reconciled_at < self.reconcile_interval
+            and now - self._polled_at < self.poll_interval
+        ):
+            return
+        # Without totals yet there is nothing to serve, so wait for them
+        if not self._refresh_lock.acquire(blocking=self.high_water is None):
+            return
+        try:
+            now = time.monotonic()
+            if self._stale or now - self._reconciled_at >= self.reconcile_interval:
+                self._reconcile()
+            elif now - self._polled_at >= self.poll_interval:
+                self._poll()
+        finally:
+            self._refresh_lock.release()
+
+    def memo(self, key, build):
+        """Return ``build()`` for the current totals, building it at most once.
+
+        A value built while the totals changed is not kept (see _changed).
+        """
+        self.refresh()
+        return self._memo.get(key, build)
+
+    def frame(self, name):
+        """One of the "gamers", "games", "publishers" or "domain_genres" frames."""
+        return self.memo(("frame", name), lambda: self._build_frame(name))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "source": "live",
+                "high_water": self.high_water,
+                "gaps": len(self._gaps),
+                "memo_entries": len(self._memo),
+                "version": self.version,
+                "polls": self.polls,
+                "reconciles": self.reconciles,
+                "purchases_applied": self.purchases_applied,
+            }
+
+    def _changed(self):
+        # Called with the lock held
+        self.version += 1
+        self._memo.clear()
+
+    def _snapshot(self):
+        # One transaction, so the totals and the mark come from the same
+        # snapshot under InnoDB's default REPEATABLE READ. Right after an
+        # invalidation a replica may not have the change yet.
+        if db.changed_within(TABLES, db.router.max_lag):
+            engine = db.engine
+        else:
+            engine = db.read_engine()
+        with metrics.query_name("live_reconcile"):
+            with engine.connect() as connection, connection.begin():
+                _, rows = HIGH_WATER.execute(connection)
+                frames = {
+                    name: query.read(connection)
+                    for name, query in self.snapshot_queries.items()
+                }
+        return rows[0][0], frames
+
+    def _reconcile(self, max_age=None):
+        with self._lock:
+            self._stale = False
+        # Workers sharing a cache start from one worker's snapshot and catch
+        # up from its mark by polling; an invalidation makes it stale
+        high_water, frames = db.shared(
+            (
+                "live_reconcile",
+                *((name, query.sql) for name, query in self.snapshot_queries.items()),
+            ),
+            self._snapshot,
+            ["reset:*", *(f"reset:{table}" for table in TABLES)],
+            ttl=self.reconcile_interval,
+            max_age=max_age,
+        )
+
+        columns = {name: list(df.columns) for name, df in frames.items()}
+        gamers = {
+            row["gamer_tag"]: row
+            for row in _records(frames["gamers"], "total_spent", "age")
+        }
+        games = {
+            row["game_id"]: row for row in _records(frames["games"], "price", "revenue")
+        }
+        publishers = {
+            row["publisher_id"]: row
+            for row in _records(frames["publishers"], "total_revenue")
+        }
+        domain_genres = {
+            (row["email_domain"], row["genre"]): row["purchase_count"]
+            for row in _records(frames["domain_genres"])
+        }
+        with self._lock:
+            self._columns = columns
+            self.gamers = gamers
+            self.games = games
+            self.publishers = publishers
+            self.domain_genres = domain_genres
+            self.high_water = int(high_water)
+            self._gaps = {}
+            self.reconciles += 1
+            self._reconciled_at = self._polled_at = time.monotonic()
+            self._changed()
+
+    def _poll(self):
+        self._polled_at = now = time.monotonic()
+        self.polls += 1
+        with self._lock:
+            self._gaps = {
+                gap: seen
+                for gap, seen in self._gaps.items()
+                if now - seen < GAP_TIMEOUT
+            }
+            gaps = sorted(self._gaps)
+            after = self.high_water
+        # Ids still missing are looked up by id, so a gap costs one probe per
+        # poll rather than a rescan of everything read since
+        for start in range(0, len(gaps), self.batch_size):
+            rows = db.fetch_sql(
+                self.gap_purchases,
+                params={"ids": gaps[start : start + self.batch_size]},
+            )
+            if not self._apply_rows(rows, now):
+                return
+        while True:
+            rows = db.fetch_sql(
+                self.new_purchases,
+                params={"after": after, "batch_size": self.batch_size},
+            )
+            if rows.empty or not self._apply_rows(rows, now):
+                return
+            # More may be waiting than one batch holds
+            if len(rows) < self.batch_size:
+                return
+            after = int(rows["purchase_id"].iloc[-1])
+
+    def _apply_rows(self, rows, now):
+        """Apply a batch; False when it needed a reconcile instead."""
+        if rows.empty:
+            return True
+        with self._lock:
+            applied = self._apply(rows, now)
+            if applied:
+                self._changed()
+        if applied is None:
+            # A gamer or game newer than the last reconcile, so a
+            # snapshot from before this poll would not have it either
+            self._reconcile(max_age=self.poll_interval)
+            return False
+        return True
+
+    def _apply(self, rows, now):
+        """Add new purchases to the totals; returns how many, None if unknown."""
+        applied = 0
+        for purchase in rows.itertuples(index=False):
+            purchase_id = int(purchase.purchase_id)
+            if purchase_id <= self.high_water:
+                if self._gaps.pop(purchase_id, None) is None:
+                    # Applied by an earlier poll
+                    continue
+            else:
+                # Ids in between may still commit; wait for a bounded number
+                missing = purchase_id - self.high_water - 1
+                if 0 < missing <= self.batch_size:
+                    self._gaps.update(
+                        dict.fromkeys(range(self.high_water + 1, purchase_id), now)
+                    )
+                self.high_water = purchase_id
+            gamer = self.gamers.get(purchase.gamer_tag)
+            game = self.games.get(purchase.game_id)
+            if gamer is None or game is None:
+                return None
+            price = float(purchase.price_paid)
+            gamer["purchase_count"] += 1
+            gamer["total_spent"] += price
+            game["times_purchased"] += 1
+            game["revenue"] += price
+            publisher = self.publishers.get(game["publisher_id"])
+            if publisher is not None:
+                publisher["purchase_count"] += 1
+                publisher["total_revenue"] += price
+            key = (gamer["email_domain"], game["genre"])
+            self.domain_genres[key] = self.domain_genres.get(key, 0) + 1
+            self.purchases_applied += 1
+            applied += 1
+        return applied
+
+    def _build_frame(self, name):
+        # Polls update the rows in place, so they are copied under the lock
+        with self._lock:
+            return self._copy_frame(name)
+
+    def _copy_frame(self, name):
+        if name == "domain_genres":
+            df = pd.DataFrame(
+                [
+                    {"email_domain": domain, "genre": genre, "purchase_count": count}
+                    for (domain, genre), count in self.domain_genres.items()
+                ],
+                columns=self._columns[name],
+            )
+            return df.sort_values(
+                ["email_domain", "purchase_count"],
+                ascending=[True, False],
+                kind="stable",
+            ).reset_index(drop=True)
+        rows = {
+            "gamers": self.gamers,
+            "games": self.games,
+            "publishers": self.publishers,
+        }[name]
+        return pd.DataFrame(list(rows.values()), columns=self._columns[name])
+
+
+def _records(df, *floats):
+    """Rows as dicts, with DECIMAL and nullable columns in ``floats`` as floats."""
+    df = df.copy()
+    for column in floats:
+        df[column] = df[column].astype(float)
+    return df.to_dict("records")
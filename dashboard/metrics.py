@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Under gunicorn each worker writes its samples to files in this directory
+# (see gunicorn.conf.py) and /metrics adds up every worker's
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Logical name of the query running in the current thread; set by
+# db.read_sql and read by the cursor event listeners below
+current_query = contextvars.ContextVar("current_query", default="unnamed")
+
+QUERY_SECONDS = Histogram(
+    "dashboard_query_seconds",
+    "Time spent executing a SQL statement, by logical query name",
+    ["query"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+QUERY_ROWS = Histogram(
+    "dashboard_query_rows",
+    "Rows returned by a SQL statement, by logical query name",
+    ["query"],
+    buckets=(0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+CALLBACK_SECONDS = Histogram(
+    "dashboard_callback_seconds",
+    "Time spent in a Dash callback, by callback name",
+    ["callback"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+FIGURE_SECONDS = Histogram(
+    "dashboard_figure_seconds",
+    "Time spent building a plotly figure, by chart id",
+    ["figure"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304)
+CALLBACK_PAYLOAD_BYTES = Histogram(
+    "dashboard_callback_payload_bytes",
+    "Size of a Dash callback's JSON response before compression, by callback name",
+    ["callback"],
+    buckets=PAYLOAD_BUCKETS,
+)
+CALLBACK_RESPONSE_BYTES = Histogram(
+    "dashboard_callback_response_bytes",
+    "Bytes sent for a Dash callback's response after compression, by callback name",
+    ["callback"],
+    buckets=PAYLOAD_BUCKETS,
+)
+QUERY_LIMITS = Counter(
+    "dashboard_query_limit_exceeded",
+    "Queries cut off by their time budget or row cap (see queries.py)",
+    ["query", "limit"],
+)
+READ_ROUTES = Counter(
+    "dashboard_read_routes",
+    "Reads sent to each replica, or to the primary (see replicas.py)",
+    ["target"],
+)
+REPLICA_LAG = Gauge(
+    "dashboard_replica_lag_seconds",
+    "Seconds_Behind_Source at the last check; NaN when unknown",
+    ["replica"],
+    # Every worker checks the replicas itself; report the latest check
+    multiprocess_mode="livemostrecent",
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "dashboard_pool_checkout_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+
+def instrument_engine(engine):
+    """Record latency and row counts for every statement run on ``engine``."""
+    # Here rather than at the top, so app.py can use the timers without it
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        name = current_query.get()
+        QUERY_SECONDS.labels(name).observe(elapsed)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            QUERY_ROWS.labels(name).observe(cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # A failed statement (timeout, KILL QUERY) never reaches _after
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+@contextmanager
+def query_name(name):
+    """Label statements run inside the block with ``name``."""
+    token = current_query.set(name)
+    try:
+        yield
+    finally:
+        current_query.reset(token)
+
+
+@contextmanager
+def pool_checkout():
+    started = time.perf_counter()
+    yield
+    POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+@contextmanager
+def figure_timer(figure):
+    started = time.perf_counter()
+    yield
+    FIGURE_SECONDS.labels(figure).observe(time.perf_counter() - started)
+
+
+def timed_callback(func):
+    """Record how long a Dash callback takes, labelled by its name."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CALLBACK_SECONDS.labels(func.__name__).observe(
+                time.perf_counter() - started
+            )
+
+    return wrapper
+
+
+def registry():
+    """The registry /metrics serves: this process's, or every worker's."""
+    if not MULTIPROCESS:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+# The QueryCache counters as multiprocess samples; unregistered, since
+# CacheCollector serves them in a single process
+QUERY_CACHE_COUNTERS = {
+    name: Counter(f"dashboard_query_cache_{name}", f"Query cache {name}", registry=None)
+    for name in ("hits", "misses", "evictions", "invalidations")
+}
+QUERY_CACHE_GAUGES = {
+    name: Gauge(
+        f"dashboard_query_cache_{name}",
+        f"Query cache {name} held",
+        registry=None,
+        multiprocess_mode="livesum",
+    )
+    for name in ("entries", "bytes")
+}
+
+
+class CacheCollector:
+    """Expose a QueryCache's counters as Prometheus metrics.
+
+    A custom collector only reports the process serving /metrics, so with
+    several workers each one also calls ``publish`` to write its counters to
+    the multiprocess files.
+    """
+
+    def __init__(self, cache, publish_interval=1.0):
+        self.cache = cache
+        self.publish_interval = publish_interval
+        self._published = dict.fromkeys(QUERY_CACHE_COUNTERS, 0)
+        self._published_at = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self):
+        """Copy the cache's counters to the multiprocess samples, if due."""
+        if not MULTIPROCESS:
+            return
+        now = time.monotonic()
+        if now - self._published_at < self.publish_interval:
+            return
+        with self._lock:
+            if now - self._published_at < self.publish_interval:
+                return
+            self._published_at = now
+            stats = self.cache.stats()
+            for name, counter in QUERY_CACHE_COUNTERS.items():
+                counter.inc(stats[name] - self._published[name])
+                self._published[name] = stats[name]
+            for name, gauge in QUERY_CACHE_GAUGES.items():
+                gauge.set(stats[name])
+
+    def collect(self):
+        stats = self.cache.stats()
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            counter = CounterMetricFamily(
+                f"dashboard_query_cache_{name}", f"Query cache {name}"
+            )
+            counter.add_metric([], stats[name])
+            yield counter
+        for name in ("entries", "bytes"):
+            gauge = GaugeMetricFamily(
+                f"dashboard_query_cache_{name}", f"Query cache {name} held"
+            )
+            gauge.add_metric([], stats[name])
+            yield gauge
@@ -0,0 +1,362 @@
+import datetime
+import decimal
+import math
+import re
+
+import queries
+from db import read_sql, run_concurrently
+
+# Raw Data & Procedures tab queries, keyed by the query-selector values.
+# "sql" has no ORDER BY/LIMIT of its own unless it is a top-N list; pages are
+# cut from it with keyset pagination on ("sort column", "key"), where "key"
+# is unique per row. Only "columns" are shown, and only they can be sorted or
+# filtered on; filter values are compared as numbers on the "numeric" ones
+# and as text on the rest.
+PAGED_QUERIES = {
+    "popular_games": {
+        "title": "Top 5 Most Popular Games",
+        "sql": """
+            SELECT v.title, v.genre, s.purchase_count AS times_purchased
+            FROM VideoGames v
+            INNER JOIN GameSales s ON v.game_id = s.game_id
+            WHERE s.purchase_count > 0
+            ORDER BY s.purchase_count DESC
+            LIMIT 5
+        """,
+        "key": "title",
+        "columns": ["title", "genre", "times_purchased"],
+        "numeric": ["times_purchased"],
+        "sort": ("times_purchased", "desc"),
+    },
+    "most_purchases": {
+        "title": "Gamers With Most Purchases",
+        "sql": """
+            SELECT g.gamer_tag, g.email, s.purchase_count AS games_purchased
+            FROM Gamers g
+            INNER JOIN GamerSpend s ON g.gamer_tag = s.gamer_tag
+            WHERE s.purchase_count > 0
+        """,
+        "key": "gamer_tag",
+        "columns": ["gamer_tag", "email", "games_purchased"],
+        "numeric": ["games_purchased"],
+        "sort": ("games_purchased", "desc"),
+    },
+    "highest_spending": {
+        "title": "Gamers With Highest Spending",
+        "sql": """
+            SELECT g.gamer_tag, g.email, s.total_spent
+            FROM Gamers g
+            INNER JOIN GamerSpend s ON g.gamer_tag = s.gamer_tag
+            WHERE s.purchase_count > 0
+        """,
+        "key": "gamer_tag",
+        "columns": ["gamer_tag", "email", "total_spent"],
+        "numeric": ["total_spent"],
+        "sort": ("total_spent", "desc"),
+    },
+    "no_purchases": {
+        "title": "Gamers With No Purchases",
+        "sql": """
+            SELECT g.gamer_tag, g.email
+            FROM Gamers g
+            LEFT JOIN GamerSpend s ON g.gamer_tag = s.gamer_tag
+            WHERE COALESCE(s.purchase_count, 0) = 0
+        """,
+        "key": "gamer_tag",
+        "columns": ["gamer_tag", "email"],
+        "numeric": [],
+        "sort": ("gamer_tag", "asc"),
+    },
+    "not_purchased": {
+        "title": "Games Not Purchased",
+        "sql": """
+            SELECT v.title, v.genre, v.price
+            FROM VideoGames v
+            LEFT JOIN GameSales s ON v.game_id = s.game_id
+            WHERE COALESCE(s.purchase_count, 0) = 0
+        """,
+        "key": "title",
+        "columns": ["title", "genre", "price"],
+        "numeric": ["price"],
+        "sort": ("title", "asc"),
+    },
+    "expensive_games": {
+        "title": "Most Expensive Games",
+        "sql": """
+            SELECT v.title, v.genre, v.price
+            FROM VideoGames v
+            ORDER BY v.price DESC
+            LIMIT 5
+        """,
+        "key": "title",
+        "columns": ["title", "genre", "price"],
+        "numeric": ["price"],
+        "sort": ("price", "desc"),
+    },
+    "cheapest_games": {
+        "title": "Cheapest Games",
+        "sql": """
+            SELECT v.title, v.genre, v.price
+            FROM VideoGames v
+            ORDER BY v.price
+            LIMIT 5
+        """,
+        "key": "title",
+        "columns": ["title", "genre", "price"],
+        "numeric": ["price"],
+        "sort": ("price", "asc"),
+    },
+    "publisher_games": {
+        "title": "Publishers By Game Count",
+        "sql": """
+            SELECT gp.publisher_id, gp.name, gp.country, COUNT(v.game_id) AS games_published
+            FROM GamePublishers gp
+            INNER JOIN VideoGames v ON gp.publisher_id = v.publisher_id
+            GROUP BY gp.publisher_id, gp.name, gp.country
+        """,
+        "key": "publisher_id",
+        "columns": ["name", "country", "games_published"],
+        "numeric": ["games_published"],
+        "sort": ("games_published", "desc"),
+    },
+    # The SELECTs of the ShowGamersWithPurchases and ShowPurchasedGames
+    # procedures, without their ORDER BY: a CALL cannot be wrapped in a
+    # query to be paged, so they run here as registered statements. Keep
+    # them identical to mysql/CREATE_PROCEDURES.sql.
+    "proc_gamers_purchases": {
+        "title": "All Gamers With Their Purchase Statistics",
+        "sql": """
+            SELECT
+                g.gamer_tag,
+                g.email,
+                COALESCE(s.purchase_count, 0) AS purchase_count,
+                COALESCE(s.total_spent, 0) AS total_spent
+            FROM Gamers g
+            LEFT JOIN GamerSpend s ON g.gamer_tag = s.gamer_tag
+        """,
+        "key": "gamer_tag",
+        "columns": ["gamer_tag", "email", "purchase_count", "total_spent"],
+        "numeric": ["purchase_count", "total_spent"],
+        "sort": ("purchase_count", "desc"),
+    },
+    "proc_purchased_games": {
+        "title": "Games That Have Been Purchased",
+        "sql": """
+            SELECT v.title, v.genre, s.purchase_count AS times_purchased
+            FROM VideoGames v
+            INNER JOIN GameSales s ON v.game_id = s.game_id
+            WHERE s.purchase_count > 0
+        """,
+        "key": "title",
+        "columns": ["title", "genre", "times_purchased"],
+        "numeric": ["times_purchased"],
+        "sort": ("times_purchased", "desc"),
+    },
+}
+
+# Pages and counts are built around these and share their limits
+PAGED_STATEMENTS = {
+    name: queries.register(name, query["sql"]) for name, query in PAGED_QUERIES.items()
+}
+
+# Dash filter_query operators and their SQL equivalents
+FILTER_OPERATORS = [
+    ("ge", ">="),
+    ("le", "<="),
+    ("lt", "<"),
+    ("gt", ">"),
+    ("ne", "!="),
+    ("eq", "="),
+    ("contains", "LIKE"),
+    ("datestartswith", "LIKE"),
+]
+
+_FILTER_PART = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s*(?P<operator>s=|[a-z]+|[<>!]=?|=)\s*(?P<value>.*?)\s*$"
+)
+_SYMBOLS = {
+    "s=": "eq",
+    "=": "eq",
+    "!=": "ne",
+    ">=": "ge",
+    "<=": "le",
+    "<": "lt",
+    ">": "gt",
+}
+
+
+def _unquote(value, numeric=False):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+        return value[1:-1].replace("\\" + value[0], value[0])
+    # A number bound against a text column would make MySQL cast every
+    # value of the column, so "0" matches any tag that is not a number
+    if not numeric:
+        return value
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+def _escape_like(value):
+    return str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_filter(filter_query, columns, numeric=()):
+    """Translate a DataTable ``filter_query`` into SQL clauses and parameters.
+
+    Parts on columns outside ``columns`` or with unknown operators are
+    ignored rather than passed through to SQL. Values are bound as numbers
+    for the ``numeric`` columns and as strings for the others.
+    """
+    clauses, params = [], {}
+    if not filter_query:
+        return clauses, params
+    operators = dict(FILTER_OPERATORS)
+    for part in filter_query.split(" && "):
+        match = _FILTER_PART.match(part)
+        if not match or match.group("column") not in columns:
+            continue
+        operator = _SYMBOLS.get(match.group("operator"), match.group("operator"))
+        if operator not in operators:
+            continue
+        value = _unquote(match.group("value"), match.group("column") in numeric)
+        name = f"f{len(params)}"
+        column = f"t.`{match.group('column')}`"
+        if operator == "contains":
+            params[name] = f"%{_escape_like(value)}%"
+        elif operator == "datestartswith":
+            params[name] = f"{_escape_like(value)}%"
+        else:
+            params[name] = value
+        clauses.append(f"{column} {operators[operator]} :{name}")
+    return clauses, params
+
+
+def _jsonable(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _ordering(query, sort_by):
+    """Return (sort column, direction) from the DataTable's sort_by."""
+    if sort_by and sort_by[0]["column_id"] in query["columns"]:
+        return sort_by[0]["column_id"], sort_by[0]["direction"]
+    return query["sort"]
+
+
+def _order_by(column, key, direction):
+    order = "DESC" if direction == "desc" else "ASC"
+    if column == key:
+        return f"t.`{key}` {order}"
+    return f"t.`{column}` {order}, t.`{key}` {order}"
+
+
+def _after(column, key, direction, after_value):
+    """Predicate for the rows after (``after_value``, :after_key) in page order.
+
+    MySQL sorts NULLs first ascending and last descending, and a row-value
+    comparison with a NULL is never true, so NULL sort values are matched
+    on their own. Keys are never NULL.
+    """
+    comparison = "<" if direction == "desc" else ">"
+    after_key = f"t.`{key}` {comparison} :after_key"
+    if column == key:
+        return after_key
+    value = f"t.`{column}`"
+    if after_value is None:
+        among_nulls = f"({value} IS NULL AND {after_key})"
+        if direction == "desc":
+            return among_nulls
+        return f"({among_nulls} OR {value} IS NOT NULL)"
+    after = f"({value}, t.`{key}`) {comparison} (:after_value, :after_key)"
+    if direction == "desc":
+        return f"({after} OR {value} IS NULL)"
+    return after
+
+
+def export_query(name, sort_by=None, filter_query=None):
+    """(SQL, params) for every row of a query, sorted and filtered like the table."""
+    query = PAGED_QUERIES[name]
+    column, direction = _ordering(query, sort_by)
+    clauses, params = parse_filter(filter_query, query["columns"], query["numeric"])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    selected = ", ".join(f"t.`{col}`" for col in query["columns"])
+    sql = (
+        f"SELECT {selected} FROM ({query['sql']}) t {where} "
+        f"ORDER BY {_order_by(column, query['key'], direction)}"
+    )
+    return sql, params
+
+
+def count_rows(name, filter_query=None):
+    """Total rows for a query and filter; cached apart from the pages."""
+    query = PAGED_QUERIES[name]
+    clauses, params = parse_filter(filter_query, query["columns"], query["numeric"])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"SELECT COUNT(*) AS total FROM ({query['sql']}) t {where}"
+    df = read_sql(PAGED_STATEMENTS[name].derive(sql, f"{name}:count"), params=params)
+    return int(df["total"].iloc[0])
+
+
+def fetch_page(
+    name, page_current=0, page_size=25, sort_by=None, filter_query=None, cursors=None
+):
+    """Fetch one page of a query with the sort and filter pushed into SQL.
+
+    ``cursors`` maps a page number to the (sort value, key) of its last row
+    for the current sort and filter. When the previous page's boundary is
+    known the page is read with a keyset predicate; jumps to an unseen page
+    fall back to OFFSET. Returns the page, the page count and the updated
+    cursors.
+    """
+    query = PAGED_QUERIES[name]
+    key = query["key"]
+    column, direction = _ordering(query, sort_by)
+    clauses, params = parse_filter(filter_query, query["columns"], query["numeric"])
+
+    signature = [name, column, direction, filter_query or "", page_size]
+    if not cursors or cursors.get("signature") != signature:
+        cursors = {"signature": signature, "pages": {}}
+
+    order_by = _order_by(column, key, direction)
+
+    offset = 0
+    previous = cursors["pages"].get(str(page_current - 1))
+    if page_current > 0 and previous is not None:
+        after_value, after_key = previous
+        params["after_key"] = after_key
+        if after_value is not None:
+            params["after_value"] = after_value
+        clauses.append(_after(column, key, direction, after_value))
+    elif page_current > 0:
+        offset = page_current * page_size
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    selected = ", ".join(
+        f"t.`{col}`" for col in dict.fromkeys([*query["columns"], key])
+    )
+    sql = (
+        f"SELECT {selected} FROM ({query['sql']}) t {where} "
+        f"ORDER BY {order_by} LIMIT {int(page_size)} OFFSET {int(offset)}"
+    )
+    # The page and the total count do not depend on each other
+    df, total = run_concurrently(
+        lambda: read_sql(PAGED_STATEMENTS[name].derive(sql), params=params),
+        lambda: count_rows(name, filter_query),
+    )
+
+    if not df.empty:
+        last = df.iloc[-1]
+        cursors["pages"][str(page_current)] = [
+            _jsonable(last[column]),
+            _jsonable(last[key]),
+        ]
+
+    page_count = max(1, math.ceil(total / page_size))
+    return df[query["columns"]], page_count, cursors
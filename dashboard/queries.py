@@ -0,0 +1,219 @@
+"""Registry of the dashboard's SQL with per-query time budgets and row caps.
+
+Every statement the dashboard runs is registered once, by name, and its
+``sqlalchemy.text()`` is compiled at registration. SELECTs carry MySQL
+optimizer hints, so the server stops them itself:
+
+    SELECT /*+ MAX_EXECUTION_TIME(10000) SET_VAR(sql_select_limit = 100001) */ ...
+
+MySQL ignores both limits inside stored programs, so CALLs are instead cut
+off with ``KILL QUERY`` from a watchdog timer. A query that runs out of time
+or returns more than ``max_rows`` rows raises ``QueryLimitExceeded``.
+
+    LIBRARY = queries.register("show_gamer_library", LIBRARY_QUERY)
+    df = db.fetch_sql(LIBRARY, params={"gamer_tag": "RainbowArcher"})
+"""
+
+import functools
+import os
+import re
+import threading
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+
+import metrics
+
+# Limits for queries registered without their own
+DEFAULT_TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", "10000"))
+DEFAULT_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "100000"))
+
+# ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME) and ER_QUERY_INTERRUPTED (KILL QUERY)
+_TIMEOUT_ERRORS = {3024, 1317}
+
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+
+class QueryLimitExceeded(RuntimeError):
+    """A registered query ran past its time budget or its row cap."""
+
+
+class Query:
+    """A named statement, compiled once, with its execution limits."""
+
+    def __init__(self, name, sql, timeout_ms=None, max_rows=None, expanding=()):
+        self.name = name
+        self.sql = sql
+        self.timeout_ms = timeout_ms or DEFAULT_TIMEOUT_MS
+        self.max_rows = max_rows or DEFAULT_MAX_ROWS
+        self.hinted = bool(_SELECT.match(sql))
+        if self.hinted:
+            # One row over the cap, so exceeding it can be told apart
+            hint = (
+                f"SELECT /*+ MAX_EXECUTION_TIME({int(self.timeout_ms)}) "
+                f"SET_VAR(sql_select_limit = {int(self.max_rows) + 1}) */"
+            )
+            sql = _SELECT.sub(hint, sql, count=1)
+        self.statement = text(sql)
+        if expanding:
+            # ``IN :ids`` parameters taking a list
+            self.statement = self.statement.bindparams(
+                *(bindparam(name, expanding=True) for name in expanding)
+            )
+
+    def derive(self, sql, name=None, timeout_ms=None, max_rows=None):
+        """SQL built around this query, e.g. a page of it, with its limits.
+
+        ``timeout_ms`` and ``max_rows`` override the inherited limits.
+        """
+        return _derived(
+            self.name,
+            sql,
+            name,
+            timeout_ms or self.timeout_ms,
+            max_rows or self.max_rows,
+        )
+
+    def execute(self, connection, params=None):
+        """Run on ``connection``; returns (column names, rows)."""
+        try:
+            with self._watchdog(connection):
+                result = connection.execute(self.statement, params or {})
+                if not result.returns_rows:
+                    return [], []
+                columns = list(result.keys())
+                rows = result.fetchmany(self.max_rows + 1)
+                result.close()
+        except DBAPIError as e:
+            self._raise_timeout(e)
+            raise
+        if len(rows) > self.max_rows:
+            metrics.QUERY_LIMITS.labels(self.name, "rows").inc()
+            raise QueryLimitExceeded(
+                f"{self.name} returned more than {self.max_rows} rows"
+            )
+        return columns, rows
+
+    def stream(self, connection, params=None, chunk_size=10_000):
+        """Yield the cursor's column descriptions, then lists of rows.
+
+        The descriptions are DB-API ``cursor.description`` entries, name and
+        type code first; each list holds up to ``chunk_size`` rows.
+
+        Rows are read through an unbuffered server-side cursor, so memory
+        stays at one chunk however many rows the query returns.
+        """
+        connection = connection.execution_options(
+            stream_results=True, max_row_buffer=chunk_size
+        )
+        sent = 0
+        try:
+            with self._watchdog(connection):
+                result = connection.execute(self.statement, params or {})
+                yield list(result.cursor.description)
+                for rows in result.partitions(chunk_size):
+                    sent += len(rows)
+                    if sent > self.max_rows:
+                        result.close()
+                        metrics.QUERY_LIMITS.labels(self.name, "rows").inc()
+                        raise QueryLimitExceeded(
+                            f"{self.name} returned more than {self.max_rows} rows"
+                        )
+                    yield rows
+        except DBAPIError as e:
+            self._raise_timeout(e)
+            raise
+
+    def read(self, connection, params=None):
+        """Run on ``connection`` and return the rows as a DataFrame."""
+        columns, rows = self.execute(connection, params)
+        # DECIMAL to float, as pandas.read_sql does
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+    def _raise_timeout(self, error):
+        orig = error.orig
+        if orig is not None and orig.args and orig.args[0] in _TIMEOUT_ERRORS:
+            metrics.QUERY_LIMITS.labels(self.name, "time").inc()
+            raise QueryLimitExceeded(
+                f"{self.name} ran longer than {self.timeout_ms} ms"
+            ) from error
+
+    def _watchdog(self, connection):
+        if self.hinted or connection.dialect.name != "mysql":
+            return _NoWatchdog()
+        return _Watchdog(self, connection)
+
+
+class _NoWatchdog:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Watchdog:
+    """Send ``KILL QUERY`` for the connection once the budget runs out."""
+
+    def __init__(self, query, connection):
+        self.query = query
+        self.engine = connection.engine
+        info = connection.info
+        if "connection_id" not in info:
+            info["connection_id"] = connection.execute(
+                text("SELECT CONNECTION_ID()")
+            ).scalar()
+        self.connection_id = int(info["connection_id"])
+        self._done = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(query.timeout_ms / 1000, self._kill)
+        self._timer.daemon = True
+
+    def __enter__(self):
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc):
+        # Under the lock, so a late kill cannot hit the connection's next statement
+        with self._lock:
+            self._done = True
+        self._timer.cancel()
+        return False
+
+    def _kill(self):
+        with self._lock:
+            if self._done:
+                return
+            with self.engine.connect() as connection:
+                connection.execute(text(f"KILL QUERY {self.connection_id}"))
+
+
+@functools.lru_cache(maxsize=1024)
+def _derived(base, sql, name, timeout_ms, max_rows):
+    return Query(name or base, sql, timeout_ms=timeout_ms, max_rows=max_rows)
+
+
+def register(name, sql, timeout_ms=None, max_rows=None, expanding=()):
+    """Add a query to the registry and return it.
+
+    ``expanding`` names the parameters bound to a list, as in ``IN :ids``.
+    Registering a name again with the same SQL returns the existing query.
+    """
+    with _registry_lock:
+        existing = REGISTRY.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"query {name!r} is already registered")
+            return existing
+        query = REGISTRY[name] = Query(
+            name, sql, timeout_ms=timeout_ms, max_rows=max_rows, expanding=expanding
+        )
+        return query
+
+
+def get(name):
+    return REGISTRY[name]
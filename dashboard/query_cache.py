@@ -0,0 +1,225 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Tables whose changes invalidate cached results
+TABLES = ("Gamers", "GamePublishers", "VideoGames", "Purchases")
+
+# Tables read by the stored procedures the dashboard calls
+PROCEDURE_TABLES = {
+    "ShowGamerLibrary": ("Gamers", "Purchases", "VideoGames"),
+    "ShowGamersWithPurchases": ("Gamers", "Purchases"),
+    "ShowPurchasedGames": ("VideoGames", "Purchases"),
+}
+
+# Summary tables and the base tables whose changes they follow
+SUMMARY_TABLES = {
+    "GameSales": ("Purchases", "VideoGames"),
+    "GamerSpend": ("Purchases", "Gamers"),
+    "PublisherRevenue": ("Purchases", "VideoGames", "GamePublishers"),
+    "DailyGameSales": ("Purchases", "VideoGames"),
+    "DailyGamerSpend": ("Purchases", "Gamers"),
+}
+
+_TABLE_PATTERN = re.compile(
+    r"\b(" + "|".join(TABLES + tuple(SUMMARY_TABLES)) + r")\b", re.IGNORECASE
+)
+_CALL_PATTERN = re.compile(r"^\s*CALL\s+(\w+)", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so differently indented copies share a cache key."""
+    return " ".join(sql.split())
+
+
+def tables_for(sql):
+    """Return the set of known tables a statement reads."""
+    call = _CALL_PATTERN.match(sql)
+    if call:
+        return set(PROCEDURE_TABLES.get(call.group(1), TABLES))
+    canonical = {table.lower(): table for table in TABLES + tuple(SUMMARY_TABLES)}
+    found = set()
+    for name in _TABLE_PATTERN.findall(sql):
+        table = canonical[name.lower()]
+        found.update(SUMMARY_TABLES.get(table, (table,)))
+    # Unknown statements are tagged with everything so they never go stale
+    return found or set(TABLES)
+
+
+def _size_of(value):
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class _Pending:
+    """A load in progress; waiters get its value or exception."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def finish(self, value):
+        self._value = value
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class QueryCache:
+    """Result cache keyed by normalized SQL and parameters.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    evicted once either ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, ttl=60, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._generation = 0
+        self._uncached_versions = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(sql, params=None):
+        if params is None:
+            frozen = ()
+        elif isinstance(params, dict):
+            frozen = tuple(sorted(params.items()))
+        else:
+            frozen = tuple(params)
+        return normalize_sql(sql), frozen
+
+    def get_or_load(self, sql, loader, params=None, tables=None):
+        """Return the cached result for ``sql`` or call ``loader()`` and cache it.
+
+        Concurrent misses for the same key wait for the first loader and
+        share its result, or its exception, instead of each running the query.
+        """
+        key = self.make_key(sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+            if entry is not None:
+                self._remove(key)
+            pending = self._loading.get(key)
+            loading = pending is None
+            if loading:
+                self.misses += 1
+                pending = self._loading[key] = _Pending(self._generation)
+        if not loading:
+            return pending.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.fail(e)
+            raise
+        size = _size_of(value)
+        with self._lock:
+            # Skip caching a result that an invalidation made stale while it
+            # loaded; stored before the waiters wake, so later lookups hit
+            if pending.generation == self._generation:
+                self._store(key, sql, value, size, tables)
+            del self._loading[key]
+        pending.finish(value)
+        return value
+
+    def put(self, sql, value, params=None, tables=None):
+        key = self.make_key(sql, params)
+        size = _size_of(value)
+        with self._lock:
+            self._store(key, sql, value, size, tables)
+
+    def _store(self, key, sql, value, size, tables):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = {
+            "value": value,
+            "size": size,
+            "expires": time.monotonic() + self.ttl,
+            "tables": set(tables) if tables is not None else tables_for(sql),
+        }
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, *tables):
+        """Drop every entry that reads one of ``tables``; no tables clears all."""
+        with self._lock:
+            if not tables:
+                dropped = list(self._entries)
+            else:
+                changed = set(tables)
+                dropped = [
+                    key
+                    for key, entry in self._entries.items()
+                    if entry["tables"] & changed
+                ]
+            for key in dropped:
+                self._remove(key)
+            self._generation += 1
+            self.invalidations += len(dropped)
+        return len(dropped)
+
+    def version(self):
+        """Token that changes on every invalidation and once per ``ttl``.
+
+        Output built from cached results at the current version is still
+        up to date, so it need not be rebuilt. With ``ttl`` 0 (caching off)
+        it changes on every call.
+        """
+        with self._lock:
+            if self.ttl <= 0:
+                # Nothing is cached, so nothing built from it stays current
+                self._uncached_versions += 1
+                return [self._generation, -self._uncached_versions]
+            return [self._generation, int(time.time() // self.ttl)]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
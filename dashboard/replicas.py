@@ -0,0 +1,97 @@
+"""Send dashboard reads to MySQL replicas that are not too far behind.
+
+Replicas are listed in ``DB_READ_CONNECTIONS`` (comma separated URLs). Each
+one's ``SHOW REPLICA STATUS`` is read at most every ``check_interval``
+seconds; a replica serves reads while ``Seconds_Behind_Source`` is at most
+``max_lag``. One that lags further, has stopped replicating or cannot be
+reached is skipped until a later check finds it caught up, and with no
+replica left reads go to the primary. Writes never come through here.
+
+A server without replica status (e.g. a read-only account on the primary)
+counts as up to date. The check needs the REPLICATION CLIENT privilege.
+"""
+
+import itertools
+import threading
+import time
+
+from sqlalchemy import text
+
+import metrics
+
+STATUS_QUERY = "SHOW REPLICA STATUS"
+
+
+class Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.lag = None
+        self.healthy = False
+        self.error = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+
+class ReadRouter:
+    """Round robin over the replicas within ``max_lag`` seconds of the primary."""
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=5.0):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.replicas)
+
+    def replica(self):
+        """Engine of a replica fit to read from, or None for the primary."""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if self._healthy(replica):
+                metrics.READ_ROUTES.labels(replica.name).inc()
+                return replica.engine
+        metrics.READ_ROUTES.labels("primary").inc()
+        return None
+
+    def stats(self):
+        return {
+            "max_lag": self.max_lag,
+            "replicas": {
+                replica.name: {
+                    "url": replica.engine.url.render_as_string(hide_password=True),
+                    "healthy": replica.healthy,
+                    "lag": replica.lag,
+                    "error": replica.error,
+                }
+                for replica in self.replicas
+            },
+        }
+
+    def _healthy(self, replica):
+        checked_at = replica.checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval:
+            # One thread checks; the others go by the last result meanwhile
+            if replica._lock.acquire(blocking=False):
+                try:
+                    self._check(replica)
+                finally:
+                    replica._lock.release()
+        return replica.healthy
+
+    def _check(self, replica):
+        try:
+            with metrics.query_name("replica_status"):
+                with replica.engine.connect() as connection:
+                    status = connection.execute(text(STATUS_QUERY)).mappings().first()
+            lag = 0 if status is None else status["Seconds_Behind_Source"]
+            # NULL when the replication threads are not running
+            replica.healthy = lag is not None and lag <= self.max_lag
+            replica.lag = lag
+            replica.error = None if lag is not None else "replication stopped"
+        except Exception as e:
+            replica.healthy = False
+            replica.lag = None
+            replica.error = str(e)
+        replica.checked_at = time.monotonic()
+        metrics.REPLICA_LAG.labels(replica.name).set(
+            float("nan") if replica.lag is None else replica.lag
+        )
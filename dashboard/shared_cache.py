@@ -0,0 +1,257 @@
+"""Result cache shared by every worker process on a host.
+
+Each entry is a pickle file under one directory; a tmpfs such as /dev/shm
+keeps it in memory. Writes go to a temporary file and are renamed into
+place, so readers never see half an entry. A miss takes an ``flock`` on the
+key's lock stripe (one of ``LOCK_STRIPES`` lock files), so when several
+workers want the same result one of them loads it and the others read its
+file.
+
+Invalidation uses named counters, e.g. ``results:Purchases``. An entry
+records the counters it depends on when it is written and is stale once any
+of them has moved on:
+
+    cache.get_or_load(key, loader, counters=["results:Purchases"])
+    cache.bump("results:Purchases")
+
+Entries are unpickled, so the directory must belong to the dashboard's user
+and be closed to everyone else (mode 0700); SharedCache refuses any other,
+and a symlink.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+
+_SUFFIX = ".entry"
+_COUNTERS = "counters.json"
+
+# Lock files keys are spread over; two keys on one stripe only wait for each
+# other's loads
+LOCK_STRIPES = 64
+
+
+class SharedCache:
+    """Pickled values in files, expiring after ``ttl`` seconds.
+
+    Once the entries pass ``max_bytes`` the oldest are removed.
+    """
+
+    def __init__(self, directory, ttl=60, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # This process's lookups only
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self._writes = 0
+        # flock is per open file, so threads of one process queue here first
+        self._file_locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private(directory)
+
+    def counters(self):
+        """Current value of every counter that has been bumped."""
+        try:
+            with open(os.path.join(self.directory, _COUNTERS)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def bump(self, *names):
+        """Advance the named counters, making entries that depend on them stale.
+
+        Returns the new values.
+        """
+        with self._file_lock(_COUNTERS):
+            values = self.counters()
+            for name in names:
+                values[name] = values.get(name, 0) + 1
+            self._write(_COUNTERS, json.dumps(values).encode())
+        return {name: values[name] for name in names}
+
+    def get_or_load(self, key, loader, counters=(), ttl=None, max_age=None):
+        """Return the shared value for ``key`` or call ``loader()`` and share it.
+
+        ``max_age`` rejects entries written more than that many seconds ago,
+        however long their ``ttl``.
+        """
+        path = self._path(key)
+        value = self._read(path, counters, max_age)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        with self._file_lock(_stripe(path)):
+            # Whoever held the lock may have just written it
+            value = self._read(path, counters, max_age)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            current = self.counters()
+            # Read before loading, so a bump during the load leaves it stale
+            stamp = {name: current.get(name, 0) for name in counters}
+            value = loader()
+            self.loads += 1
+            self._put(path, value, stamp, ttl)
+        return value
+
+    def clear(self):
+        """Remove every entry and counter, e.g. before a new deployment starts.
+
+        Lock files stay: another process may hold one, and a new file under
+        the same name would not be locked.
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX) or name == _COUNTERS:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "loads": self.loads,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + _SUFFIX)
+
+    def _read(self, path, counters, max_age):
+        try:
+            with open(path, "rb") as f:
+                written, expires, stamp, value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception:
+            # Truncated by a full disk or written by another version
+            return _MISSING
+        now = time.time()
+        if expires <= now or (max_age is not None and now - written > max_age):
+            return _MISSING
+        if stamp:
+            current = self.counters()
+            if any(current.get(name, 0) != seen for name, seen in stamp.items()):
+                return _MISSING
+        return value
+
+    def _put(self, path, value, stamp, ttl):
+        now = time.time()
+        data = pickle.dumps(
+            (now, now + (self.ttl if ttl is None else ttl), stamp, value),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        if len(data) > self.max_bytes:
+            return
+        self._write(os.path.basename(path), data)
+        self._writes += 1
+        if self._writes % 32 == 0:
+            self._prune()
+
+    def _write(self, name, data):
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temporary, os.path.join(self.directory, name))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _prune(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _file_lock(self, name):
+        with self._lock:
+            lock = self._file_locks.get(name)
+            if lock is None:
+                path = os.path.join(self.directory, name + ".lock")
+                lock = self._file_locks[name] = _FileLock(path)
+        return lock
+
+
+def _stripe(path):
+    """Name of the lock stripe for an entry's path."""
+    digest = os.path.basename(path)[: -len(_SUFFIX)]
+    return f"stripe-{int(digest[:8], 16) % LOCK_STRIPES:02d}"
+
+
+def _check_private(directory):
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(
+            f"Shared cache directory {directory} must be a directory (not a "
+            "symlink) owned by this user with mode 0700"
+        )
+
+
+class _FileLock:
+    """``flock`` on a lock file, held by one thread of this process at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            os.close(self._fd)
+        finally:
+            self._thread_lock.release()
+        return False
+
+
+_MISSING = object()
@@ -0,0 +1,504 @@
+"""Columnar snapshots of gaming_db and a vectorized engine over them.
+
+``python dashboard/snapshot.py`` exports Gamers, GamePublishers, VideoGames
+and Purchases from one consistent read into a new directory of ``.npy``
+column files and points ``<dir>/current`` at it:
+
+    snapshot/
+        current -> 20250101T120000
+        20250101T120000/
+            manifest.json
+            Gamers.gamer_tag.offsets.npy   # row i is data[offsets[i]:offsets[i + 1]]
+            Gamers.gamer_tag.data.npy      # UTF-8 bytes
+            Gamers.email_domain.npy        # int codes, -1 for NULL
+            Gamers.email_domain.dict.npy   # code -> string
+            Purchases.gamer.npy            # row in Gamers
+            ...
+
+Low-cardinality strings (email domain, genre, country) are dictionary
+encoded; other strings are stored unpadded as UTF-8 bytes and offsets, the
+layout of an Arrow string array. Purchases refers to gamers and games by
+their row in the snapshot so joins are array indexing; a purchase whose
+gamer or game is missing (possible once the foreign keys are replaced by
+triggers, see mysql/PARTITION_PURCHASES.sql) is left out. Files are opened with
+``mmap_mode="r"``, so dashboard workers on one host share the page cache
+rather than each holding a copy.
+
+SnapshotAggregates builds the same frames as LiveAggregates with NumPy
+kernels (``bincount`` over the row references) and is chosen with
+``AGGREGATES_SOURCE=snapshot``. Its frames keep the mapped data: strings
+are Arrow arrays over the mapped bytes and dictionary columns categoricals
+over the mapped codes, so only aggregated output is ever decoded.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import db
+from live_aggregates import Memo
+
+# Rows read from Purchases per round trip during an export
+CHUNK_SIZE = 100_000
+
+# Dictionary-encoded string columns
+DICTIONARY_COLUMNS = {
+    "Gamers": {"email_domain"},
+    "GamePublishers": {"country"},
+    "VideoGames": {"genre"},
+}
+
+EXPORT_QUERIES = {
+    "Gamers": """
+        SELECT gamer_tag, email, email_domain, registration_date, birth_date
+        FROM Gamers
+        ORDER BY gamer_tag
+    """,
+    "GamePublishers": """
+        SELECT publisher_id, name, country, founding_date
+        FROM GamePublishers
+        ORDER BY publisher_id
+    """,
+    "VideoGames": """
+        SELECT game_id, title, release_date, genre, price, publisher_id
+        FROM VideoGames
+        ORDER BY game_id
+    """,
+}
+
+PURCHASES_QUERY = """
+    SELECT purchase_id, gamer_tag, game_id, purchase_date, price_paid
+    FROM Purchases
+    WHERE purchase_id <= :high_water
+    ORDER BY purchase_id
+"""
+
+DATE_COLUMNS = {"registration_date", "birth_date", "founding_date", "release_date"}
+
+
+def _strings(values):
+    return np.asarray(pd.Series(values).fillna("").astype(str).to_numpy(), dtype=str)
+
+
+def _utf8(values):
+    """(offsets, data) of the strings as concatenated UTF-8, NULL as ""."""
+    encoded = pd.Series(values).fillna("").astype(str).str.encode("utf-8")
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(encoded.str.len().to_numpy(dtype=np.int64), out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+def _column(table, name, values):
+    """Return {file suffix: array} for one exported column."""
+    if name in DICTIONARY_COLUMNS.get(table, ()):
+        # NULL is code -1
+        codes, dictionary = pd.factorize(pd.Series(values), sort=True)
+        dtype = np.int16 if len(dictionary) < 2**15 else np.int32
+        return {"": codes.astype(dtype), ".dict": _strings(dictionary)}
+    if name in DATE_COLUMNS:
+        return {"": pd.to_datetime(values).to_numpy().astype("datetime64[D]")}
+    if name in ("price", "price_paid"):
+        return {"": np.asarray(values, dtype=np.float64)}
+    if pd.api.types.is_integer_dtype(values):
+        return {"": np.asarray(values, dtype=np.int64)}
+    offsets, data = _utf8(values)
+    return {".offsets": offsets, ".data": data}
+
+
+def export(directory, engine=None):
+    """Write a new snapshot under ``directory`` and make it the current one."""
+    engine = engine or db.read_engine()
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    target = os.path.join(directory, stamp)
+    os.makedirs(target)
+    manifest = {"created": stamp, "tables": {}}
+
+    # One transaction, so every table comes from the same snapshot under
+    # InnoDB's default REPEATABLE READ
+    with engine.connect() as connection, connection.begin():
+        high_water = connection.execute(
+            text("SELECT COALESCE(MAX(purchase_id), 0) FROM Purchases")
+        ).scalar()
+        purchase_count = connection.execute(
+            text("SELECT COUNT(*) FROM Purchases WHERE purchase_id <= :high_water"),
+            {"high_water": high_water},
+        ).scalar()
+        frames = {
+            table: pd.read_sql(text(sql), connection)
+            for table, sql in EXPORT_QUERIES.items()
+        }
+        for table, df in frames.items():
+            manifest["tables"][table] = _write_table(target, table, df)
+
+        gamer_rows = pd.Index(frames["Gamers"]["gamer_tag"])
+        game_rows = pd.Index(frames["VideoGames"]["game_id"])
+        publisher_rows = pd.Index(frames["GamePublishers"]["publisher_id"])
+        np.save(
+            os.path.join(target, "VideoGames.publisher.npy"),
+            publisher_rows.get_indexer(frames["VideoGames"]["publisher_id"]).astype(
+                np.int32
+            ),
+        )
+        manifest["tables"]["VideoGames"]["columns"].append("publisher")
+
+        # Purchases are streamed into preallocated files
+        columns = {
+            "purchase_id": np.int64,
+            "gamer": np.int32,
+            "game": np.int32,
+            "purchase_date": "datetime64[s]",
+            "price_paid": np.float64,
+        }
+        out = {
+            name: np.lib.format.open_memmap(
+                os.path.join(target, f"Purchases.{name}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=(purchase_count,),
+            )
+            for name, dtype in columns.items()
+        }
+        start = skipped = 0
+        # An unbuffered server-side cursor: one chunk in memory at a time
+        streamed = connection.execution_options(
+            stream_results=True, max_row_buffer=CHUNK_SIZE
+        )
+        for chunk in pd.read_sql(
+            text(PURCHASES_QUERY),
+            streamed,
+            params={"high_water": high_water},
+            chunksize=CHUNK_SIZE,
+        ):
+            gamer = gamer_rows.get_indexer(chunk["gamer_tag"])
+            game = game_rows.get_indexer(chunk["game_id"])
+            found = (gamer >= 0) & (game >= 0)
+            skipped += int((~found).sum())
+            chunk = chunk[found]
+            stop = start + len(chunk)
+            out["purchase_id"][start:stop] = chunk["purchase_id"]
+            out["gamer"][start:stop] = gamer[found]
+            out["game"][start:stop] = game[found]
+            out["purchase_date"][start:stop] = (
+                pd.to_datetime(chunk["purchase_date"])
+                .to_numpy()
+                .astype("datetime64[s]")
+            )
+            out["price_paid"][start:stop] = chunk["price_paid"].astype(float)
+            start = stop
+        for array in out.values():
+            array.flush()
+        # Files are sized for every purchase; readers only use "rows"
+        manifest["tables"]["Purchases"] = {
+            "rows": start,
+            "skipped": skipped,
+            "columns": list(columns),
+        }
+        manifest["high_water"] = int(high_water)
+
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the pointer atomically; readers never see a partial snapshot
+    link = os.path.join(directory, "current")
+    tmp_link = f"{link}.{os.getpid()}"
+    os.symlink(stamp, tmp_link)
+    os.replace(tmp_link, link)
+    return target
+
+
+def _write_table(target, table, df):
+    columns = []
+    for name in df.columns:
+        for suffix, array in _column(table, name, df[name]).items():
+            np.save(os.path.join(target, f"{table}.{name}{suffix}.npy"), array)
+        columns.append(name)
+    return {"rows": len(df), "columns": columns}
+
+
+def prune(directory, keep=2):
+    """Delete all but the newest ``keep`` snapshots.
+
+    Workers still mapping a deleted snapshot keep reading it until they
+    reload; the files are only freed once unmapped.
+    """
+    current = os.path.realpath(os.path.join(directory, "current"))
+    stamps = sorted(
+        name
+        for name in os.listdir(directory)
+        if not os.path.islink(os.path.join(directory, name))
+        and os.path.isfile(os.path.join(directory, name, "manifest.json"))
+    )
+    for name in stamps[:-keep]:
+        path = os.path.join(directory, name)
+        if os.path.realpath(path) != current:
+            shutil.rmtree(path)
+
+
+def load(directory):
+    """Memory-map the current snapshot; returns (manifest, {"Table.column": array})."""
+    root = os.path.realpath(os.path.join(directory, "current"))
+    with open(os.path.join(root, "manifest.json")) as f:
+        manifest = json.load(f)
+    arrays = {}
+    purchases = manifest["tables"]["Purchases"]["rows"]
+    for name in os.listdir(root):
+        if name.endswith(".npy"):
+            array = np.load(os.path.join(root, name), mmap_mode="r")
+            if name.startswith("Purchases."):
+                array = array[:purchases]
+            arrays[name[: -len(".npy")]] = array
+    manifest["path"] = root
+    return manifest, arrays
+
+
+def _ages(birth_dates, today=None):
+    """Whole years since each birth date, as TIMESTAMPDIFF(YEAR, ...) counts them."""
+    today = today or datetime.date.today()
+    born = pd.DatetimeIndex(birth_dates)
+    years = today.year - born.year
+    before_birthday = born.month * 100 + born.day > today.month * 100 + today.day
+    return np.where(born.isna(), np.nan, years - before_birthday)
+
+
+def _categories(arrays, key, rows=None):
+    """A dictionary column as a categorical over its codes; NULL is missing.
+
+    ``rows`` picks rows by position, -1 giving a missing value.
+    """
+    codes = arrays[key]
+    if rows is not None:
+        codes = np.where(rows >= 0, codes[rows], -1)
+    return pd.Categorical.from_codes(codes, categories=arrays[f"{key}.dict"])
+
+
+def _text(arrays, key):
+    """A UTF-8 string column as an Arrow array over the mapped buffers."""
+    import pyarrow as pa
+
+    offsets, data = arrays[f"{key}.offsets"], arrays[f"{key}.data"]
+    return pa.LargeStringArray.from_buffers(
+        len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data)
+    )
+
+
+def _decoded(value):
+    """``value`` with categorical and Arrow columns as NumPy ones, NULL as None."""
+    if not isinstance(value, pd.DataFrame):
+        return value
+    columns = {}
+    for name, column in value.items():
+        dtype = column.dtype
+        if isinstance(dtype, pd.ArrowDtype) and dtype.kind in "iuf":
+            column = column.astype("float64" if column.hasnans else dtype.numpy_dtype)
+        elif isinstance(dtype, (pd.ArrowDtype, pd.CategoricalDtype)):
+            column = column.astype(object).where(column.notna(), None)
+        columns[name] = column
+    return pd.DataFrame(columns, index=value.index)
+
+
+class SnapshotAggregates:
+    """Dashboard totals computed from a memory-mapped snapshot.
+
+    Has the same ``memo``/``frame``/``stats``/``mark_stale`` interface as
+    LiveAggregates. The current snapshot is re-read when ``current`` points
+    somewhere new, checked at most every ``reload_interval`` seconds.
+    """
+
+    def __init__(self, directory, reload_interval=60.0, memo_size=256):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.manifest = None
+        self.arrays = {}
+        self.version = 0
+        self.loads = 0
+        self._checked_at = 0.0
+        self._memo = Memo(memo_size)
+        # String columns of the loaded snapshot, as Arrow arrays
+        self._texts = {}
+        self._lock = threading.RLock()
+
+    def mark_stale(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+    def refresh(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = time.monotonic()
+            root = os.path.realpath(os.path.join(self.directory, "current"))
+            if self.manifest is None or self.manifest["path"] != root:
+                self.manifest, self.arrays = load(self.directory)
+                self._texts = {}
+                self.loads += 1
+                self.version += 1
+                self._memo.clear()
+
+    def memo(self, key, build):
+        self.refresh()
+        if key[0] == "frame":
+            return self._memo.get(key, build)
+        # Chart output is small: decode it to the plain columns live mode has
+        return self._memo.get(key, lambda: _decoded(build()))
+
+    def frame(self, name, start=None, end=None):
+        """A totals frame over all purchases, or those in [start, end)."""
+        build = getattr(self, f"_{name}")
+        return self.memo(("frame", name, start, end), lambda: build(start, end))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "source": "snapshot",
+                "snapshot": self.manifest and self.manifest["created"],
+                "high_water": self.manifest and self.manifest["high_water"],
+                "version": self.version,
+                "loads": self.loads,
+                "memo_entries": len(self._memo),
+            }
+
+    def _text(self, key, rows=None):
+        """A string column for a frame; ``rows`` as in _categories."""
+        import pyarrow as pa
+
+        with self._lock:
+            if key not in self._texts:
+                self._texts[key] = _text(self.arrays, key)
+            column = self._texts[key]
+        if rows is not None:
+            column = column.take(pa.array(rows, mask=rows < 0))
+        return pd.arrays.ArrowExtensionArray(column)
+
+    def _purchases(self, start, end):
+        """Gamer rows, game rows and prices of the purchases in [start, end)."""
+        a = self.arrays
+        gamer, game = a["Purchases.gamer"], a["Purchases.game"]
+        price = a["Purchases.price_paid"]
+        if start is None and end is None:
+            return gamer, game, price
+        dates = a["Purchases.purchase_date"]
+        keep = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            keep &= dates >= np.datetime64(start)
+        if end is not None:
+            keep &= dates < np.datetime64(end)
+        return gamer[keep], game[keep], price[keep]
+
+    def _totals(self, rows, price, table):
+        """Purchase count and spend per row of ``table``."""
+        size = self.manifest["tables"][table]["rows"]
+        counts = np.bincount(rows, minlength=size)
+        spent = np.bincount(rows, weights=price, minlength=size)
+        return counts, spent
+
+    def _gamers(self, start=None, end=None):
+        a = self.arrays
+        gamer, _, price = self._purchases(start, end)
+        counts, spent = self._totals(gamer, price, "Gamers")
+        return pd.DataFrame(
+            {
+                "gamer_tag": self._text("Gamers.gamer_tag"),
+                "email": self._text("Gamers.email"),
+                "email_domain": _categories(a, "Gamers.email_domain"),
+                "age": _ages(a["Gamers.birth_date"]),
+                "purchase_count": counts,
+                "total_spent": spent,
+            }
+        )
+
+    def _games(self, start=None, end=None):
+        a = self.arrays
+        _, game, price = self._purchases(start, end)
+        counts, revenue = self._totals(game, price, "VideoGames")
+        # -1 for a game whose publisher is missing, which reads as NULL
+        publisher = a["VideoGames.publisher"]
+        return pd.DataFrame(
+            {
+                "game_id": a["VideoGames.game_id"],
+                "title": self._text("VideoGames.title"),
+                "genre": _categories(a, "VideoGames.genre"),
+                "price": a["VideoGames.price"],
+                "publisher_id": a["VideoGames.publisher_id"],
+                "publisher": self._text("GamePublishers.name", publisher),
+                "publisher_country": _categories(
+                    a, "GamePublishers.country", publisher
+                ),
+                "times_purchased": counts,
+                "revenue": revenue,
+            }
+        )
+
+    def _publishers(self, start=None, end=None):
+        a = self.arrays
+        _, game, price = self._purchases(start, end)
+        publisher = a["VideoGames.publisher"][game]
+        published = publisher >= 0
+        counts, revenue = self._totals(
+            publisher[published], price[published], "GamePublishers"
+        )
+        return pd.DataFrame(
+            {
+                "publisher_id": a["GamePublishers.publisher_id"],
+                "name": self._text("GamePublishers.name"),
+                "country": _categories(a, "GamePublishers.country"),
+                "purchase_count": counts,
+                "total_revenue": revenue,
+            }
+        )
+
+    def _domain_genres(self, start=None, end=None):
+        a = self.arrays
+        gamer, game, _ = self._purchases(start, end)
+        # Code + 1, so NULL (-1) gets bucket 0 and reads as None
+        domains = np.array([None, *a["Gamers.email_domain.dict"]], dtype=object)
+        genres = np.array([None, *a["VideoGames.genre.dict"]], dtype=object)
+        # One bucket per (domain, genre) code pair
+        pairs = (a["Gamers.email_domain"][gamer].astype(np.int64) + 1) * len(genres) + (
+            a["VideoGames.genre"][game] + 1
+        )
+        counts = np.bincount(pairs, minlength=len(domains) * len(genres))
+        present = np.flatnonzero(counts)
+        df = pd.DataFrame(
+            {
+                "email_domain": domains[present // len(genres)],
+                "genre": genres[present % len(genres)],
+                "purchase_count": counts[present],
+            }
+        )
+        return df.sort_values(
+            ["email_domain", "purchase_count"], ascending=[True, False], kind="stable"
+        ).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--dir",
+        default=os.getenv("SNAPSHOT_DIR", "snapshot"),
+        help="directory holding the snapshots (default: SNAPSHOT_DIR or ./snapshot)",
+    )
+    parser.add_argument(
+        "--keep", type=int, default=2, help="snapshots to keep after exporting"
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    os.makedirs(args.dir, exist_ok=True)
+    target = export(args.dir)
+    prune(args.dir, args.keep)
+    print(f"Snapshot written to {target} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Benchmark how long the dashboard takes to start and paint its first page.
+
+Every run starts a fresh interpreter and records:
+
+- ``import``: importing app.py, which builds the layout and callbacks
+- ``ready``: from process start until the server answers the layout request
+- ``first_paint``: from process start until the Game Analytics charts have
+  figures, either in the layout (fast boot with saved copies, see
+  first_paint.py) or from the tab's callback
+
+Results are written to JSON; with ``--baseline`` the run fails when a
+metric's p50 grew past ``--threshold`` times the baseline, so CI can track it.
+
+    python dashboard/startup_benchmark.py --runs 5 --output startup.json
+    FAST_BOOT=1 python dashboard/startup_benchmark.py --baseline startup.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+DASHBOARD = os.path.dirname(os.path.abspath(__file__))
+
+PERCENTILES = (50, 95)
+
+IMPORT_APP = (
+    "import time; started = time.perf_counter(); import app; "
+    "print(time.perf_counter() - started)"
+)
+# The production entry point, on Werkzeug rather than gunicorn
+SERVE = (
+    "import sys, wsgi; "
+    "wsgi.server.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"
+)
+
+# The Game Analytics callback as the browser sends it on first load
+GAME_TAB_CALLBACK = {
+    "output": "..popular-games.figure...price-distribution.figure..."
+    "genre-distribution.figure...game-tab-version.data..",
+    "outputs": [
+        {"id": "popular-games", "property": "figure"},
+        {"id": "price-distribution", "property": "figure"},
+        {"id": "genre-distribution", "property": "figure"},
+        {"id": "game-tab-version", "property": "data"},
+    ],
+    "inputs": [
+        {"id": "tabs", "property": "active_tab", "value": "game-tab"},
+        {"id": "date-range", "property": "start_date", "value": None},
+        {"id": "date-range", "property": "end_date", "value": None},
+        {"id": "first-paint-refresh", "property": "n_intervals", "value": None},
+    ],
+    "state": [{"id": "game-tab-version", "property": "data", "value": None}],
+    "changedPropIds": [],
+}
+
+
+def _environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [DASHBOARD, env.get("PYTHONPATH")])
+    )
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(url, payload=None, timeout=5):
+    data = None if payload is None else json.dumps(payload).encode()
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def _has_figure(node, component_id):
+    """Whether the serialized layout gives ``component_id`` a figure."""
+    if isinstance(node, dict):
+        props = node.get("props", {})
+        if props.get("id") == component_id:
+            return bool(props.get("figure"))
+        return any(_has_figure(child, component_id) for child in node.values())
+    if isinstance(node, list):
+        return any(_has_figure(child, component_id) for child in node)
+    return False
+
+
+def time_import():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_APP],
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def time_startup(timeout):
+    """Seconds from process start to a served layout and to the first paint."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVE, str(port)],
+        env=_environment(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                _, body = _request(f"{base}/_dash-layout")
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("server did not start")
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        if _has_figure(json.loads(body), "popular-games"):
+            return ready, ready
+        # No saved copy: the charts appear once the callback returns them
+        while True:
+            status, _ = _request(
+                f"{base}/_dash-update-component", GAME_TAB_CALLBACK, timeout
+            )
+            if status == 200:
+                return ready, time.perf_counter() - started
+            # 204 while a fast boot is still loading; retry like the interval
+            if time.perf_counter() > deadline:
+                raise TimeoutError("no first paint")
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _summary(samples):
+    values = np.array(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """Return regressions where p50 grew past ``threshold`` times baseline."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        old, new = before["p50_ms"], result["p50_ms"]
+        ratio = new / old if old else float("inf")
+        print(f"{name:<12} {old:>10.2f} -> {new:>10.2f} ms  x{ratio:.2f}")
+        if new > old * threshold and new - old >= min_delta_ms:
+            regressions.append((name, old, new))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="seconds to wait per start"
+    )
+    parser.add_argument("--output", default="startup_results.json")
+    parser.add_argument("--baseline", help="earlier JSON output to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail when p50 exceeds baseline times this factor",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=50.0,
+        help="ignore slowdowns smaller than this many milliseconds",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    samples = {"import": [], "ready": [], "first_paint": []}
+    for run in range(args.runs):
+        samples["import"].append(time_import())
+        ready, first_paint = time_startup(args.timeout)
+        samples["ready"].append(ready)
+        samples["first_paint"].append(first_paint)
+        print(
+            f"  run {run + 1}: import {samples['import'][-1] * 1000:>8.1f} ms  "
+            f"ready {ready * 1000:>8.1f} ms  first paint {first_paint * 1000:>8.1f} ms"
+        )
+
+    report = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "runs": args.runs,
+        "fast_boot": os.getenv("FAST_BOOT", "0") == "1",
+        "results": {name: _summary(values) for name, values in samples.items()},
+    }
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import datetime
+import os
+import threading
+
+import pandas as pd
+from pymongo import MongoClient
+
+import db
+from query_cache import QueryCache
+
+# Story analytics from the MongoDB stories collection (see mongodb/), loaded
+# by one $facet aggregation per cache TTL rather than one pipeline per chart
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "mongo_stories")
+
+# Days covered by each time-window count, ending now
+TIME_WINDOWS = {"last30Days": 30, "last90Days": 90, "last365Days": 365}
+
+stories_cache = QueryCache(ttl=float(os.getenv("STORIES_CACHE_TTL", "60")))
+
+
+def _on_invalidate(tables):
+    # Only a full invalidation; the named tables are all MySQL ones
+    if not tables:
+        stories_cache.invalidate()
+
+
+db.invalidation_listeners.append(_on_invalidate)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def collection():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                MONGO_URI,
+                tz_aware=True,
+                serverSelectionTimeoutMS=int(os.getenv("MONGO_TIMEOUT_MS", "5000")),
+            )
+        return _client[MONGO_DB]["stories"]
+
+
+def facet_pipeline(now):
+    """Every story chart's data in one round trip, windows ending at ``now``.
+
+    Reads the storyLength, lengthCategory and typed datetime fields that
+    mongodb/load_stories.py stores with each story.
+    """
+    windows = {
+        name: {
+            "$sum": {
+                "$cond": [
+                    {"$gte": ["$datetime", now - datetime.timedelta(days=days)]},
+                    1,
+                    0,
+                ]
+            }
+        }
+        for name, days in TIME_WINDOWS.items()
+    }
+    return [
+        # Leave the story text behind before the facets copy documents
+        {
+            "$project": {
+                "_id": 0,
+                "author": 1,
+                "datetime": 1,
+                "storyLength": 1,
+                "lengthCategory": 1,
+            }
+        },
+        {
+            "$facet": {
+                "authors": [
+                    {
+                        "$group": {
+                            "_id": "$author",
+                            "count": {"$sum": 1},
+                            "averageLength": {"$avg": "$storyLength"},
+                        }
+                    },
+                    {"$sort": {"count": -1, "_id": 1}},
+                ],
+                "months": [
+                    {
+                        "$group": {
+                            "_id": {
+                                "$dateToString": {
+                                    "format": "%Y-%m",
+                                    "date": "$datetime",
+                                }
+                            },
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "windows": [{"$group": {"_id": None, **windows}}],
+                "lengthCategories": [
+                    {"$group": {"_id": "$lengthCategory", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                ],
+            }
+        },
+    ]
+
+
+def _load():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    (facets,) = collection().aggregate(facet_pipeline(now))
+    authors = pd.DataFrame(facets["authors"], columns=["_id", "count", "averageLength"])
+    months = pd.DataFrame(facets["months"], columns=["_id", "count"])
+    windows = facets["windows"][0] if facets["windows"] else {}
+    categories = pd.DataFrame(facets["lengthCategories"], columns=["_id", "count"])
+    return {
+        "authors": authors.rename(columns={"_id": "author"}),
+        "months": months.rename(columns={"_id": "month"}),
+        "windows": pd.DataFrame(
+            {
+                "window": list(TIME_WINDOWS),
+                "count": [windows.get(name, 0) for name in TIME_WINDOWS],
+            }
+        ),
+        "length_categories": categories.rename(columns={"_id": "category"}),
+    }
+
+
+def story_stats():
+    """Frames for the Stories tab: authors, months, windows, length_categories."""
+    return stories_cache.get_or_load("stories:facets", _load, tables=())
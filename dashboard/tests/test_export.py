@@ -0,0 +1,102 @@
+import datetime
+import decimal
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from export import encode_csv, encode_parquet
+from queries import QueryLimitExceeded
+
+DESCRIPTION = [
+    ("game_id", FIELD_TYPE.LONG),
+    ("title", FIELD_TYPE.VAR_STRING),
+    ("price", FIELD_TYPE.NEWDECIMAL),
+    ("release_date", FIELD_TYPE.DATE),
+    ("note", None),
+]
+
+CHUNKS = [
+    [(1, "Alpha, the game", decimal.Decimal("9.99"), datetime.date(2020, 1, 2), None)],
+    [(2, "Beta", decimal.Decimal("19.50"), None, "sale")],
+]
+
+
+def failing(chunks, error):
+    yield from chunks
+    raise error
+
+
+def test_csv_header_then_one_part_per_chunk():
+    parts = list(encode_csv(DESCRIPTION, iter(CHUNKS)))
+    assert len(parts) == 3
+    assert b"".join(parts).decode().splitlines() == [
+        "game_id,title,price,release_date,note",
+        '1,"Alpha, the game",9.99,2020-01-02,',
+        "2,Beta,19.50,,sale",
+    ]
+
+
+def test_csv_without_rows_is_just_the_header():
+    assert b"".join(encode_csv(DESCRIPTION, iter([]))) == (
+        b"game_id,title,price,release_date,note\r\n"
+    )
+
+
+def test_csv_cut_off_ends_with_the_reason_and_raises():
+    parts = []
+    error = QueryLimitExceeded("export returned more than 1 rows")
+    with pytest.raises(QueryLimitExceeded):
+        for part in encode_csv(DESCRIPTION, failing(CHUNKS[:1], error)):
+            parts.append(part)
+    assert parts[-1] == b"# export incomplete: export returned more than 1 rows\n"
+
+
+def test_csv_hides_other_errors():
+    parts = []
+    with pytest.raises(RuntimeError):
+        for part in encode_csv(DESCRIPTION, failing([], RuntimeError("secret"))):
+            parts.append(part)
+    assert parts[-1] == b"# export incomplete: the query failed\n"
+
+
+def test_parquet_one_row_group_per_chunk_typed_from_the_cursor():
+    data = b"".join(encode_parquet(DESCRIPTION, iter(CHUNKS)))
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.schema.types == [
+        pa.int64(),
+        pa.string(),
+        pa.float64(),
+        pa.date32(),
+        pa.string(),
+    ]
+    assert table.column("price").to_pylist() == [9.99, 19.5]
+    assert table.column("release_date").to_pylist() == [
+        datetime.date(2020, 1, 2),
+        None,
+    ]
+    assert table.column("note").to_pylist() == [None, "sale"]
+
+
+def test_parquet_without_rows_keeps_the_columns():
+    data = b"".join(encode_parquet(DESCRIPTION, iter([])))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 0
+    assert table.column_names == [column[0] for column in DESCRIPTION]
+
+
+def test_parquet_cut_off_has_no_footer():
+    parts = []
+    error = QueryLimitExceeded("export returned more than 1 rows")
+    with pytest.raises(QueryLimitExceeded):
+        for part in encode_parquet(DESCRIPTION, failing(CHUNKS[:1], error)):
+            parts.append(part)
+    data = b"".join(parts)
+    assert data.startswith(b"PAR1")
+    assert not data.endswith(b"PAR1")
+    with pytest.raises(pa.ArrowInvalid):
+        pq.read_table(io.BytesIO(data))
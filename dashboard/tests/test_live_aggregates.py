@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import db
+from live_aggregates import LiveAggregates, Memo
+
+
+def purchases(*rows):
+    return pd.DataFrame(
+        rows, columns=["purchase_id", "gamer_tag", "game_id", "price_paid"]
+    )
+
+
+@pytest.fixture
+def live():
+    aggregates = LiveAggregates({}, batch_size=10)
+    aggregates.high_water = 100
+    aggregates.gamers = {
+        "ann": {"purchase_count": 0, "total_spent": 0.0, "email_domain": "a.com"},
+    }
+    aggregates.games = {
+        1: {"times_purchased": 0, "revenue": 0.0, "publisher_id": 7, "genre": "RPG"},
+    }
+    aggregates.publishers = {7: {"purchase_count": 0, "total_revenue": 0.0}}
+    return aggregates
+
+
+def test_memo_builds_once_per_key():
+    memo = Memo()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return len(calls)
+
+    assert memo.get("a", build) == 1
+    assert memo.get("a", build) == 1
+    assert len(calls) == 1
+
+
+def test_memo_drops_least_recently_used():
+    memo = Memo(max_entries=2)
+    memo.get("a", lambda: 1)
+    memo.get("b", lambda: 2)
+    memo.get("a", lambda: None)
+    memo.get("c", lambda: 3)
+    assert len(memo) == 2
+    assert memo.get("a", lambda: "rebuilt") == 1
+    assert memo.get("b", lambda: "rebuilt") == "rebuilt"
+
+
+def test_memo_does_not_keep_failed_builds():
+    memo = Memo()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        memo.get("a", fail)
+    assert memo.get("a", lambda: 1) == 1
+
+
+def test_memo_value_built_across_a_clear_is_not_kept():
+    memo = Memo()
+
+    def build():
+        memo.clear()
+        return "old"
+
+    assert memo.get("a", build) == "old"
+    assert memo.get("a", lambda: "new") == "new"
+
+
+def test_memo_concurrent_callers_share_one_build():
+    memo = Memo()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    first = threading.Thread(target=lambda: results.append(memo.get("a", build)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(memo.get("a", build)))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert results == ["value", "value"]
+    assert len(calls) == 1
+
+
+def test_apply_adds_to_every_total(live):
+    assert live._apply(purchases((101, "ann", 1, 9.5), (102, "ann", 1, 0.5)), 0) == 2
+    assert live.high_water == 102
+    assert live.gamers["ann"]["purchase_count"] == 2
+    assert live.gamers["ann"]["total_spent"] == 10.0
+    assert live.games[1]["times_purchased"] == 2
+    assert live.games[1]["revenue"] == 10.0
+    assert live.publishers[7] == {"purchase_count": 2, "total_revenue": 10.0}
+    assert live.domain_genres == {("a.com", "RPG"): 2}
+
+
+def test_apply_skips_purchases_already_applied(live):
+    live._apply(purchases((101, "ann", 1, 1.0)), 0)
+    assert live._apply(purchases((101, "ann", 1, 1.0)), 0) == 0
+    assert live.gamers["ann"]["purchase_count"] == 1
+
+
+def test_apply_records_skipped_ids_and_fills_them_once(live):
+    live._apply(purchases((103, "ann", 1, 1.0)), 5.0)
+    assert live._gaps == {101: 5.0, 102: 5.0}
+    # A purchase that committed late shows up below the mark
+    assert live._apply(purchases((102, "ann", 1, 1.0)), 6.0) == 1
+    assert live._gaps == {101: 5.0}
+    assert live._apply(purchases((102, "ann", 1, 1.0)), 7.0) == 0
+    assert live.gamers["ann"]["purchase_count"] == 2
+
+
+def test_apply_does_not_wait_on_more_ids_than_a_batch(live):
+    live._apply(purchases((200, "ann", 1, 1.0)), 0)
+    assert live._gaps == {}
+    assert live.high_water == 200
+
+
+def test_apply_returns_none_for_an_unknown_gamer_or_game(live):
+    assert live._apply(purchases((101, "bob", 1, 1.0)), 0) is None
+    assert live._apply(purchases((102, "ann", 2, 1.0)), 0) is None
+
+
+def test_poll_reads_gaps_by_id_and_new_purchases_from_the_mark(live, monkeypatch):
+    live._apply(purchases((102, "ann", 1, 1.0)), time.monotonic())
+    reads = []
+
+    def fetch_sql(query, params=None, primary=False):
+        reads.append((query.name, params))
+        if query is live.gap_purchases:
+            return purchases((101, "ann", 1, 1.0))
+        return purchases((103, "ann", 1, 1.0))
+
+    monkeypatch.setattr(db, "fetch_sql", fetch_sql)
+    live._poll()
+    assert reads == [
+        ("live_gap_purchases", {"ids": [101]}),
+        ("live_new_purchases", {"after": 102, "batch_size": 10}),
+    ]
+    assert live._gaps == {}
+    assert live.high_water == 103
+    assert live.gamers["ann"]["purchase_count"] == 3
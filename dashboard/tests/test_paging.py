@@ -0,0 +1,97 @@
+from paging import PAGED_QUERIES, _after, parse_filter
+
+COLUMNS = ["gamer_tag", "email", "games_purchased"]
+NUMERIC = ["games_purchased"]
+
+
+def test_empty_filter():
+    assert parse_filter(None, COLUMNS) == ([], {})
+    assert parse_filter("", COLUMNS) == ([], {})
+
+
+def test_numeric_column_binds_numbers():
+    clauses, params = parse_filter("{games_purchased} >= 3", COLUMNS, NUMERIC)
+    assert clauses == ["t.`games_purchased` >= :f0"]
+    assert params == {"f0": 3}
+    _, params = parse_filter("{games_purchased} lt 2.5", COLUMNS, NUMERIC)
+    assert params == {"f0": 2.5}
+
+
+def test_text_column_binds_strings():
+    # A number would make MySQL cast every gamer_tag to compare it
+    clauses, params = parse_filter("{gamer_tag} = 0", COLUMNS, NUMERIC)
+    assert clauses == ["t.`gamer_tag` = :f0"]
+    assert params == {"f0": "0"}
+
+
+def test_quoted_values_are_unquoted():
+    _, params = parse_filter('{gamer_tag} s= "Rain \\"Bow\\""', COLUMNS, NUMERIC)
+    assert params == {"f0": 'Rain "Bow"'}
+    _, params = parse_filter("{games_purchased} = '3'", COLUMNS, NUMERIC)
+    assert params == {"f0": "3"}
+
+
+def test_contains_escapes_like_wildcards():
+    clauses, params = parse_filter("{email} contains 50%_off", COLUMNS, NUMERIC)
+    assert clauses == ["t.`email` LIKE :f0"]
+    assert params == {"f0": "%50\\%\\_off%"}
+
+
+def test_datestartswith_is_a_prefix_match():
+    _, params = parse_filter("{email} datestartswith 2024-0", COLUMNS, NUMERIC)
+    assert params == {"f0": "2024-0%"}
+
+
+def test_parts_are_combined_and_numbered():
+    clauses, params = parse_filter(
+        "{gamer_tag} contains Arch && {games_purchased} > 1", COLUMNS, NUMERIC
+    )
+    assert clauses == ["t.`gamer_tag` LIKE :f0", "t.`games_purchased` > :f1"]
+    assert params == {"f0": "%Arch%", "f1": 1}
+
+
+def test_unknown_columns_and_operators_are_ignored():
+    clauses, params = parse_filter(
+        "{password} = x && {gamer_tag} like x && {email}; DROP TABLE Gamers",
+        COLUMNS,
+        NUMERIC,
+    )
+    assert clauses == []
+    assert params == {}
+
+
+def test_every_paged_query_lists_its_numeric_columns():
+    for query in PAGED_QUERIES.values():
+        assert set(query["numeric"]) <= set(query["columns"])
+
+
+def test_after_on_the_key_alone():
+    assert _after("gamer_tag", "gamer_tag", "asc", "x") == "t.`gamer_tag` > :after_key"
+    assert _after("gamer_tag", "gamer_tag", "desc", "x") == "t.`gamer_tag` < :after_key"
+
+
+def test_after_value_ascending():
+    assert _after("price", "game_id", "asc", 9.99) == (
+        "(t.`price`, t.`game_id`) > (:after_value, :after_key)"
+    )
+
+
+def test_after_value_descending_continues_into_nulls():
+    # Descending, NULLs sort last and follow every value
+    assert _after("price", "game_id", "desc", 9.99) == (
+        "((t.`price`, t.`game_id`) < (:after_value, :after_key) "
+        "OR t.`price` IS NULL)"
+    )
+
+
+def test_after_null_ascending_continues_into_values():
+    # Ascending, NULLs sort first and every value follows them
+    assert _after("price", "game_id", "asc", None) == (
+        "((t.`price` IS NULL AND t.`game_id` > :after_key) OR t.`price` IS NOT NULL)"
+    )
+
+
+def test_after_null_descending_stays_among_nulls():
+    assert _after("price", "game_id", "desc", None) == (
+        "(t.`price` IS NULL AND t.`game_id` < :after_key)"
+    )
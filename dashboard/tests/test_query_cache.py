@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from query_cache import QueryCache, normalize_sql, tables_for
+
+
+def test_normalize_sql_collapses_whitespace():
+    assert normalize_sql("SELECT *\n    FROM  Gamers ") == "SELECT * FROM Gamers"
+
+
+def test_tables_for_expands_summary_tables():
+    assert tables_for("SELECT * FROM GameSales") == {"Purchases", "VideoGames"}
+    assert tables_for("CALL ShowPurchasedGames()") == {"VideoGames", "Purchases"}
+    # Unknown statements depend on everything
+    assert tables_for("SELECT 1") == {
+        "Gamers",
+        "GamePublishers",
+        "VideoGames",
+        "Purchases",
+    }
+
+
+def test_hit_after_miss():
+    cache = QueryCache()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return "rows"
+
+    assert cache.get_or_load("SELECT * FROM Gamers", load) == "rows"
+    assert cache.get_or_load("SELECT *   FROM Gamers", load) == "rows"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_params_are_part_of_the_key():
+    cache = QueryCache()
+    sql = "SELECT * FROM Gamers WHERE gamer_tag = :tag"
+    assert cache.get_or_load(sql, lambda: "a", {"tag": "a"}) == "a"
+    assert cache.get_or_load(sql, lambda: "b", {"tag": "b"}) == "b"
+    assert cache.get_or_load(sql, lambda: "x", {"tag": "a"}) == "a"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = QueryCache(ttl=10)
+    cache.put("SELECT 1", "old")
+    now[0] += 11
+    assert cache.get_or_load("SELECT 1", lambda: "new") == "new"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.put("SELECT 1", 1)
+    cache.put("SELECT 2", 2)
+    cache.get_or_load("SELECT 1", lambda: None)
+    cache.put("SELECT 3", 3)
+    assert cache.get_or_load("SELECT 2", lambda: "reloaded") == "reloaded"
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_invalidate_drops_only_dependent_entries():
+    cache = QueryCache()
+    cache.put("SELECT * FROM Gamers", "gamers")
+    cache.put("SELECT * FROM GamePublishers", "publishers")
+    assert cache.invalidate("Gamers") == 1
+    assert cache.get_or_load("SELECT * FROM Gamers", lambda: "fresh") == "fresh"
+    assert cache.get_or_load("SELECT * FROM GamePublishers", lambda: None) == (
+        "publishers"
+    )
+
+
+def test_result_loaded_across_an_invalidation_is_not_kept():
+    cache = QueryCache()
+
+    def load():
+        cache.invalidate("Gamers")
+        return "stale"
+
+    assert cache.get_or_load("SELECT * FROM Gamers", load) == "stale"
+    assert cache.get_or_load("SELECT * FROM Gamers", lambda: "fresh") == "fresh"
+
+
+def test_concurrent_misses_share_one_load():
+    cache = QueryCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "rows"
+
+    results = []
+    first = threading.Thread(
+        target=lambda: results.append(cache.get_or_load("SELECT 1", load))
+    )
+    first.start()
+    started.wait(5)
+    second = threading.Thread(
+        target=lambda: results.append(cache.get_or_load("SELECT 1", load))
+    )
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert results == ["rows", "rows"]
+    assert len(calls) == 1
+
+
+def test_failed_load_is_not_cached():
+    cache = QueryCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("SELECT 1", fail)
+    assert cache.get_or_load("SELECT 1", lambda: "ok") == "ok"
+
+
+def test_version_changes_on_invalidation():
+    cache = QueryCache(ttl=60)
+    before = cache.version()
+    assert cache.version() == before
+    cache.invalidate()
+    assert cache.version() != before
+
+
+def test_version_with_caching_off_changes_on_every_call():
+    cache = QueryCache(ttl=0)
+    assert cache.version() != cache.version()
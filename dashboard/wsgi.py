@@ -0,0 +1,20 @@
+"""Production entry point: the dashboard's WSGI server, for gunicorn.
+
+    gunicorn -c dashboard/gunicorn.conf.py
+
+gunicorn.conf.py sets the worker and thread counts and points every worker
+at one shared cache directory (see shared_cache.py). Each worker imports
+this module, and so loads the chart data and builds the opening figures
+(``app.warm``), before it takes a request. The first worker to need a
+result loads it and the others read it from the shared cache.
+
+With ``FAST_BOOT=1`` the warm-up runs in the background instead and the
+first pages are served from the last saved figures (see first_paint.py).
+"""
+
+import first_paint
+from app import app, warm
+
+server = app.server
+
+first_paint.start(warm)
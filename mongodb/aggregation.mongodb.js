@@ -1,38 +1,40 @@
 // MongoDB Playground
 // Use Ctrl+Space inside a snippet or a string literal to trigger completions.
 
+// The pipelines read storyLength, lengthCategory and the typed datetime
+// stored at load time, and the indexes from initiliaze-db.mongodb.js.
+
 // The current database to use.
 use("mongo_stories");
 
 // Count stories by author
+// (sorting on author first lets the author index cover the whole pipeline)
 use("mongo_stories");
 db.stories.aggregate([
+  { $sort: { author: 1 } },
+  { $project: { _id: 0, author: 1 } },
   { $group: { _id: "$author", count: { $sum: 1 } } },
   { $sort: { count: -1 } },
 ]);
 
 // Stories published per month
+// (covered by the datetime index)
 use("mongo_stories");
 db.stories.aggregate([
+  { $sort: { datetime: -1 } },
+  { $project: { _id: 0, datetime: 1 } },
   {
-    $addFields: {
-      monthYear: {
-        $substr: ["$datetime", 0, 7],
-      },
+    $group: {
+      _id: { $dateToString: { format: "%Y-%m", date: "$datetime" } },
+      count: { $sum: 1 },
     },
   },
-  { $group: { _id: "$monthYear", count: { $sum: 1 } } },
   { $sort: { _id: -1 } },
 ]);
 
 // Average story length by author
 use("mongo_stories");
 db.stories.aggregate([
-  {
-    $addFields: {
-      storyLength: { $strLenCP: "$story" },
-    },
-  },
   {
     $group: {
       _id: "$author",
@@ -44,43 +46,30 @@ db.stories.aggregate([
 ]);
 
 // Story counts by time period
+// (one indexed range scan over the widest window instead of a $facet, whose
+// sub-pipelines cannot use indexes)
 use("mongo_stories");
 db.stories.aggregate([
+  { $match: { datetime: { $gte: ISODate("2023-03-15") } } },
+  { $project: { _id: 0, datetime: 1 } },
   {
-    $facet: {
-      last30Days: [
-        { $match: { datetime: { $gte: "2024-02-15" } } },
-        { $count: "count" },
-      ],
-      last90Days: [
-        { $match: { datetime: { $gte: "2023-12-15" } } },
-        { $count: "count" },
-      ],
-      last365Days: [
-        { $match: { datetime: { $gte: "2023-03-15" } } },
-        { $count: "count" },
-      ],
+    $group: {
+      _id: null,
+      last30Days: {
+        $sum: { $cond: [{ $gte: ["$datetime", ISODate("2024-02-15")] }, 1, 0] },
+      },
+      last90Days: {
+        $sum: { $cond: [{ $gte: ["$datetime", ISODate("2023-12-15")] }, 1, 0] },
+      },
+      last365Days: { $sum: 1 },
     },
   },
+  { $project: { _id: 0 } },
 ]);
 
 // Stories by length categories
 use("mongo_stories");
 db.stories.aggregate([
-  {
-    $addFields: {
-      storyLength: { $strLenCP: "$story" },
-      lengthCategory: {
-        $switch: {
-          branches: [
-            { case: { $lt: [{ $strLenCP: "$story" }, 500] }, then: "Short" },
-            { case: { $lt: [{ $strLenCP: "$story" }, 1000] }, then: "Medium" },
-          ],
-          default: "Long",
-        },
-      },
-    },
-  },
   { $group: { _id: "$lengthCategory", count: { $sum: 1 } } },
   { $sort: { count: -1 } },
 ]);
@@ -0,0 +1,353 @@
+"""Compare the story queries before and after precomputed metrics and indexes.
+
+Builds two scaled-up copies of Short_Stories.json: one as the original
+initializer stored it (string dates, no derived fields, no indexes) and one
+as load_stories.py stores it. It then runs the original and the rewritten
+versions of the queries in find-query.mongodb.js and aggregation.mongodb.js
+against them, reporting p50/p95 latency and the speedup.
+
+    python mongodb/benchmark.py --scale 1000 --output mongo_bench.json
+
+The benchmark collections are dropped afterwards unless ``--keep`` is given.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+import dotenv
+import numpy as np
+from pymongo import MongoClient
+
+import load_stories
+
+PERCENTILES = (50, 95)
+
+
+def _date(text):
+    return datetime.datetime.fromisoformat(text).replace(tzinfo=datetime.timezone.utc)
+
+
+def _length_switch(length):
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$lt": [length, 500]}, "then": "Short"},
+                {"case": {"$lt": [length, 1000]}, "then": "Medium"},
+            ],
+            "default": "Long",
+        }
+    }
+
+
+# name -> (original, rewritten); each is ("find", filter, sort, limit) or
+# ("aggregate", pipeline)
+QUERIES = {
+    "find_title": (
+        ("find", {"title": "The Fox and The Grapes #0"}, None, 0),
+        ("find", {"title": "The Fox and The Grapes #0"}, None, 0),
+    ),
+    "find_recent": (
+        ("find", {}, [("datetime", -1)], 5),
+        ("find", {}, [("datetime", -1)], 5),
+    ),
+    "find_before": (
+        ("find", {"datetime": {"$lt": "2024-04-18"}}, None, 0),
+        ("find", {"datetime": {"$lt": _date("2024-04-18")}}, None, 0),
+    ),
+    "find_author": (
+        ("find", {"author": "Rajesh Kumar Verma"}, None, 0),
+        ("find", {"author": "Rajesh Kumar Verma"}, None, 0),
+    ),
+    "find_author_recent": (
+        ("find", {"author": "Rajesh Kumar Verma"}, [("datetime", -1)], 5),
+        ("find", {"author": "Rajesh Kumar Verma"}, [("datetime", -1)], 5),
+    ),
+    "count_by_author": (
+        (
+            "aggregate",
+            [
+                {"$group": {"_id": "$author", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+        ),
+        (
+            "aggregate",
+            [
+                {"$sort": {"author": 1}},
+                {"$project": {"_id": 0, "author": 1}},
+                {"$group": {"_id": "$author", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+        ),
+    ),
+    "per_month": (
+        (
+            "aggregate",
+            [
+                {"$addFields": {"monthYear": {"$substr": ["$datetime", 0, 7]}}},
+                {"$group": {"_id": "$monthYear", "count": {"$sum": 1}}},
+                {"$sort": {"_id": -1}},
+            ],
+        ),
+        (
+            "aggregate",
+            [
+                {"$sort": {"datetime": -1}},
+                {"$project": {"_id": 0, "datetime": 1}},
+                {
+                    "$group": {
+                        "_id": {
+                            "$dateToString": {"format": "%Y-%m", "date": "$datetime"}
+                        },
+                        "count": {"$sum": 1},
+                    }
+                },
+                {"$sort": {"_id": -1}},
+            ],
+        ),
+    ),
+    "avg_length_by_author": (
+        (
+            "aggregate",
+            [
+                {"$addFields": {"storyLength": {"$strLenCP": "$story"}}},
+                {
+                    "$group": {
+                        "_id": "$author",
+                        "averageLength": {"$avg": "$storyLength"},
+                        "totalStories": {"$sum": 1},
+                    }
+                },
+                {"$sort": {"averageLength": -1, "totalStories": -1}},
+            ],
+        ),
+        (
+            "aggregate",
+            [
+                {
+                    "$group": {
+                        "_id": "$author",
+                        "averageLength": {"$avg": "$storyLength"},
+                        "totalStories": {"$sum": 1},
+                    }
+                },
+                {"$sort": {"averageLength": -1, "totalStories": -1}},
+            ],
+        ),
+    ),
+    "time_windows": (
+        (
+            "aggregate",
+            [
+                {
+                    "$facet": {
+                        "last30Days": [
+                            {"$match": {"datetime": {"$gte": "2024-02-15"}}},
+                            {"$count": "count"},
+                        ],
+                        "last90Days": [
+                            {"$match": {"datetime": {"$gte": "2023-12-15"}}},
+                            {"$count": "count"},
+                        ],
+                        "last365Days": [
+                            {"$match": {"datetime": {"$gte": "2023-03-15"}}},
+                            {"$count": "count"},
+                        ],
+                    }
+                }
+            ],
+        ),
+        (
+            "aggregate",
+            [
+                {"$match": {"datetime": {"$gte": _date("2023-03-15")}}},
+                {"$project": {"_id": 0, "datetime": 1}},
+                {
+                    "$group": {
+                        "_id": None,
+                        "last30Days": {
+                            "$sum": {
+                                "$cond": [
+                                    {"$gte": ["$datetime", _date("2024-02-15")]},
+                                    1,
+                                    0,
+                                ]
+                            }
+                        },
+                        "last90Days": {
+                            "$sum": {
+                                "$cond": [
+                                    {"$gte": ["$datetime", _date("2023-12-15")]},
+                                    1,
+                                    0,
+                                ]
+                            }
+                        },
+                        "last365Days": {"$sum": 1},
+                    }
+                },
+                {"$project": {"_id": 0}},
+            ],
+        ),
+    ),
+    "length_categories": (
+        (
+            "aggregate",
+            [
+                {
+                    "$addFields": {
+                        "storyLength": {"$strLenCP": "$story"},
+                        "lengthCategory": _length_switch({"$strLenCP": "$story"}),
+                    }
+                },
+                {"$group": {"_id": "$lengthCategory", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+        ),
+        (
+            "aggregate",
+            [
+                {"$group": {"_id": "$lengthCategory", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+        ),
+    ),
+}
+
+
+def scaled_stories(path, scale, seed=0):
+    """Yield ``scale`` copies of the stories with distinct titles and dates.
+
+    Each copy gets a " #n" title suffix and is shifted back by up to two
+    years, and authors get one of ten suffixes so there are ten times as
+    many of them as in the sample.
+    """
+    rng = random.Random(seed)
+    with open(path) as f:
+        stories = json.load(f)
+    for copy in range(scale):
+        days = rng.randrange(730)
+        for story in stories:
+            published = datetime.datetime.fromisoformat(story["datetime"])
+            published -= datetime.timedelta(days=days, seconds=rng.randrange(86400))
+            author = story["author"]
+            if copy % 10:
+                author = f"{author} {copy % 10}"
+            yield {
+                **story,
+                "title": f"{story['title']} #{copy}",
+                "author": author,
+                "datetime": published.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            }
+
+
+def build(database, path, scale, batch_size, workers):
+    """Load the original and the precomputed layout; returns both collections."""
+    before = database["stories_bench_before"]
+    after = database["stories_bench_after"]
+    before.drop()
+    after.drop()
+    load_stories.load(scaled_stories(path, scale), before, batch_size, workers)
+    load_stories.load(
+        (load_stories.prepare(story) for story in scaled_stories(path, scale)),
+        after,
+        batch_size,
+        workers,
+    )
+    load_stories.ensure_indexes(after)
+    return before, after
+
+
+def execute(collection, query):
+    if query[0] == "find":
+        _, filter, sort, limit = query
+        cursor = collection.find(filter, limit=limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        return list(cursor)
+    return list(collection.aggregate(query[1]))
+
+
+def _summary(samples):
+    values = np.array(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+
+
+def run(collection, query, runs):
+    # The first run warms the cache and is discarded
+    rows = len(execute(collection, query))
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        execute(collection, query)
+        samples.append(time.perf_counter() - started)
+    return {**_summary(samples), "rows": rows}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uri", default=None)
+    parser.add_argument("--db", default="mongo_stories")
+    parser.add_argument("--path", default=load_stories.DEFAULT_PATH)
+    parser.add_argument(
+        "--scale", type=int, default=1000, help="copies of the sample stories"
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", default="mongo_benchmark_results.json")
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the benchmark collections"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dotenv.load_dotenv(".env")
+    uri = args.uri or os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    client = MongoClient(uri, tz_aware=True)
+    database = client[args.db]
+
+    print(f"Loading {args.scale} copies of the stories...")
+    before, after = build(
+        database, args.path, args.scale, args.batch_size, args.workers
+    )
+    report = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "documents": after.estimated_document_count(),
+        "runs": args.runs,
+        "results": {},
+    }
+    try:
+        for name, (original, rewritten) in QUERIES.items():
+            result = {
+                "before": run(before, original, args.runs),
+                "after": run(after, rewritten, args.runs),
+            }
+            old, new = result["before"]["p50_ms"], result["after"]["p50_ms"]
+            result["speedup"] = round(old / new, 2) if new else None
+            report["results"][name] = result
+            print(
+                f"  {name:<24} {old:>10.2f} -> {new:>10.2f} ms p50  "
+                f"x{result['speedup']}  {result['after']['rows']:>7} rows"
+            )
+    finally:
+        if not args.keep:
+            before.drop()
+            after.drop()
+        client.close()
+
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,18 +18,18 @@ db.stories.find().sort({ datetime: -1 }).limit(5);
 
 // Find stories before 18 April 2024
 use("mongo_stories");
-db.stories.find({ datetime: { $lt: "2024-04-18" } });
+db.stories.find({ datetime: { $lt: ISODate("2024-04-18") } });
 
 // Find stories after 18 April 2024
 use("mongo_stories");
-db.stories.find({ datetime: { $gt: "2024-04-18" } });
+db.stories.find({ datetime: { $gt: ISODate("2024-04-18") } });
 
 // Find random one story between 15 Jan 2024 and 18 April 2024
 use("mongo_stories");
 db.stories.aggregate([
   {
     $match: {
-      datetime: { $gte: "2024-01-15", $lte: "2024-04-18" },
+      datetime: { $gte: ISODate("2024-01-15"), $lte: ISODate("2024-04-18") },
     },
   },
   { $sample: { size: 1 } },
@@ -42,3 +42,18 @@ db.stories.distinct("author");
 // Find all Stories by author "Rajesh Kumar Verma"
 use("mongo_stories");
 db.stories.find({ author: "Rajesh Kumar Verma" });
+
+// Find the latest stories by author "Rajesh Kumar Verma"
+use("mongo_stories");
+db.stories.find({ author: "Rajesh Kumar Verma" }).sort({ datetime: -1 }).limit(5);
+
+// Search titles, morals and stories for "fox grapes", best matches first
+// (uses the story_text index; see search.py for a paginated Python API)
+use("mongo_stories");
+db.stories
+  .find(
+    { $text: { $search: "fox grapes" } },
+    { title: 1, author: 1, score: { $meta: "textScore" } }
+  )
+  .sort({ score: { $meta: "textScore" } })
+  .limit(10);
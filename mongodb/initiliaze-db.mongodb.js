@@ -47,7 +47,35 @@ const loadData = (filePath) => {
   return JSON.parse(data);
 };
 
+// Story lengths and categories are computed once here (and by
+// load_stories.py) so the pipelines do not run $strLenCP on every story.
+const lengthCategory = (length) =>
+  length < 500 ? "Short" : length < 1000 ? "Medium" : "Long";
+
 const documents = loadData(
   "/Users/captain-mac/IdeaProjects/AdvancedDatabasesProject/mongodb/Short_Stories.json"
-);
+).map((story) => {
+  const storyLength = [...story.story].length;
+  return {
+    ...story,
+    datetime: new Date(story.datetime),
+    storyLength,
+    lengthCategory: lengthCategory(storyLength),
+  };
+});
 db.stories.insertMany(documents);
+
+// Indexes for the find queries and pipelines; keep in sync with INDEXES in
+// load_stories.py
+db.stories.createIndex({ author: 1 }, { name: "author" });
+db.stories.createIndex({ datetime: -1 }, { name: "datetime" });
+db.stories.createIndex({ author: 1, datetime: -1 }, { name: "author_datetime" });
+db.stories.createIndex({ title: 1 }, { name: "title" });
+db.stories.createIndex(
+  { title: "text", moral: "text", story: "text" },
+  {
+    name: "story_text",
+    weights: { title: 10, moral: 5, story: 1 },
+    default_language: "english",
+  }
+);
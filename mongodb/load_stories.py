@@ -0,0 +1,313 @@
+"""Stream a JSON array of stories into MongoDB.
+
+The file is parsed one element at a time, so memory depends on the batch
+size rather than the size of the dump. ``datetime`` strings become BSON
+dates, ``storyLength`` and ``lengthCategory`` are computed once here instead
+of in every pipeline, and batches are written unordered by a small pool of
+writer threads with a bounded number of batches in flight. The indexes in
+``INDEXES`` and the text index are created after the load.
+
+Examples:
+
+    # Short_Stories.json into mongo_stories.stories on localhost
+    python mongodb/load_stories.py
+
+    # a large dump, replacing the collection
+    python mongodb/load_stories.py /data/stories.json --drop --workers 8
+
+    # parse and "insert" into an in-memory mongomock collection
+    python mongodb/load_stories.py --mock
+"""
+
+import argparse
+import codecs
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import dotenv
+from pymongo import ASCENDING, DESCENDING, TEXT, MongoClient
+from pymongo.errors import BulkWriteError
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "Short_Stories.json")
+
+# Fields holding ISO 8601 timestamps, e.g. "2024-07-29T07:35:54.000Z"
+DATE_FIELDS = ("datetime",)
+
+# Upper bounds (exclusive, in code points) of the story length categories;
+# longer stories are "Long"
+LENGTH_CATEGORIES = (("Short", 500), ("Medium", 1000))
+
+# Indexes used by find-query.mongodb.js and aggregation.mongodb.js
+INDEXES = {
+    "author": [("author", ASCENDING)],
+    "datetime": [("datetime", DESCENDING)],
+    "author_datetime": [("author", ASCENDING), ("datetime", DESCENDING)],
+    "title": [("title", ASCENDING)],
+}
+
+# Relative weight of each field in full-text search (see search.py); a
+# collection can have only one text index
+TEXT_WEIGHTS = {"title": 10, "moral": 5, "story": 1}
+TEXT_INDEX = "story_text"
+
+# Characters read from the file at a time
+READ_SIZE = 1 << 20
+
+_WHITESPACE = " \t\n\r"
+
+# Characters a JSON number can start with, and those that can end one
+_NUMBER_START = "-0123456789"
+_NUMBER_END = re.compile(r"[ \t\n\r,\]]")
+
+
+class CountingReader:
+    """UTF-8 file reader that counts the bytes consumed, for throughput."""
+
+    def __init__(self, path):
+        self.bytes = 0
+        self._file = open(path, "rb")
+        # Multi-byte characters may be split across reads
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def read(self, size):
+        while True:
+            data = self._file.read(size)
+            self.bytes += len(data)
+            text = self._decoder.decode(data, final=not data)
+            if text or not data:
+                return text
+
+    def close(self):
+        self._file.close()
+
+
+def iter_array(reader, read_size=READ_SIZE):
+    """Yield the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+
+    def more():
+        nonlocal buffer, pos
+        chunk = reader.read(read_size)
+        if not chunk:
+            return False
+        # Drop what has been consumed before growing the buffer
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or not more():
+                return
+
+    skip(_WHITESPACE)
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+
+    while True:
+        skip(_WHITESPACE)
+        if pos >= len(buffer):
+            raise ValueError("unterminated JSON array")
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] in _NUMBER_START:
+            # A number ends only at a delimiter: "3." may be followed by
+            # "5e10" in the next read, and "3." alone does not decode
+            while not _NUMBER_END.search(buffer, pos) and more():
+                pass
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            break
+        pos = end
+        yield element
+
+        skip(_WHITESPACE)
+        if pos < len(buffer) and buffer[pos] == ",":
+            pos += 1
+        elif pos >= len(buffer) or buffer[pos] != "]":
+            raise ValueError(f"expected ',' or ']' after element {element!r:.40}")
+
+
+def parse_dates(document, fields=DATE_FIELDS):
+    """Replace ISO 8601 strings in ``fields`` with timezone-aware datetimes."""
+    for field in fields:
+        value = document.get(field)
+        if isinstance(value, str):
+            document[field] = datetime.datetime.fromisoformat(value)
+    return document
+
+
+def length_category(length):
+    for name, limit in LENGTH_CATEGORIES:
+        if length < limit:
+            return name
+    return "Long"
+
+
+def add_metrics(document):
+    """Store the story length (as ``$strLenCP`` counts it) and its category."""
+    length = len(document.get("story", ""))
+    document["storyLength"] = length
+    document["lengthCategory"] = length_category(length)
+    return document
+
+
+def prepare(document):
+    return add_metrics(parse_dates(document))
+
+
+def ensure_indexes(collection):
+    for name, keys in INDEXES.items():
+        collection.create_index(keys, name=name)
+    collection.create_index(
+        [(field, TEXT) for field in TEXT_WEIGHTS],
+        name=TEXT_INDEX,
+        weights=TEXT_WEIGHTS,
+        default_language="english",
+    )
+
+
+def batched(documents, size):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_batch(collection, batch):
+    """Insert one batch unordered; returns (inserted, failed)."""
+    try:
+        result = collection.insert_many(batch, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        failed = len(e.details.get("writeErrors", ()))
+        return e.details.get("nInserted", len(batch) - failed), failed
+
+
+def load(documents, collection, batch_size=1000, workers=4, progress=None):
+    """Insert ``documents`` into ``collection`` in parallel unordered batches.
+
+    At most ``2 * workers`` batches are queued at once, so a fast parser
+    never buffers the whole file. ``collection`` only needs an
+    ``insert_many(documents, ordered=False)`` method. ``progress`` is
+    called with the running totals after every batch.
+    """
+    totals = {"documents": 0, "inserted": 0, "failed": 0, "batches": 0}
+
+    def collect(done):
+        for future in done:
+            inserted, failed = future.result()
+            totals["inserted"] += inserted
+            totals["failed"] += failed
+            totals["batches"] += 1
+            if progress:
+                progress(totals)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="writer") as pool:
+        pending = set()
+        for batch in batched(documents, batch_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            totals["documents"] += len(batch)
+            pending.add(pool.submit(insert_batch, collection, batch))
+        collect(wait(pending).done)
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument(
+        "--uri",
+        default=None,
+        help="MongoDB connection string (default: MONGO_URI or localhost)",
+    )
+    parser.add_argument("--db", default="mongo_stories")
+    parser.add_argument("--collection", default="stories")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--drop", action="store_true", help="drop the collection before loading"
+    )
+    parser.add_argument(
+        "--mock",
+        action="store_true",
+        help="load into an in-memory mongomock collection instead of a server",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mock:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit(
+                "--mock needs mongomock, which is not in requirements.txt: "
+                "pip install mongomock"
+            )
+
+        client = mongomock.MongoClient()
+    else:
+        dotenv.load_dotenv(".env")
+        uri = args.uri or os.getenv("MONGO_URI", "mongodb://localhost:27017")
+        client = MongoClient(uri, tz_aware=True)
+    collection = client[args.db][args.collection]
+    if args.drop:
+        collection.drop()
+
+    reader = CountingReader(args.path)
+    started = time.perf_counter()
+    last_report = [started]
+
+    def report(totals):
+        now = time.perf_counter()
+        if now - last_report[0] >= 5:
+            last_report[0] = now
+            print(
+                f"  {totals['inserted']} inserted, "
+                f"{totals['inserted'] / (now - started):.0f} docs/s"
+            )
+
+    try:
+        documents = (prepare(doc) for doc in iter_array(reader))
+        totals = load(documents, collection, args.batch_size, args.workers, report)
+        # Building once at the end is faster than maintaining during the load
+        ensure_indexes(collection)
+    finally:
+        reader.close()
+        client.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{totals['inserted']} of {totals['documents']} stories inserted "
+        f"({totals['failed']} failed) in {totals['batches']} batches, "
+        f"{elapsed:.2f}s: {totals['documents'] / elapsed if elapsed else 0:.0f} docs/s, "
+        f"{reader.bytes / 1e6 / elapsed if elapsed else 0:.1f} MB/s"
+    )
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Ranked full-text search over story titles, morals and text.
+
+Two interchangeable backends:
+
+- ``MongoSearch`` queries the ``story_text`` index that load_stories.py
+  creates and ranks by MongoDB's text score.
+- ``InvertedIndex`` keeps an in-process inverted index ranked with BM25,
+  built incrementally with ``add()`` as stories stream in, for when there is
+  no server or the stories are not in MongoDB.
+
+Both return the same page shape, including how long the search took:
+
+    {"query": ..., "page": 1, "page_size": 10, "total": 42,
+     "latency_ms": 0.8, "results": [{"title": ..., "score": ...}, ...]}
+
+Examples:
+
+    python mongodb/search.py "fox grapes"
+    python mongodb/search.py "greed" --page 2 --backend memory
+"""
+
+import argparse
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import dotenv
+from pymongo import MongoClient
+
+import load_stories
+
+# Fields returned with each result
+RESULT_FIELDS = ("title", "author", "moral", "datetime")
+
+# Common English words left out of the index, as the MongoDB text index does
+STOPWORDS = frozenset("""
+    a about after all also an and any are as at be because been but by can
+    could did do does for from had has have he her him his how i if in into
+    is it its me my no not of on or our out she so some than that the their
+    them then there they this to up us was we were what when which who will
+    with would you your
+    """.split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens of ``text`` without stopwords (no stemming)."""
+    return [
+        token
+        for token in _TOKEN.findall(text.lower().replace("'", ""))
+        if token not in STOPWORDS
+    ]
+
+
+def _page(query, page, page_size, total, results, started):
+    return {
+        "query": query,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        "results": results,
+    }
+
+
+class MongoSearch:
+    """Search through the collection's text index, best matches first."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def search(self, query, page=1, page_size=10):
+        started = time.perf_counter()
+        match = {"$text": {"$search": query}}
+        projection = {"_id": 0, "score": {"$meta": "textScore"}}
+        projection.update({field: 1 for field in RESULT_FIELDS})
+        cursor = (
+            self.collection.find(match, projection)
+            .sort([("score", {"$meta": "textScore"})])
+            .skip((page - 1) * page_size)
+            .limit(page_size)
+        )
+        results = list(cursor)
+        total = self.collection.count_documents(match)
+        return _page(query, page, page_size, total, results, started)
+
+
+class InvertedIndex:
+    """In-memory BM25 index over the fields in ``weights``.
+
+    Term frequencies and lengths are summed across fields after multiplying
+    by the field weight (BM25F), so a word in a title counts like several in
+    a story. Only the result fields are kept per story, not the text.
+    Stories can be indexed on their way into MongoDB:
+
+        index = InvertedIndex()
+        documents = (index.add(load_stories.prepare(s)) for s in stories)
+        load_stories.load(documents, collection)
+    """
+
+    def __init__(self, weights=None, k1=1.2, b=0.75):
+        self.weights = dict(weights or load_stories.TEXT_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        # term -> {doc: weighted term frequency}
+        self._postings = defaultdict(dict)
+        self._lengths = []
+        self._documents = []
+        self._total_length = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, document):
+        """Index one story; returns it so ``add`` can sit in a generator."""
+        frequencies = defaultdict(float)
+        length = 0.0
+        for field, weight in self.weights.items():
+            tokens = tokenize(document.get(field) or "")
+            length += weight * len(tokens)
+            for token in tokens:
+                frequencies[token] += weight
+        stored = {field: document.get(field) for field in RESULT_FIELDS}
+        with self._lock:
+            doc = len(self._documents)
+            self._documents.append(stored)
+            self._lengths.append(length)
+            self._total_length += length
+            for token, frequency in frequencies.items():
+                self._postings[token][doc] = frequency
+        return document
+
+    def add_all(self, documents):
+        for document in documents:
+            self.add(document)
+        return self
+
+    def search(self, query, page=1, page_size=10):
+        started = time.perf_counter()
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._documents)
+            average = self._total_length / count if count else 0.0
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for doc, frequency in postings.items():
+                    norm = self.k1 * (
+                        1 - self.b + self.b * self._lengths[doc] / average
+                    )
+                    scores[doc] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            # Only rank as many as the requested page needs
+            top = heapq.nlargest(page * page_size, scores.items(), key=lambda s: s[1])
+            results = [
+                {**self._documents[doc], "score": round(score, 4)}
+                for doc, score in top[(page - 1) * page_size :]
+            ]
+        return _page(query, page, page_size, len(scores), results, started)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("query")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument(
+        "--backend",
+        choices=("mongo", "memory"),
+        default="mongo",
+        help="MongoDB text index, or a BM25 index built from --path",
+    )
+    parser.add_argument("--uri", default=None)
+    parser.add_argument("--db", default="mongo_stories")
+    parser.add_argument("--collection", default="stories")
+    parser.add_argument("--path", default=load_stories.DEFAULT_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    client = None
+    if args.backend == "memory":
+        started = time.perf_counter()
+        reader = load_stories.CountingReader(args.path)
+        try:
+            searcher = InvertedIndex().add_all(load_stories.iter_array(reader))
+        finally:
+            reader.close()
+        print(
+            f"Indexed {len(searcher)} stories in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+    else:
+        dotenv.load_dotenv(".env")
+        uri = args.uri or os.getenv("MONGO_URI", "mongodb://localhost:27017")
+        client = MongoClient(uri, tz_aware=True)
+        searcher = MongoSearch(client[args.db][args.collection])
+
+    try:
+        page = searcher.search(args.query, args.page, args.page_size)
+    finally:
+        if client is not None:
+            client.close()
+
+    print(
+        f"{page['total']} matches for {args.query!r}, page {page['page']} "
+        f"({page['latency_ms']:.2f} ms)"
+    )
+    for rank, result in enumerate(
+        page["results"], (args.page - 1) * args.page_size + 1
+    ):
+        print(
+            f"{rank:>4}. {result['score']:>8.3f}  {result['title']} ({result['author']})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import datetime
+import io
+import json
+
+import pytest
+
+from load_stories import (
+    CountingReader,
+    add_metrics,
+    batched,
+    iter_array,
+    load,
+    parse_dates,
+)
+
+
+class Reads:
+    """Reader returning the given strings, one per read."""
+
+    def __init__(self, *parts):
+        self.parts = list(parts)
+
+    def read(self, size):
+        return self.parts.pop(0) if self.parts else ""
+
+
+ELEMENTS = [
+    {"title": 'A, [tricky] "one"', "story": "café ☃"},
+    12345678,
+    -0.25e-3,
+    [1, [2, 3]],
+    True,
+    None,
+    "text",
+]
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 1 << 20])
+def test_elements_split_at_any_read_boundary(read_size):
+    text = json.dumps(ELEMENTS, ensure_ascii=False)
+    assert list(iter_array(io.StringIO(text), read_size)) == ELEMENTS
+
+
+@pytest.mark.parametrize(
+    "parts, expected",
+    [
+        (["[1, 3.", "5e10, 2]"], [1, 3.5e10, 2]),
+        (["[3", "]"], [3]),
+        (["[-", "1,", "2 ]"], [-1, 2]),
+        (["[1.5e", "3]"], [1500.0]),
+        (['[{"a": 1}, 4', "5]"], [{"a": 1}, 45]),
+    ],
+)
+def test_numbers_split_across_reads(parts, expected):
+    assert list(iter_array(Reads(*parts))) == expected
+
+
+def test_whitespace_and_empty_array():
+    assert list(iter_array(io.StringIO(" \n[ ]\n"))) == []
+    assert list(iter_array(io.StringIO("[\n 1 ,\n 2\n]"))) == [1, 2]
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', "[1, 2", "[1 2]", '[{"a": }]', ""])
+def test_malformed_input_raises(text):
+    with pytest.raises(ValueError):
+        list(iter_array(io.StringIO(text), 2))
+
+
+def test_counting_reader_decodes_split_characters(tmp_path):
+    path = tmp_path / "stories.json"
+    data = '\ufeff[{"story": "café"}]'.encode()
+    path.write_bytes(data)
+    reader = CountingReader(path)
+    try:
+        assert list(iter_array(reader, 1)) == [{"story": "café"}]
+    finally:
+        reader.close()
+    assert reader.bytes == len(data)
+
+
+def test_parse_dates_and_metrics():
+    document = add_metrics(
+        parse_dates({"datetime": "2024-07-29T07:35:54.000Z", "story": "x" * 500})
+    )
+    assert document["datetime"] == datetime.datetime(
+        2024, 7, 29, 7, 35, 54, tzinfo=datetime.timezone.utc
+    )
+    assert document["storyLength"] == 500
+    assert document["lengthCategory"] == "Medium"
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class Collection:
+    def __init__(self):
+        self.documents = []
+
+    def insert_many(self, documents, ordered=True):
+        assert not ordered
+        self.documents.extend(documents)
+
+        class Result:
+            inserted_ids = [None] * len(documents)
+
+        return Result()
+
+
+def test_load_inserts_every_batch():
+    collection = Collection()
+    totals = load(({"n": n} for n in range(25)), collection, batch_size=10, workers=2)
+    assert totals == {"documents": 25, "inserted": 25, "failed": 0, "batches": 3}
+    assert sorted(d["n"] for d in collection.documents) == list(range(25))
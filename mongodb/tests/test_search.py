@@ -0,0 +1,57 @@
+from search import InvertedIndex, tokenize
+
+STORIES = [
+    {"title": "The Dragon", "author": "Ann", "moral": "Be brave", "story": "A tale."},
+    {"title": "Sea", "author": "Bob", "moral": "", "story": "The dragon slept."},
+    {"title": "Fox", "author": "Cy", "moral": "Think", "story": "A clever fox."},
+]
+
+
+def index():
+    return InvertedIndex().add_all(dict(story) for story in STORIES)
+
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("The Fox's DEN, and 2 cubs") == ["foxs", "den", "2", "cubs"]
+
+
+def test_add_returns_the_document():
+    story = dict(STORIES[0])
+    assert InvertedIndex().add(story) is story
+
+
+def test_title_match_outranks_story_match():
+    page = index().search("dragon")
+    assert page["total"] == 2
+    assert [result["title"] for result in page["results"]] == ["The Dragon", "Sea"]
+    assert page["results"][0]["score"] > page["results"][1]["score"]
+
+
+def test_results_carry_only_the_result_fields():
+    result = index().search("fox")["results"][0]
+    assert set(result) == {"title", "author", "moral", "datetime", "score"}
+
+
+def test_no_match():
+    page = index().search("unicorn")
+    assert page["total"] == 0
+    assert page["results"] == []
+    assert InvertedIndex().search("anything")["results"] == []
+
+
+def test_pages():
+    searcher = index()
+    first = searcher.search("dragon", page=1, page_size=1)
+    second = searcher.search("dragon", page=2, page_size=1)
+    assert first["total"] == second["total"] == 2
+    assert [r["title"] for r in first["results"] + second["results"]] == [
+        "The Dragon",
+        "Sea",
+    ]
+    assert searcher.search("dragon", page=3, page_size=1)["results"] == []
+
+
+def test_weights_change_the_ranking():
+    searcher = InvertedIndex(weights={"title": 1, "story": 10})
+    searcher.add_all(dict(story) for story in STORIES)
+    assert searcher.search("dragon")["results"][0]["title"] == "Sea"
@@ -11,3 +11,28 @@ db.stories.updateOne(
   { title: "The Cock and the Fox" },
   { $set: { author: "Suzie Wolfgang" } }
 );
+
+// Backfill the precomputed fields on stories loaded before they existed:
+// typed dates, story length and length category
+use("mongo_stories");
+db.stories.updateMany({ storyLength: { $exists: false } }, [
+  {
+    $set: {
+      datetime: { $toDate: "$datetime" },
+      storyLength: { $strLenCP: "$story" },
+    },
+  },
+  {
+    $set: {
+      lengthCategory: {
+        $switch: {
+          branches: [
+            { case: { $lt: ["$storyLength", 500] }, then: "Short" },
+            { case: { $lt: ["$storyLength", 1000] }, then: "Medium" },
+          ],
+          default: "Long",
+        },
+      },
+    },
+  },
+]);
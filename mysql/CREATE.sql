@@ -6,7 +6,11 @@ CREATE TABLE Gamers (
 	gamer_tag varchar(30) primary key,
     email varchar(100) unique,
     registration_date date not null,
-    birth_date date
+    birth_date date,
+    -- Email domain stored once per row so it can be indexed and grouped on
+    email_domain varchar(100)
+        GENERATED ALWAYS AS (SUBSTRING_INDEX(email, '@', -1)) STORED,
+    INDEX idx_gamers_email_domain (email_domain)
 );
 
 CREATE TABLE GamePublishers (
@@ -36,4 +40,46 @@ CREATE TABLE Purchases (
     FOREIGN KEY (game_id) REFERENCES VideoGames(game_id)
 );
 
+-- Summary tables kept current by the Purchases triggers in CREATE_TRIGGERS.sql
+CREATE TABLE GameSales (
+    game_id int primary key,
+    purchase_count int not null DEFAULT 0,
+    revenue decimal(12, 2) not null DEFAULT 0,
+    FOREIGN KEY (game_id) REFERENCES VideoGames(game_id) ON DELETE CASCADE
+);
+
+CREATE TABLE GamerSpend (
+    gamer_tag varchar(30) primary key,
+    purchase_count int not null DEFAULT 0,
+    total_spent decimal(12, 2) not null DEFAULT 0,
+    FOREIGN KEY (gamer_tag) REFERENCES Gamers(gamer_tag) ON DELETE CASCADE
+);
+
+CREATE TABLE PublisherRevenue (
+    publisher_id int primary key,
+    purchase_count int not null DEFAULT 0,
+    total_revenue decimal(14, 2) not null DEFAULT 0,
+    FOREIGN KEY (publisher_id) REFERENCES GamePublishers(publisher_id) ON DELETE CASCADE
+);
+
+-- Per-day rollups of Purchases for date-range charts, kept current by the
+-- same triggers
+CREATE TABLE DailyGameSales (
+    sale_date date not null,
+    game_id int not null,
+    purchase_count int not null DEFAULT 0,
+    revenue decimal(12, 2) not null DEFAULT 0,
+    PRIMARY KEY (sale_date, game_id),
+    FOREIGN KEY (game_id) REFERENCES VideoGames(game_id) ON DELETE CASCADE
+);
+
+CREATE TABLE DailyGamerSpend (
+    sale_date date not null,
+    gamer_tag varchar(30) not null,
+    purchase_count int not null DEFAULT 0,
+    total_spent decimal(12, 2) not null DEFAULT 0,
+    PRIMARY KEY (sale_date, gamer_tag),
+    FOREIGN KEY (gamer_tag) REFERENCES Gamers(gamer_tag) ON DELETE CASCADE
+);
+
 SHOW TABLES;
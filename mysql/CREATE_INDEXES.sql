@@ -0,0 +1,51 @@
+-- Index plan for the dashboard and the stored procedures.
+-- Run once after CREATE.sql (and INSERT.sql on an existing database).
+USE gaming_db;
+
+-- The unique (gamer_tag, game_id) index fails if a gamer already owns a game
+-- twice; this must return no rows before the migration is applied.
+SELECT
+    gamer_tag,
+    game_id,
+    COUNT(*) AS copies
+FROM
+    Purchases
+GROUP BY
+    gamer_tag,
+    game_id
+HAVING
+    copies > 1;
+
+-- Email domain stored once per row so it can be indexed and grouped on.
+-- CREATE.sql creates it; a database created before it gets it here.
+SELECT IF(
+    COUNT(*) = 0,
+    'ALTER TABLE Gamers
+        ADD COLUMN email_domain varchar(100)
+            GENERATED ALWAYS AS (SUBSTRING_INDEX(email, ''@'', -1)) STORED,
+        ADD INDEX idx_gamers_email_domain (email_domain)',
+    'DO 0'
+)
+INTO @add_email_domain
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'Gamers'
+    AND COLUMN_NAME = 'email_domain';
+
+PREPARE add_email_domain FROM @add_email_domain;
+EXECUTE add_email_domain;
+DEALLOCATE PREPARE add_email_domain;
+
+-- BuyGame's "already purchased" probe and gamer library lookups
+ALTER TABLE Purchases
+    ADD UNIQUE INDEX uq_purchases_gamer_game (gamer_tag, game_id),
+    -- covers per-game counts and revenue without touching the rows
+    ADD INDEX idx_purchases_game_price (game_id, price_paid),
+    ADD INDEX idx_purchases_date (purchase_date);
+
+ALTER TABLE VideoGames
+    ADD INDEX idx_videogames_genre (genre);
+
+SHOW INDEX FROM Gamers;
+SHOW INDEX FROM Purchases;
+SHOW INDEX FROM VideoGames;
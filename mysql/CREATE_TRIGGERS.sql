@@ -49,4 +49,160 @@ BEGIN
     END IF;
 END//
 
+-- Keep GameSales, GamerSpend, PublisherRevenue and the Daily* rollups in
+-- step with Purchases
+CREATE TRIGGER summarize_purchase_insert
+AFTER INSERT ON Purchases
+FOR EACH ROW
+BEGIN
+    INSERT INTO GameSales (game_id, purchase_count, revenue)
+    VALUES (NEW.game_id, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        revenue = revenue + NEW.price_paid;
+
+    INSERT INTO GamerSpend (gamer_tag, purchase_count, total_spent)
+    VALUES (NEW.gamer_tag, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        total_spent = total_spent + NEW.price_paid;
+
+    INSERT INTO PublisherRevenue (publisher_id, purchase_count, total_revenue)
+    SELECT publisher_id, 1, NEW.price_paid
+    FROM VideoGames
+    WHERE game_id = NEW.game_id
+    ON DUPLICATE KEY UPDATE
+        purchase_count = PublisherRevenue.purchase_count + 1,
+        total_revenue = PublisherRevenue.total_revenue + NEW.price_paid;
+
+    INSERT INTO DailyGameSales (sale_date, game_id, purchase_count, revenue)
+    VALUES (DATE(NEW.purchase_date), NEW.game_id, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        revenue = revenue + NEW.price_paid;
+
+    INSERT INTO DailyGamerSpend (sale_date, gamer_tag, purchase_count, total_spent)
+    VALUES (DATE(NEW.purchase_date), NEW.gamer_tag, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        total_spent = total_spent + NEW.price_paid;
+END//
+
+CREATE TRIGGER summarize_purchase_delete
+AFTER DELETE ON Purchases
+FOR EACH ROW
+BEGIN
+    UPDATE GameSales
+    SET purchase_count = purchase_count - 1,
+        revenue = revenue - OLD.price_paid
+    WHERE game_id = OLD.game_id;
+
+    UPDATE GamerSpend
+    SET purchase_count = purchase_count - 1,
+        total_spent = total_spent - OLD.price_paid
+    WHERE gamer_tag = OLD.gamer_tag;
+
+    UPDATE PublisherRevenue pr
+    INNER JOIN VideoGames v ON pr.publisher_id = v.publisher_id
+    SET pr.purchase_count = pr.purchase_count - 1,
+        pr.total_revenue = pr.total_revenue - OLD.price_paid
+    WHERE v.game_id = OLD.game_id;
+
+    UPDATE DailyGameSales
+    SET purchase_count = purchase_count - 1,
+        revenue = revenue - OLD.price_paid
+    WHERE sale_date = DATE(OLD.purchase_date) AND game_id = OLD.game_id;
+
+    UPDATE DailyGamerSpend
+    SET purchase_count = purchase_count - 1,
+        total_spent = total_spent - OLD.price_paid
+    WHERE sale_date = DATE(OLD.purchase_date) AND gamer_tag = OLD.gamer_tag;
+END//
+
+-- An update is applied as removing the old row and adding the new one
+CREATE TRIGGER summarize_purchase_update
+AFTER UPDATE ON Purchases
+FOR EACH ROW
+BEGIN
+    UPDATE GameSales
+    SET purchase_count = purchase_count - 1,
+        revenue = revenue - OLD.price_paid
+    WHERE game_id = OLD.game_id;
+
+    INSERT INTO GameSales (game_id, purchase_count, revenue)
+    VALUES (NEW.game_id, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        revenue = revenue + NEW.price_paid;
+
+    UPDATE GamerSpend
+    SET purchase_count = purchase_count - 1,
+        total_spent = total_spent - OLD.price_paid
+    WHERE gamer_tag = OLD.gamer_tag;
+
+    INSERT INTO GamerSpend (gamer_tag, purchase_count, total_spent)
+    VALUES (NEW.gamer_tag, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        total_spent = total_spent + NEW.price_paid;
+
+    UPDATE PublisherRevenue pr
+    INNER JOIN VideoGames v ON pr.publisher_id = v.publisher_id
+    SET pr.purchase_count = pr.purchase_count - 1,
+        pr.total_revenue = pr.total_revenue - OLD.price_paid
+    WHERE v.game_id = OLD.game_id;
+
+    INSERT INTO PublisherRevenue (publisher_id, purchase_count, total_revenue)
+    SELECT publisher_id, 1, NEW.price_paid
+    FROM VideoGames
+    WHERE game_id = NEW.game_id
+    ON DUPLICATE KEY UPDATE
+        purchase_count = PublisherRevenue.purchase_count + 1,
+        total_revenue = PublisherRevenue.total_revenue + NEW.price_paid;
+
+    UPDATE DailyGameSales
+    SET purchase_count = purchase_count - 1,
+        revenue = revenue - OLD.price_paid
+    WHERE sale_date = DATE(OLD.purchase_date) AND game_id = OLD.game_id;
+
+    UPDATE DailyGamerSpend
+    SET purchase_count = purchase_count - 1,
+        total_spent = total_spent - OLD.price_paid
+    WHERE sale_date = DATE(OLD.purchase_date) AND gamer_tag = OLD.gamer_tag;
+
+    INSERT INTO DailyGameSales (sale_date, game_id, purchase_count, revenue)
+    VALUES (DATE(NEW.purchase_date), NEW.game_id, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        revenue = revenue + NEW.price_paid;
+
+    INSERT INTO DailyGamerSpend (sale_date, gamer_tag, purchase_count, total_spent)
+    VALUES (DATE(NEW.purchase_date), NEW.gamer_tag, 1, NEW.price_paid)
+    ON DUPLICATE KEY UPDATE
+        purchase_count = purchase_count + 1,
+        total_spent = total_spent + NEW.price_paid;
+END//
+
+-- Move a game's sales to its new publisher when it changes hands
+CREATE TRIGGER summarize_game_publisher_change
+AFTER UPDATE ON VideoGames
+FOR EACH ROW
+BEGIN
+    IF NEW.publisher_id <> OLD.publisher_id THEN
+        UPDATE PublisherRevenue pr
+        INNER JOIN GameSales s ON s.game_id = OLD.game_id
+        SET pr.purchase_count = pr.purchase_count - s.purchase_count,
+            pr.total_revenue = pr.total_revenue - s.revenue
+        WHERE pr.publisher_id = OLD.publisher_id;
+
+        INSERT INTO PublisherRevenue (publisher_id, purchase_count, total_revenue)
+        SELECT NEW.publisher_id, s.purchase_count, s.revenue
+        FROM GameSales s
+        WHERE s.game_id = NEW.game_id
+        ON DUPLICATE KEY UPDATE
+            purchase_count = PublisherRevenue.purchase_count + s.purchase_count,
+            total_revenue = PublisherRevenue.total_revenue + s.revenue;
+    END IF;
+END//
+
 DELIMITER ;
\ No newline at end of file
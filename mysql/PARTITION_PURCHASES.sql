@@ -0,0 +1,249 @@
+-- Monthly RANGE partitioning of Purchases on purchase_date, so date-range
+-- queries only read the partitions they cover.
+-- Run once after CREATE_INDEXES.sql (and after any bulk load).
+--
+-- This gives up the real foreign keys from Purchases to Gamers and
+-- VideoGames. The triggers standing in for them only check rows as they are
+-- written, and not at all while foreign_key_checks is 0, so a purchase
+-- loaded or changed that way may reference a gamer or game that does not
+-- exist, and nothing re-validates it later. Run the orphaned rows check at
+-- the end after such loads.
+USE gaming_db;
+
+-- Abort before changing anything if a gamer already owns a game twice, as
+-- adding uq_purchases_gamer_game in CREATE_INDEXES.sql would; the
+-- duplicates query there lists them
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS CheckPurchaseDuplicates//
+CREATE PROCEDURE CheckPurchaseDuplicates()
+BEGIN
+    IF EXISTS (
+        SELECT gamer_tag, game_id
+        FROM Purchases
+        GROUP BY gamer_tag, game_id
+        HAVING COUNT(*) > 1
+    ) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Purchases has duplicate (gamer_tag, game_id) pairs; remove them first';
+    END IF;
+END//
+
+DELIMITER ;
+
+CALL CheckPurchaseDuplicates();
+
+-- Partitioned InnoDB tables cannot have foreign keys, and every unique key
+-- must contain the partitioning column. The references are enforced by the
+-- triggers below instead, and (gamer_tag, game_id) keeps a plain index
+-- while its uniqueness moves to the unpartitioned PurchaseKeys: two
+-- concurrent purchases of one game can both pass BuyGame's check, and the
+-- second insert then fails on the PurchaseKeys primary key as it would have
+-- on uq_purchases_gamer_game.
+-- The foreign keys are dropped by whatever names the server gave them.
+SELECT COALESCE(
+    CONCAT(
+        'ALTER TABLE Purchases ',
+        GROUP_CONCAT(CONCAT('DROP FOREIGN KEY `', CONSTRAINT_NAME, '`') SEPARATOR ', ')
+    ),
+    'DO 0'
+)
+INTO @drop_purchase_fks
+FROM information_schema.REFERENTIAL_CONSTRAINTS
+WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'Purchases';
+
+PREPARE drop_purchase_fks FROM @drop_purchase_fks;
+EXECUTE drop_purchase_fks;
+DEALLOCATE PREPARE drop_purchase_fks;
+
+ALTER TABLE Purchases
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (purchase_id, purchase_date),
+    DROP INDEX uq_purchases_gamer_game,
+    ADD INDEX idx_purchases_gamer_game (gamer_tag, game_id);
+
+CREATE TABLE IF NOT EXISTS PurchaseKeys (
+    gamer_tag varchar(30) not null,
+    game_id int not null,
+    PRIMARY KEY (gamer_tag, game_id)
+);
+
+INSERT INTO PurchaseKeys (gamer_tag, game_id)
+SELECT gamer_tag, game_id FROM Purchases;
+
+DELIMITER //
+
+-- Stand-ins for the dropped foreign keys; like them, skipped while
+-- foreign_key_checks is off (e.g. during generate_data.py loads)
+DROP PROCEDURE IF EXISTS CheckPurchaseReferences//
+CREATE PROCEDURE CheckPurchaseReferences(
+    IN p_gamer_tag varchar(30),
+    IN p_game_id int
+)
+BEGIN
+    IF @@SESSION.foreign_key_checks = 1 THEN
+        IF NOT EXISTS (SELECT * FROM Gamers WHERE gamer_tag = p_gamer_tag) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Purchase references a gamer that does not exist';
+        END IF;
+        IF NOT EXISTS (SELECT * FROM VideoGames WHERE game_id = p_game_id) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Purchase references a game that does not exist';
+        END IF;
+    END IF;
+END//
+
+CREATE TRIGGER check_purchase_insert
+BEFORE INSERT ON Purchases
+FOR EACH ROW
+BEGIN
+    CALL CheckPurchaseReferences(NEW.gamer_tag, NEW.game_id);
+    INSERT INTO PurchaseKeys (gamer_tag, game_id) VALUES (NEW.gamer_tag, NEW.game_id);
+END//
+
+CREATE TRIGGER check_purchase_update
+BEFORE UPDATE ON Purchases
+FOR EACH ROW
+BEGIN
+    CALL CheckPurchaseReferences(NEW.gamer_tag, NEW.game_id);
+    IF NEW.gamer_tag <> OLD.gamer_tag OR NEW.game_id <> OLD.game_id THEN
+        DELETE FROM PurchaseKeys WHERE gamer_tag = OLD.gamer_tag AND game_id = OLD.game_id;
+        INSERT INTO PurchaseKeys (gamer_tag, game_id) VALUES (NEW.gamer_tag, NEW.game_id);
+    END IF;
+END//
+
+CREATE TRIGGER release_purchase_key
+AFTER DELETE ON Purchases
+FOR EACH ROW
+BEGIN
+    DELETE FROM PurchaseKeys WHERE gamer_tag = OLD.gamer_tag AND game_id = OLD.game_id;
+END//
+
+-- Prevent deletion of a gamer or game that has purchases
+CREATE TRIGGER before_gamer_delete
+BEFORE DELETE ON Gamers
+FOR EACH ROW
+BEGIN
+    IF @@SESSION.foreign_key_checks = 1
+        AND EXISTS (SELECT * FROM Purchases WHERE gamer_tag = OLD.gamer_tag) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Cannot delete gamer with purchases';
+    END IF;
+END//
+
+CREATE TRIGGER before_game_delete
+BEFORE DELETE ON VideoGames
+FOR EACH ROW
+BEGIN
+    IF @@SESSION.foreign_key_checks = 1
+        AND EXISTS (SELECT * FROM Purchases WHERE game_id = OLD.game_id) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Cannot delete game with purchases';
+    END IF;
+END//
+
+-- Partition Purchases by month, from the oldest purchase to p_months_ahead
+-- months from now, plus an empty p_future catch-all
+DROP PROCEDURE IF EXISTS PartitionPurchasesByMonth//
+CREATE PROCEDURE PartitionPurchasesByMonth(
+    IN p_months_ahead int
+)
+BEGIN
+    DECLARE v_month date;
+    DECLARE v_last date;
+    DECLARE v_partitions text DEFAULT '';
+
+    SELECT DATE_FORMAT(COALESCE(MIN(purchase_date), CURDATE()), '%Y-%m-01')
+    INTO v_month
+    FROM Purchases;
+    SET v_last = DATE_FORMAT(CURDATE() + INTERVAL p_months_ahead MONTH, '%Y-%m-01');
+
+    WHILE v_month <= v_last DO
+        SET v_partitions = CONCAT(
+            v_partitions,
+            'PARTITION p', DATE_FORMAT(v_month, '%Y%m'),
+            ' VALUES LESS THAN (''', v_month + INTERVAL 1 MONTH, '''), '
+        );
+        SET v_month = v_month + INTERVAL 1 MONTH;
+    END WHILE;
+
+    SET @partition_sql = CONCAT(
+        'ALTER TABLE Purchases PARTITION BY RANGE COLUMNS(purchase_date) (',
+        v_partitions,
+        'PARTITION p_future VALUES LESS THAN (MAXVALUE))'
+    );
+    PREPARE partition_stmt FROM @partition_sql;
+    EXECUTE partition_stmt;
+    DEALLOCATE PREPARE partition_stmt;
+END//
+
+-- Split monthly partitions off p_future until p_months_ahead months from now
+-- are covered; p_future is empty then, so each split is instant
+DROP PROCEDURE IF EXISTS AddPurchasePartitions//
+CREATE PROCEDURE AddPurchasePartitions(
+    IN p_months_ahead int
+)
+BEGIN
+    DECLARE v_next date;
+    DECLARE v_last date;
+
+    -- first day not covered by a monthly partition yet
+    SELECT MAX(STR_TO_DATE(LEFT(TRIM(BOTH '''' FROM PARTITION_DESCRIPTION), 10), '%Y-%m-%d'))
+    INTO v_next
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'Purchases'
+        AND PARTITION_DESCRIPTION <> 'MAXVALUE';
+
+    IF v_next IS NULL THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Purchases is not partitioned; call PartitionPurchasesByMonth first';
+    END IF;
+
+    SET v_last = DATE_FORMAT(CURDATE() + INTERVAL p_months_ahead MONTH, '%Y-%m-01');
+    WHILE v_next <= v_last DO
+        SET @partition_sql = CONCAT(
+            'ALTER TABLE Purchases REORGANIZE PARTITION p_future INTO (',
+            'PARTITION p', DATE_FORMAT(v_next, '%Y%m'),
+            ' VALUES LESS THAN (''', v_next + INTERVAL 1 MONTH, '''), ',
+            'PARTITION p_future VALUES LESS THAN (MAXVALUE))'
+        );
+        PREPARE partition_stmt FROM @partition_sql;
+        EXECUTE partition_stmt;
+        DEALLOCATE PREPARE partition_stmt;
+        SET v_next = v_next + INTERVAL 1 MONTH;
+    END WHILE;
+END//
+
+-- Keep three months of partitions ahead; needs event_scheduler=ON,
+-- otherwise call AddPurchasePartitions(3) from cron
+CREATE EVENT IF NOT EXISTS extend_purchase_partitions
+ON SCHEDULE EVERY 1 MONTH
+STARTS DATE_FORMAT(CURDATE() + INTERVAL 1 MONTH, '%Y-%m-01')
+DO CALL AddPurchasePartitions(3)//
+
+DELIMITER ;
+
+CALL PartitionPurchasesByMonth(3);
+
+-- Purchases whose gamer or game is missing; this must return no rows, now
+-- and after any load with foreign_key_checks = 0
+SELECT
+    p.purchase_id,
+    p.gamer_tag,
+    p.game_id,
+    g.gamer_tag IS NULL AS missing_gamer,
+    v.game_id IS NULL AS missing_game
+FROM
+    Purchases p
+    LEFT JOIN Gamers g ON g.gamer_tag = p.gamer_tag
+    LEFT JOIN VideoGames v ON v.game_id = p.game_id
+WHERE
+    g.gamer_tag IS NULL
+    OR v.game_id IS NULL;
+
+-- A 30-day range should list only the last two or three partitions
+EXPLAIN SELECT COUNT(*) FROM Purchases WHERE purchase_date >= CURDATE() - INTERVAL 30 DAY;
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Purchases';
@@ -9,8 +9,19 @@ Call BuyGame('RainbowArcher', 10);
 
 SELECT * FROM VideoGames;
 
+-- Purchase several games at once (the third item repeats the first)
+CALL BuyGames('[
+    {"gamer_tag": "RainbowArcher", "game_id": 11},
+    {"gamer_tag": "NinjaGamer", "game_id": 12},
+    {"gamer_tag": "RainbowArcher", "game_id": 11},
+    {"gamer_tag": "NoSuchGamer", "game_id": 1}
+]');
+
 -- Show All Gamers with their purchases
 CALL ShowGamersWithPurchases();
 
 -- Video games that been purchased
 CALL ShowPurchasedGames();
+
+-- Rebuild the purchase summary tables from scratch
+CALL RebuildSummaries();
@@ -0,0 +1,38 @@
+-- Make a second MySQL 8.0 server a replica of the first, so the dashboard can
+-- read from it (DB_READ_CONNECTIONS). Both servers need distinct server ids,
+-- binary logs and GTIDs, e.g. two local containers:
+--
+--   docker run -d --name gaming-primary -p 3306:3306 -e MYSQL_ROOT_PASSWORD=root \
+--       mysql:8.0 --server-id=1 --gtid-mode=ON --enforce-gtid-consistency=ON
+--   docker run -d --name gaming-replica -p 3307:3306 -e MYSQL_ROOT_PASSWORD=root \
+--       --add-host=host.docker.internal:host-gateway \
+--       mysql:8.0 --server-id=2 --gtid-mode=ON --enforce-gtid-consistency=ON \
+--       --super-read-only=ON
+--
+-- Run the first part on the primary before loading gaming_db, then the second
+-- part on the replica; everything written to the primary afterwards, the
+-- schema included, is replayed there.
+
+-- On the primary (port 3306)
+CREATE USER IF NOT EXISTS 'replication'@'%' IDENTIFIED BY 'replication';
+GRANT REPLICATION SLAVE ON *.* TO 'replication'@'%';
+
+-- On the replica (port 3307). The source host is the primary as the replica
+-- sees it: 127.0.0.1 for two servers on one host, host.docker.internal for
+-- the containers above.
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST = 'host.docker.internal',
+    SOURCE_PORT = 3306,
+    SOURCE_USER = 'replication',
+    SOURCE_PASSWORD = 'replication',
+    SOURCE_AUTO_POSITION = 1,
+    GET_SOURCE_PUBLIC_KEY = 1;
+START REPLICA;
+
+-- The dashboard checks Seconds_Behind_Source with SHOW REPLICA STATUS, which
+-- needs REPLICATION CLIENT besides SELECT. Create its account on the primary
+-- and it replicates too:
+--   CREATE USER 'dashboard'@'%' IDENTIFIED BY '...';
+--   GRANT SELECT, EXECUTE ON gaming_db.* TO 'dashboard'@'%';
+--   GRANT REPLICATION CLIENT ON *.* TO 'dashboard'@'%';
+SHOW REPLICA STATUS;
@@ -0,0 +1,437 @@
+"""Synthetic data generator and bulk loader for gaming_db.
+
+Generates gamers, publishers, games and purchases at any scale from a seed,
+so the same arguments (and ``--today``) always produce the same rows. Game popularity follows
+a Zipf distribution and a small share of gamers are heavy spenders. Rows are
+streamed in chunks, so memory depends on the number of games and gamers but
+not on the number of purchases.
+
+Examples:
+
+    # 100k gamers, 5M purchases straight into the database from .env
+    python mysql/generate_data.py --gamers 100000 --games 5000 --purchases 5000000
+
+    # write tab-separated files instead of loading
+    python mysql/generate_data.py --purchases 1000000 --out-dir /tmp/gaming_data
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import dotenv
+import numpy as np
+import pymysql
+from sqlalchemy.engine import make_url
+
+DOMAINS = ["gmail.com", "icloud.com", "outlook.com", "yahoo.com", "proton.me"]
+DOMAIN_WEIGHTS = [0.45, 0.25, 0.15, 0.1, 0.05]
+COUNTRIES = ["USA", "Japan", "France", "Poland", "Sweden", "Canada", "India", "UK"]
+GENRES = ["RPG", "Action", "Adventure", "Casual", "Sports", "Strategy", "Shooter"]
+PRICES = [0.0, 4.99, 9.99, 14.99, 19.99, 29.99, 39.99, 49.99, 59.99, 69.99]
+
+EPOCH = datetime.date(1970, 1, 1)
+
+COLUMNS = {
+    "Gamers": ("gamer_tag", "email", "registration_date", "birth_date"),
+    "GamePublishers": ("publisher_id", "name", "country", "founding_date"),
+    "VideoGames": (
+        "game_id",
+        "title",
+        "release_date",
+        "genre",
+        "price",
+        "publisher_id",
+    ),
+    "Purchases": ("gamer_tag", "game_id", "purchase_date", "price_paid"),
+}
+
+
+def _day(offset):
+    return EPOCH + datetime.timedelta(days=int(offset))
+
+
+def _days(date):
+    return (date - EPOCH).days
+
+
+class Generator:
+    """Deterministic row generator; each table is a separate row iterator."""
+
+    def __init__(
+        self,
+        gamers,
+        publishers,
+        games,
+        purchases,
+        seed=42,
+        zipf_exponent=1.1,
+        heavy_share=0.01,
+        heavy_weight=25.0,
+        first_publisher_id=1,
+        first_game_id=1,
+        first_gamer=0,
+        today=None,
+        chunk_size=10000,
+    ):
+        if purchases > gamers * games:
+            raise ValueError("More purchases requested than gamer/game pairs exist")
+        self.gamers = gamers
+        self.publishers = publishers
+        self.games = games
+        self.purchases = purchases
+        self.seed = seed
+        self.zipf_exponent = zipf_exponent
+        self.heavy_share = heavy_share
+        self.heavy_weight = heavy_weight
+        self.first_publisher_id = first_publisher_id
+        self.first_game_id = first_game_id
+        self.first_gamer = first_gamer
+        # Purchases run up to this date, so recent date ranges have data
+        self.today = today or datetime.date.today()
+        self.chunk_size = chunk_size
+
+        # Per-game and per-gamer attributes are needed to keep purchases
+        # consistent (price paid, dates), so they are drawn up front.
+        rng = self._rng(0)
+        self.game_price = rng.choice(PRICES, size=games)
+        self.game_release = rng.integers(
+            _days(datetime.date(2000, 1, 1)), _days(self.today) - 30, size=games
+        )
+        self.game_publisher = rng.integers(0, publishers, size=games)
+        self.gamer_registration = rng.integers(
+            _days(datetime.date(2010, 1, 1)), _days(self.today) - 1, size=gamers
+        )
+
+        # Zipfian popularity over a random permutation of the games
+        ranks = np.arange(1, games + 1, dtype=np.float64)
+        popularity = ranks**-zipf_exponent
+        self.game_by_rank = rng.permutation(games)
+        self.popularity_cdf = np.cumsum(popularity / popularity.sum())
+
+    def _rng(self, stream):
+        return np.random.default_rng([self.seed, stream])
+
+    def publisher_rows(self):
+        rng = self._rng(1)
+        countries = rng.choice(COUNTRIES, size=self.publishers)
+        founded = rng.integers(
+            _days(datetime.date(1950, 1, 1)),
+            _days(datetime.date(2015, 1, 1)),
+            size=self.publishers,
+        )
+        for i in range(self.publishers):
+            publisher_id = self.first_publisher_id + i
+            yield (
+                publisher_id,
+                f"Publisher {publisher_id:06d}",
+                countries[i],
+                _day(founded[i]),
+            )
+
+    def game_rows(self):
+        rng = self._rng(2)
+        genres = rng.choice(GENRES, size=self.games)
+        for i in range(self.games):
+            game_id = self.first_game_id + i
+            yield (
+                game_id,
+                f"Generated Game {game_id:08d}",
+                _day(self.game_release[i]),
+                genres[i],
+                f"{self.game_price[i]:.2f}",
+                self.first_publisher_id + int(self.game_publisher[i]),
+            )
+
+    def gamer_tag(self, i):
+        return f"gamer{self.first_gamer + i:09d}"
+
+    def gamer_rows(self):
+        rng = self._rng(3)
+        for start in range(0, self.gamers, self.chunk_size):
+            stop = min(start + self.chunk_size, self.gamers)
+            domains = rng.choice(DOMAINS, size=stop - start, p=DOMAIN_WEIGHTS)
+            births = rng.integers(
+                _days(datetime.date(1960, 1, 1)),
+                _days(datetime.date(2010, 1, 1)),
+                size=stop - start,
+            )
+            for offset, i in enumerate(range(start, stop)):
+                tag = self.gamer_tag(i)
+                yield (
+                    tag,
+                    f"{tag}@{domains[offset]}",
+                    _day(self.gamer_registration[i]),
+                    _day(births[offset]),
+                )
+
+    def purchase_counts(self):
+        """Purchases per gamer: a multinomial split with a heavy-spender tail."""
+        rng = self._rng(4)
+        weights = rng.lognormal(mean=0.0, sigma=1.0, size=self.gamers)
+        heavy = rng.random(self.gamers) < self.heavy_share
+        weights[heavy] *= self.heavy_weight
+        counts = rng.multinomial(self.purchases, weights / weights.sum())
+
+        # A gamer can own each game once; move the overflow to other gamers
+        overflow = int(np.clip(counts - self.games, 0, None).sum())
+        np.minimum(counts, self.games, out=counts)
+        while overflow:
+            room = np.flatnonzero(counts < self.games)
+            extra = rng.choice(room, size=min(overflow, room.size), replace=False)
+            counts[extra] += 1
+            overflow -= extra.size
+        return counts
+
+    def _pick_games(self, rng, count):
+        """Draw ``count`` distinct games following the popularity curve."""
+        if count * 2 > self.games:
+            return rng.choice(self.games, size=count, replace=False)
+        picked = np.empty(0, dtype=np.int64)
+        while picked.size < count:
+            ranks = np.searchsorted(
+                self.popularity_cdf, rng.random(2 * (count - picked.size))
+            )
+            ranks = np.minimum(ranks, self.games - 1)
+            picked = np.unique(np.concatenate([picked, self.game_by_rank[ranks]]))
+        return rng.permutation(picked)[:count]
+
+    def purchase_rows(self):
+        rng = self._rng(5)
+        end = _days(self.today)
+        for i, count in enumerate(self.purchase_counts()):
+            if not count:
+                continue
+            tag = self.gamer_tag(i)
+            games = self._pick_games(rng, int(count))
+            # Bought after both the game's release and the gamer's registration
+            start = np.maximum(self.game_release[games], self.gamer_registration[i])
+            days = start + (rng.random(games.size) * (end - start)).astype(np.int64)
+            seconds = rng.integers(0, 86400, size=games.size)
+            stamps = np.datetime_as_string(
+                (days * 86400 + seconds).astype("datetime64[s]")
+            )
+            prices = self.game_price[games]
+            for game, stamp, price in zip(games, stamps, prices):
+                yield (tag, self.first_game_id + int(game), stamp, f"{price:.2f}")
+
+
+def _format(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+def write_tsv(path, rows):
+    count = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for row in rows:
+            out.write("\t".join(_format(value) for value in row))
+            out.write("\n")
+            count += 1
+    return count
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_data_infile(connection, table, rows, batch_size):
+    """Stream rows into ``table`` through temporary files and LOAD DATA."""
+    columns = ", ".join(COLUMNS[table])
+    loaded = 0
+    with connection.cursor() as cursor:
+        for chunk in _chunks(rows, batch_size):
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".tsv", delete=False, encoding="utf-8"
+            ) as out:
+                for row in chunk:
+                    out.write("\t".join(_format(value) for value in row))
+                    out.write("\n")
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                    "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                    f"({columns})",
+                    (out.name,),
+                )
+            finally:
+                os.remove(out.name)
+            connection.commit()
+            loaded += len(chunk)
+    return loaded
+
+
+def load_executemany(connection, table, rows, batch_size):
+    """Stream rows into ``table`` with batched multi-row INSERTs."""
+    columns = COLUMNS[table]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    loaded = 0
+    with connection.cursor() as cursor:
+        for chunk in _chunks(rows, batch_size):
+            cursor.executemany(sql, chunk)
+            connection.commit()
+            loaded += len(chunk)
+    return loaded
+
+
+def connect(url):
+    url = make_url(url)
+    return pymysql.connect(
+        host=url.host or "localhost",
+        port=url.port or 3306,
+        user=url.username,
+        password=url.password,
+        database=url.database,
+        local_infile=True,
+        autocommit=False,
+    )
+
+
+def _next_id(connection, table, column):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def _next_gamer(connection):
+    """Index after the highest generated gamer tag, so a rerun adds new gamers."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT MAX(gamer_tag) FROM Gamers WHERE gamer_tag REGEXP '^gamer[0-9]{9}$'"
+        )
+        last = cursor.fetchone()[0]
+    return int(last[len("gamer") :]) + 1 if last else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--gamers", type=int, default=10000)
+    parser.add_argument("--publishers", type=int, default=100)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--purchases", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument(
+        "--heavy-share",
+        type=float,
+        default=0.01,
+        help="fraction of gamers who are heavy spenders",
+    )
+    parser.add_argument(
+        "--today",
+        type=datetime.date.fromisoformat,
+        help="YYYY-MM-DD the purchases run up to (default: today); "
+        "fix it for reproducible output",
+    )
+    parser.add_argument(
+        "--start-id",
+        type=int,
+        help="number of the first generated gamer tag (default: 0 for files, "
+        "after the last generated gamer when loading)",
+    )
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument(
+        "--method",
+        choices=["load-data", "executemany"],
+        default="load-data",
+        help="LOAD DATA LOCAL INFILE (needs local_infile=ON) or batched INSERTs",
+    )
+    parser.add_argument(
+        "--out-dir", help="write one .tsv per table here instead of loading"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    generator_args = dict(
+        gamers=args.gamers,
+        publishers=args.publishers,
+        games=args.games,
+        purchases=args.purchases,
+        seed=args.seed,
+        zipf_exponent=args.zipf_exponent,
+        heavy_share=args.heavy_share,
+        today=args.today,
+    )
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        generator = Generator(**generator_args, first_gamer=args.start_id or 0)
+        tables = {
+            "GamePublishers": generator.publisher_rows,
+            "VideoGames": generator.game_rows,
+            "Gamers": generator.gamer_rows,
+            "Purchases": generator.purchase_rows,
+        }
+        for table, rows in tables.items():
+            started = time.perf_counter()
+            count = write_tsv(os.path.join(args.out_dir, f"{table}.tsv"), rows())
+            print(f"{table}: {count} rows in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    dotenv.load_dotenv(".env")
+    db_connection_str = os.getenv("DB_CONNECTION")
+    if db_connection_str is None:
+        raise ValueError(
+            "DB_CONNECTION environment variable not set. Please create a .env file and refer to the .env.example file for guidance."
+        )
+    connection = connect(db_connection_str)
+    load = load_data_infile if args.method == "load-data" else load_executemany
+
+    # Continue the auto-increment ranges so existing rows are left alone
+    generator = Generator(
+        **generator_args,
+        first_publisher_id=_next_id(connection, "GamePublishers", "publisher_id"),
+        first_game_id=_next_id(connection, "VideoGames", "game_id"),
+        first_gamer=(
+            _next_gamer(connection) if args.start_id is None else args.start_id
+        ),
+    )
+    tables = {
+        "GamePublishers": generator.publisher_rows,
+        "VideoGames": generator.game_rows,
+        "Gamers": generator.gamer_rows,
+        "Purchases": generator.purchase_rows,
+    }
+    with connection.cursor() as cursor:
+        # Rows are generated consistent with the foreign keys, so the checks
+        # are deferred for the load. The BEFORE INSERT and summary triggers
+        # still fire for every row.
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        cursor.execute("SET SESSION unique_checks = 0")
+    try:
+        for table, rows in tables.items():
+            started = time.perf_counter()
+            count = load(connection, table, rows(), args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{table}: {count} rows in {elapsed:.1f}s "
+                f"({count / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SET SESSION unique_checks = 1")
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+        connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())